@@ -0,0 +1,177 @@
+import asyncio
+import logging
+import uuid
+from typing import Literal, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import JSONResponse, PlainTextResponse
+
+from app.core.loop_monitor import loop_monitor
+from app.core.profiling import ProfilerBusy, memory_tracer, profiler
+from app.dependencies import get_current_admin
+from app.schemas import ApiKeyInfo, ApiKeyRateLimit, ProfileRequest
+from app.services.apikey_service import ApiKeyService
+
+logger = logging.getLogger("app.api.admin")
+router = APIRouter()
+apikey_service = ApiKeyService()
+
+
+@router.get("/loop")
+async def read_loop_monitor(current_user=Depends(get_current_admin)):
+    """
+    Reports the event loop monitor state: the last measured scheduling
+    lag and the most recent slow callbacks, each with the stack of the
+    loop thread and the route in progress when the loop was blocked.
+
+    The monitor runs when `LOOP_MONITOR_ENABLED` is set; lag histograms
+    are exported by `GET /metrics`.
+
+    **Authentication:** Required (administrator)
+
+    **Response Codes:**
+    *   `200 OK`: Monitor state.
+    *   `403 Forbidden`: The user is not an administrator.
+    """
+    return loop_monitor.snapshot()
+
+
+@router.post("/profile")
+async def create_profile(
+    params: ProfileRequest,
+    current_user=Depends(get_current_admin),
+):
+    """
+    Runs the sampling profiler and returns the profile as a file.
+
+    Without `route`, the event loop is sampled for `seconds`. With
+    `route` (a path or path suffix such as `/pagamentos/all`), only time
+    spent in requests to that route is sampled, until `requests` of them
+    have completed or `seconds` have passed.
+
+    The `collapsed` format (one `frame;frame;... count` line per stack)
+    feeds flamegraph.pl and inferno; `speedscope` files open in
+    https://www.speedscope.app.
+
+    **Authentication:** Required (administrator)
+
+    **Response Codes:**
+    *   `200 OK`: The profile.
+    *   `403 Forbidden`: The user is not an administrator.
+    *   `409 Conflict`: Another profile is running.
+    """
+    logger.info("Profile requested by %s: %s", current_user.username, params)
+    try:
+        samples = await profiler.run(
+            seconds=params.seconds,
+            interval=params.interval_ms / 1000,
+            route=params.route,
+            requests=params.requests,
+        )
+    except ProfilerBusy as err:
+        raise HTTPException(
+            status_code=409,
+            detail="A profile is already running",
+        ) from err
+    if params.format == "speedscope":
+        name = params.route or f"{params.seconds:g}s"
+        return JSONResponse(
+            content=profiler.to_speedscope(samples, name=name),
+            headers={
+                "Content-Disposition": (
+                    'attachment; filename="profile.speedscope.json"'
+                ),
+            },
+        )
+    return PlainTextResponse(
+        content=profiler.to_collapsed(samples),
+        headers={"Content-Disposition": 'attachment; filename="profile.txt"'},
+    )
+
+
+@router.post("/tracemalloc/start")
+async def start_tracemalloc(
+    frames: int = Query(default=1, ge=1, le=100),
+    current_user=Depends(get_current_admin),
+):
+    """
+    Starts tracing memory allocations with `tracemalloc`, keeping `frames`
+    frames per allocation. Tracing slows allocations down, so stop it when
+    done.
+
+    **Authentication:** Required (administrator)
+    """
+    memory_tracer.start(frames)
+    logger.warning("tracemalloc started by %s", current_user.username)
+    return {"tracing": True}
+
+
+@router.get("/tracemalloc/snapshot")
+async def read_tracemalloc_snapshot(
+    limit: int = Query(default=25, ge=1, le=500),
+    pattern: Optional[str] = None,
+    group_by: Literal["lineno", "filename", "traceback"] = "lineno",
+    current_user=Depends(get_current_admin),
+):
+    """
+    Takes a memory snapshot and lists the biggest allocation sites.
+
+    From the second snapshot on, entries are compared with the previous
+    snapshot and sorted by growth. `pattern` keeps only allocations from
+    matching files (`fnmatch` syntax), e.g. `*/app/*` or `*pydantic*` to
+    follow payment serialization.
+
+    **Authentication:** Required (administrator)
+
+    **Response Codes:**
+    *   `200 OK`: The snapshot.
+    *   `409 Conflict`: Tracing is not started.
+    """
+    if not memory_tracer.tracing:
+        raise HTTPException(status_code=409, detail="tracemalloc is not started")
+    return await asyncio.to_thread(
+        memory_tracer.snapshot,
+        limit=limit,
+        pattern=pattern,
+        group_by=group_by,
+    )
+
+
+@router.post("/tracemalloc/stop")
+async def stop_tracemalloc(current_user=Depends(get_current_admin)):
+    """
+    Stops tracing memory allocations and frees the traces.
+
+    **Authentication:** Required (administrator)
+    """
+    memory_tracer.stop()
+    logger.warning("tracemalloc stopped by %s", current_user.username)
+    return {"tracing": False}
+
+
+@router.put("/apikeys/{key_id}/rate-limit", response_model=ApiKeyInfo)
+async def update_api_key_rate_limit(
+    key_id: uuid.UUID,
+    params: ApiKeyRateLimit,
+    current_user=Depends(get_current_admin),
+):
+    """
+    Sets the rate limit quota of an API key, such as `1000/minute` or
+    `100/minute;10000/day`. It replaces the limit of every rate limited
+    route for requests made with the key; route costs still apply. A null
+    `rate_limit` restores the route limits.
+
+    **Authentication:** Required (administrator)
+
+    **Response Codes:**
+    *   `200 OK`: The updated key.
+    *   `404 Not Found`: No such key.
+    *   `422 Unprocessable Entity`: The limit cannot be parsed.
+    """
+    logger.info(
+        "Rate limit of API key %s set to %s by %s",
+        key_id,
+        params.rate_limit,
+        current_user.username,
+    )
+    return await apikey_service.set_rate_limit(key_id, params.rate_limit)
@@ -1,23 +1,37 @@
 import logging
-import secrets
-import bcrypt
+import uuid
+from datetime import datetime
+from typing import List, Optional
+
 from fastapi import APIRouter, Depends
-from app.dependencies import get_current_user
-from app.models import ApiKey
+from app.core.usage import usage_recorder
+from app.dependencies import get_current_account_user
+from app.models import ApiKeyUsage
+from app.schemas import ApiKeyCreate, ApiKeyInfo, ApiKeyUsageSchema
+from app.services.apikey_service import ApiKeyService
 
 logger = logging.getLogger("app.api.apikeys")
 router = APIRouter()
+apikey_service = ApiKeyService()
 
 
 @router.post("/generate", status_code=201)
-async def generate_api_key(current_user=Depends(get_current_user)):
+async def generate_api_key(
+    params: Optional[ApiKeyCreate] = None,
+    current_user=Depends(get_current_account_user),
+):
     """
     Generates a new API key for the authenticated user.
 
+    The optional body sets the key `scope` (`full`, `read` or `ingest`)
+    and its `expires_at`. By default keys have full access and never
+    expire.
+
     **Authentication:** Required (JWT)
 
     **Response Codes:**
     *   `201 Created`: API key generated successfully.
+    *   `400 Bad Request`: `expires_at` is in the past.
     *   `401 Unauthorized`: Authentication required.
 
     **Example Response (201):**
@@ -26,16 +40,110 @@ async def generate_api_key(current_user=Depends(get_current_user)):
         "Generating a new API key for user: %s",
         current_user.username,
     )
-    raw_api_key = secrets.token_urlsafe(32)
-    key_prefix = raw_api_key[:10]
-    hashed_api_key = bcrypt.hashpw(
-        raw_api_key.encode("utf-8"),
-        bcrypt.gensalt(),
-    ).decode("utf-8")
-    await ApiKey.create(
-        user=current_user,
-        hashed_key=hashed_api_key,
-        key_prefix=key_prefix,
+    params = params or ApiKeyCreate()
+    api_key, raw_api_key = await apikey_service.generate(
+        current_user,
+        scope=params.scope,
+        expires_at=params.expires_at,
+    )
+    logger.debug("API key generated: %s...", api_key.key_prefix)
+    return {
+        "id": str(api_key.uuid),
+        "api_key": raw_api_key,
+        "msg": "API key generated successfully",
+    }
+
+
+@router.get("/", response_model=List[ApiKeyInfo])
+async def list_api_keys(current_user=Depends(get_current_account_user)):
+    """
+    Lists the authenticated user's API keys, including revoked ones.
+
+    **Authentication:** Required
+
+    **Response Codes:**
+    *   `200 OK`: The keys, newest first. Raw keys are never returned.
+    *   `401 Unauthorized`: Authentication required.
+    """
+    return await apikey_service.list_keys(current_user)
+
+
+@router.delete("/{key_id}", response_model=ApiKeyInfo)
+async def revoke_api_key(
+    key_id: uuid.UUID,
+    current_user=Depends(get_current_account_user),
+):
+    """
+    Revokes an API key. It is rejected by every worker from the next
+    request on.
+
+    **Authentication:** Required
+
+    **Response Codes:**
+    *   `200 OK`: The revoked key.
+    *   `404 Not Found`: No such key for the user.
+    """
+    return await apikey_service.revoke(current_user, key_id)
+
+
+@router.post("/{key_id}/rotate", status_code=201)
+async def rotate_api_key(
+    key_id: uuid.UUID,
+    current_user=Depends(get_current_account_user),
+):
+    """
+    Replaces an API key with a new one with the same scope and expiry.
+    The old key is revoked.
+
+    **Authentication:** Required
+
+    **Response Codes:**
+    *   `201 Created`: The new key.
+    *   `404 Not Found`: No such key for the user.
+    *   `409 Conflict`: The key is already revoked.
+    """
+    api_key, raw_api_key = await apikey_service.rotate(current_user, key_id)
+    return {
+        "id": str(api_key.uuid),
+        "api_key": raw_api_key,
+        "msg": "API key rotated successfully",
+    }
+
+
+@router.get("/usage", response_model=List[ApiKeyUsageSchema])
+async def read_api_key_usage(
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    current_user=Depends(get_current_account_user),
+):
+    """
+    Lists the usage of the authenticated user's API keys per time bucket.
+
+    Usage is counted in memory and written periodically; pending counts
+    are flushed before querying, so the result is up to date.
+
+    **Authentication:** Required
+
+    **Query Parameters:**
+    *   `start`: Only buckets starting at or after this time.
+    *   `end`: Only buckets starting before this time.
+
+    **Response Codes:**
+    *   `200 OK`: Usage buckets, newest first.
+    *   `401 Unauthorized`: Authentication required.
+    """
+    await usage_recorder.flush()
+    query = ApiKeyUsage.filter(api_key__user_id=current_user.user_id)
+    if start is not None:
+        query = query.filter(bucket_start__gte=start)
+    if end is not None:
+        query = query.filter(bucket_start__lt=end)
+    rows = await query.order_by("-bucket_start").values(
+        "api_key_id",
+        "bucket_start",
+        "request_count",
+        "bytes_served",
+        "last_used_at",
+        key_prefix="api_key__key_prefix",
     )
-    logger.debug("API key generated: %s", raw_api_key)
-    return {"api_key": raw_api_key, "msg": "API key generated successfully"}
+    return rows
@@ -1,29 +1,34 @@
 import logging
 from datetime import timedelta
 
-import bcrypt
-
 from fastapi import Request
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
 
 
 from app.config import settings
-from app.dependencies import limiter
-from app.core.auth import create_access_token
+from app.dependencies import (
+    get_current_account_user,
+    get_current_admin,
+    limiter,
+)
+from app.core.auth import create_user_token
 from app.models import User
 from app.core.auth import verify_password
 
-from app.schemas import UserCreate
+from app.schemas import RefreshTokenRequest, UserCreate, UserProvision
+from app.services.refresh_token_service import RefreshTokenService
+from app.services.user_service import UserService
 
 logger = logging.getLogger("app.api.auth")
 router = APIRouter()
+refresh_token_service = RefreshTokenService()
+user_service = UserService()
 
 
 @router.post("/register", status_code=201)
 @limiter.limit("10/minute")
 async def register(request: Request, user: UserCreate):
-    # Check if username or email already exists
     """
     Registers a new user.
 
@@ -33,29 +38,39 @@ async def register(request: Request, user: UserCreate):
     :raises HTTPException: If the username or email already exists
     """
     logger.debug(user)
-    existing_user = await User.filter(username=user.username).first()
-    if existing_user:
-        logger.error("Username %s already registered", user.username)
-        raise HTTPException(
-            status_code=400,
-            detail="Username already registered",
-        )
-    existing_email = await User.filter(email=user.email).first()
-    if existing_email:
-        raise HTTPException(status_code=400, detail="Email already registered")
-
-    hashed_password = bcrypt.hashpw(
-        user.password.encode("utf-8"),
-        bcrypt.gensalt(),
-    ).decode("utf-8")
-    await User.create(
-        username=user.username,
-        email=user.email,
-        hashed_password=hashed_password,
-    )
+    await user_service.register(user.username, user.email, user.password)
     return {"msg": "User registered successfully"}
 
 
+@router.post("/provision", status_code=201)
+@limiter.limit("10/minute")
+async def provision(
+    request: Request,
+    body: UserProvision,
+    current_user=Depends(get_current_admin),
+):
+    """
+    Creates many users at once from a list of invites. Administrators only.
+
+    Invites without a password get a random temporary password, returned
+    once in the response. Invites whose username or email already exists
+    are skipped. At most ``PROVISION_MAX_USERS`` (default 1000) invites are
+    accepted per request, processed ``PROVISION_BATCH_SIZE`` (default 100)
+    at a time.
+
+    :param request: The FastAPI request object
+    :param body: The invites
+    :param current_user: The authenticated administrator
+    :return: A JSON response with the created and skipped users
+    """
+    logger.info(
+        "User %s provisioning %d users",
+        current_user.username,
+        len(body.users),
+    )
+    return await user_service.provision(body.users)
+
+
 @router.post("/token")
 @limiter.limit("10/minute")
 async def login(
@@ -63,11 +78,12 @@ async def login(
     form_data: OAuth2PasswordRequestForm = Depends(),
 ):
     """
-    Authenticates a user and returns a JWT access token.
+    Authenticates a user and returns a JWT access token and a refresh token.
 
     :param request: The FastAPI request object
     :param form_data: The form data containing the username and password
-    :return: A JSON response with the access token and its type
+    :return: A JSON response with the access token, its type and a refresh
+        token to be exchanged at ``/auth/refresh``
     :raises HTTPException: If the username or password is incorrect, or if the user is disabled
     """
 
@@ -94,7 +110,70 @@ async def login(
     access_token_expires = timedelta(
         minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES,
     )
-    access_token = create_access_token(
-        data={"sub": user.username}, expires_delta=access_token_expires
+    access_token = create_user_token(user, expires_delta=access_token_expires)
+    refresh_token = await refresh_token_service.issue(user)
+    return {
+        "access_token": access_token,
+        "token_type": "bearer",
+        "refresh_token": refresh_token,
+    }
+
+
+@router.post("/refresh")
+@limiter.limit("30/minute")
+async def refresh(request: Request, body: RefreshTokenRequest):
+    """
+    Exchanges a refresh token for a new access token and refresh token.
+
+    Refresh tokens rotate: each one can be used once. Reusing a rotated
+    token revokes all tokens derived from the same login.
+
+    :param request: The FastAPI request object
+    :param body: The refresh token
+    :return: A JSON response with the new access token, its type and the
+        new refresh token
+    :raises HTTPException: If the refresh token is invalid, expired or
+        reused, or if the user is disabled
+    """
+    user, refresh_token = await refresh_token_service.rotate(body.refresh_token)
+    access_token = create_user_token(
+        user,
+        expires_delta=timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES),
     )
-    return {"access_token": access_token, "token_type": "bearer"}
+    return {
+        "access_token": access_token,
+        "token_type": "bearer",
+        "refresh_token": refresh_token,
+    }
+
+
+@router.post("/logout")
+@limiter.limit("30/minute")
+async def logout(request: Request, body: RefreshTokenRequest):
+    """
+    Revokes a refresh token and every token rotated from the same login.
+
+    :param request: The FastAPI request object
+    :param body: The refresh token
+    :return: A JSON response with a success message
+    """
+    await refresh_token_service.revoke(body.refresh_token)
+    return {"msg": "Logged out successfully"}
+
+
+@router.post("/revoke-all")
+@limiter.limit("10/minute")
+async def revoke_all(
+    request: Request,
+    current_user=Depends(get_current_account_user),
+):
+    """
+    Revokes all refresh tokens and access tokens of the authenticated user,
+    signing them out of every session.
+
+    :param request: The FastAPI request object
+    :param current_user: The authenticated user
+    :return: A JSON response with the number of revoked refresh tokens
+    """
+    revoked = await refresh_token_service.revoke_user(current_user)
+    return {"msg": "All sessions revoked", "revoked": revoked}
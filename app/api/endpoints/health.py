@@ -0,0 +1,39 @@
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+
+from app.core.health import health_checker
+
+router = APIRouter()
+
+
+@router.get("/health")
+@router.get("/health/live")
+async def liveness():
+    """
+    Reports that the process is up and serving requests. Does not check
+    dependencies; use `/health/ready` to decide whether to route traffic.
+
+    **Authentication:** Not required
+    """
+    return {"status": "ok"}
+
+
+@router.get("/health/ready")
+async def readiness():
+    """
+    Reports whether the API can serve traffic.
+
+    Checks database connectivity and latency (with a timeout), connection
+    pool saturation, rate-limit storage reachability and event-loop lag.
+    Results are cached for `HEALTH_CACHE_SECONDS`.
+
+    **Authentication:** Not required
+
+    **Response Codes:**
+    *   `200 OK`: All checks passed.
+    *   `503 Service Unavailable`: Startup did not complete or a check
+        failed. The body lists each check.
+    """
+    result = await health_checker.readiness()
+    status_code = 200 if result["status"] == "ok" else 503
+    return JSONResponse(status_code=status_code, content=result)
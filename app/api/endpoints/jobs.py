@@ -0,0 +1,129 @@
+import asyncio
+import logging
+import os
+import shutil
+import uuid
+
+from fastapi import APIRouter, Depends, HTTPException, Request, UploadFile
+from fastapi.responses import FileResponse
+
+from app.config import settings
+from app.core.auth import Principal
+from app.core.ratelimit import route_limit
+from app.dependencies import get_current_reader, get_current_user, limiter
+from app.models import Job
+from app.schemas import ExportJobCreate, JobSchema
+from app.services.export_service import EXPORT_MEDIA_TYPES
+from app.services.job_service import JOB_DONE, job_manager
+
+logger = logging.getLogger("app.api.jobs")
+router = APIRouter()
+
+
+def store_upload(source, path: str):
+    with open(path, "wb") as handle:
+        shutil.copyfileobj(source, handle)
+
+
+async def get_user_job(job_id: uuid.UUID, current_user: Principal) -> Job:
+    job = await Job.get_or_none(uuid=job_id, user_id=current_user.user_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@router.post("/export", status_code=202, response_model=JobSchema)
+@limiter.limit(route_limit("10/minute"))
+async def create_export_job(
+    request: Request,
+    params: ExportJobCreate,
+    current_user: Principal = Depends(get_current_reader),
+):
+    """
+    Enqueues a payment export job.
+
+    **Authentication:** Required (API keys need the ``read`` or ``full``
+    scope)
+
+    **Response Codes:**
+    *   `202 Accepted`: Job enqueued. Poll `GET /jobs/{id}` for progress.
+    *   `429 Too Many Requests`: Too many unfinished jobs for the user.
+    """
+    return await job_manager.submit(
+        current_user,
+        "export",
+        params.model_dump(),
+    )
+
+
+@router.post("/import", status_code=202, response_model=JobSchema)
+@limiter.limit(route_limit("10/minute"))
+async def create_import_job(
+    request: Request,
+    file: UploadFile,
+    current_user: Principal = Depends(get_current_user),
+):
+    """
+    Uploads a CSV file of payments and enqueues a job importing it.
+
+    The file must have a header line with the ``date``, ``document``,
+    ``beneficiary`` and ``amount`` columns (``uuid`` is optional). The
+    stored upload is deleted once the job finishes or fails.
+
+    **Authentication:** Required
+
+    **Response Codes:**
+    *   `202 Accepted`: Job enqueued. Poll `GET /jobs/{id}` for progress.
+    *   `429 Too Many Requests`: Too many unfinished jobs for the user.
+    """
+    os.makedirs(settings.JOBS_DIR, exist_ok=True)
+    path = os.path.join(settings.JOBS_DIR, f"upload-{uuid.uuid4()}.csv")
+    await asyncio.to_thread(store_upload, file.file, path)
+    logger.debug("Stored upload %s as %s", file.filename, path)
+    return await job_manager.submit(current_user, "import", {"path": path})
+
+
+@router.get("/{job_id}", response_model=JobSchema)
+async def read_job(
+    job_id: uuid.UUID,
+    current_user: Principal = Depends(get_current_user),
+):
+    """
+    Returns the status and progress (rows processed) of a job.
+
+    **Authentication:** Required
+
+    **Response Codes:**
+    *   `200 OK`: Job found.
+    *   `404 Not Found`: No such job for the authenticated user.
+    """
+    return await get_user_job(job_id, current_user)
+
+
+@router.get("/{job_id}/download")
+async def download_job_result(
+    job_id: uuid.UUID,
+    current_user: Principal = Depends(get_current_user),
+):
+    """
+    Downloads the result file of a finished job.
+
+    Range requests are supported, so large exports can be fetched in
+    parts and resumed.
+
+    **Authentication:** Required
+
+    **Response Codes:**
+    *   `200 OK` / `206 Partial Content`: Result file.
+    *   `404 Not Found`: No such job for the authenticated user.
+    *   `409 Conflict`: The job has not finished successfully.
+    """
+    job = await get_user_job(job_id, current_user)
+    if job.status != JOB_DONE or not job.result_path:
+        raise HTTPException(status_code=409, detail=f"Job is {job.status}")
+    extension = job.result_path.rsplit(".", 1)[-1]
+    return FileResponse(
+        job.result_path,
+        media_type=EXPORT_MEDIA_TYPES.get(extension, "application/json"),
+        filename=os.path.basename(job.result_path),
+    )
@@ -0,0 +1,43 @@
+import hashlib
+import json
+
+from fastapi import APIRouter, Request, Response
+
+from app.config import settings
+from app.core.auth import key_ring
+
+router = APIRouter()
+
+# The key set only changes on restart, so the body and its ETag are
+# computed once.
+_JWKS_BODY = json.dumps(key_ring.jwks, separators=(",", ":")).encode()
+_JWKS_ETAG = f'"{hashlib.sha256(_JWKS_BODY).hexdigest()[:32]}"'
+
+
+@router.get("/.well-known/jwks.json")
+async def read_jwks(request: Request):
+    """
+    Publishes the public keys used to sign access tokens as a JWK Set, so
+    other services can verify tokens locally.
+
+    Keys are identified by ``kid``; during a key rotation both the current
+    and the previous keys are listed. The response is cacheable for
+    ``JWKS_MAX_AGE_SECONDS`` and supports conditional requests.
+
+    **Authentication:** Not required
+
+    **Response Codes:**
+    *   `200 OK`: The key set (empty for HS* algorithms).
+    *   `304 Not Modified`: The client's cached copy is current.
+    """
+    headers = {
+        "Cache-Control": f"public, max-age={settings.JWKS_MAX_AGE_SECONDS}",
+        "ETag": _JWKS_ETAG,
+    }
+    if request.headers.get("if-none-match") == _JWKS_ETAG:
+        return Response(status_code=304, headers=headers)
+    return Response(
+        content=_JWKS_BODY,
+        media_type="application/jwk-set+json",
+        headers=headers,
+    )
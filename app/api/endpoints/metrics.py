@@ -0,0 +1,18 @@
+from fastapi import APIRouter, Response
+
+from app.core.metrics import registry
+
+router = APIRouter()
+
+
+@router.get("/metrics")
+async def read_metrics():
+    """
+    Exposes process metrics in the Prometheus text format.
+
+    **Authentication:** Not required. Restrict access at the network level.
+    """
+    return Response(
+        content=registry.render(),
+        media_type="text/plain; version=0.0.4",
+    )
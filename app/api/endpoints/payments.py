@@ -1,104 +1,424 @@
 # app/api/endpoints/payments.py
-from fastapi import Request, APIRouter, Depends
+from datetime import datetime
+from decimal import Decimal
+from typing import Annotated, Literal, Optional
 
+from fastapi import Request, APIRouter, Depends, Header
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import Response, StreamingResponse
+from pydantic import Field, TypeAdapter, ValidationError
 
-from app.services.payment_service import PaymentService
-from app.schemas import PaymentSchema
-from app.dependencies import get_current_user, limiter
-from app.models import User
+
+from app.config import settings
+from app.services.payment_service import PAYMENT_SORTS, PaymentService
+from app.services.export_service import ExportService, EXPORT_MEDIA_TYPES
+from app.services.idempotency_service import idempotency_service, request_hash
+from app.services.payment_cache import payment_cache
+from app.services.webhook_service import webhook_dispatcher
+from app.schemas import PaymentCreate, PaymentRecord
+from app.core.auth import Principal
+from app.core.queries import cancel_on_disconnect, route_timeout
+from app.core.ratelimit import charge_rows, page_cost, page_limit, route_limit
+from app.core.tracing import span
+from app.dependencies import get_current_principal, limiter
 
 router = APIRouter()
 payment_service = PaymentService()
+export_service = ExportService()
+payment_list_adapter = TypeAdapter(list[PaymentRecord])
+payment_record_adapter = TypeAdapter(PaymentRecord)
+payment_create_adapter = TypeAdapter(PaymentCreate)
+payment_batch_adapter = TypeAdapter(
+    Annotated[
+        list[PaymentCreate],
+        Field(min_length=1, max_length=settings.PAYMENT_BATCH_MAX_SIZE),
+    ]
+)
+
+
+def render_payments(payments: list) -> Response:
+    """
+    Serializes payment records to a JSON response.
 
-@router.get("/", response_model=list[PaymentSchema])
-@limiter.limit("20/minute")
+    Records are plain dicts whose ``amount`` is already an exact decimal
+    string, so they are dumped without validation or ``Decimal``
+    conversion, inside a span so the cost shows up in traces.
+    """
+    with span("serialize payments", {"payments.count": len(payments)}):
+        body = payment_list_adapter.dump_json(payments)
+    return Response(content=body, media_type="application/json")
+
+
+@router.get("/", response_model=list[PaymentRecord])
+@limiter.limit(route_limit("20/minute"), cost=page_cost)
 async def read_payments(
     request: Request,
     skip: int = 0,
-    limit: int = 100,
-    current_user: User = Depends(get_current_user),
+    limit: int = Depends(page_limit),
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    min_amount: Optional[Decimal] = None,
+    max_amount: Optional[Decimal] = None,
+    beneficiary: Optional[str] = None,
+    sort: Optional[Literal[PAYMENT_SORTS]] = None,
+    cursor: Optional[str] = None,
+    include_total: bool = False,
+    current_user: Principal = Depends(get_current_principal),
 ):
     """
     Retrieves a paginated list of payments.
 
-    This endpoint fetches a list of payments from the database with optional
-    pagination. It requires authentication and is rate-limited to 10 requests
-    per minute.
+    Without filters, this endpoint pages through the payments most recent
+    first with ``skip``/``limit``. With any of the filters, ``sort`` or
+    ``cursor``, it returns the matching payments in ``sort`` order
+    (``date``, ``-date``, ``amount`` or ``-amount``, default ``-date``)
+    and the ``X-Next-Cursor`` header while more pages remain; pass it
+    back as ``cursor``, with the same filters and sort, for the next page.
+    Sorting by date leaves out undated payments. Both listings only read
+    the payments table: archived payments are not listed.
+
+    With ``include_total``, the number of payments matching the filters
+    is returned in ``X-Total-Count`` and how it was obtained in
+    ``X-Total-Count-Mode``: ``exact`` (``COUNT(*)``) or, when the planner
+    expects at least ``PAYMENT_COUNT_EXACT_LIMIT`` rows, ``estimated``
+    (PostgreSQL planner statistics), followed by ``-live`` when archived
+    payments, which are not counted, may match the filters. It requires
+    authentication and is rate-limited to 20 units per minute, a page
+    costing one unit per ``RATE_LIMIT_ROWS_PER_UNIT`` rows of ``limit``.
 
     Args:
         request (Request): The FastAPI request object.
-        skip (int, optional): Number of records to skip. Defaults to 0.
-        limit (int, optional): Maximum number of records to return. Defaults to 100.
-        current_user (User): The authenticated user making the request.
+        skip (int, optional): Number of records to skip, without filters.
+            Defaults to 0.
+        limit (int, optional): Maximum number of records to return, at
+            most ``PAYMENT_PAGE_MAX_SIZE``. Defaults to 100.
+        start_date (datetime, optional): Earliest payment date.
+        end_date (datetime, optional): Latest payment date.
+        min_amount (Decimal, optional): Smallest amount.
+        max_amount (Decimal, optional): Largest amount.
+        beneficiary (str, optional): Exact beneficiary name.
+        sort (str, optional): Sort order. Defaults to ``-date``.
+        cursor (str, optional): ``X-Next-Cursor`` of the previous page.
+        include_total (bool, optional): Return the total count headers.
+            Defaults to False.
+        current_user (Principal): The authenticated caller.
 
     Returns:
-        List[PaymentSchema]: A list of payment records.
+        List[PaymentRecord]: A list of payment records.
 
     Raises:
-        HTTPException: If any error occurs while fetching the payments.
+        HTTPException: 400 if the cursor is invalid, 422 if ``limit`` is
+            out of range, 504 if the query
+            exceeds its ``QUERY_TIMEOUTS`` entry, 499 if the client
+            disconnects (the query is cancelled), 500 on other errors.
     """
-    payments = await payment_service.get_payments(
-        skip=skip,
-        limit=limit,
+    filters = {
+        "start": start_date,
+        "end": end_date,
+        "min_amount": min_amount,
+        "max_amount": max_amount,
+        "beneficiary": beneficiary,
+    }
+    searching = sort is not None or cursor is not None or any(
+        value is not None for value in filters.values()
     )
-    return payments
+    next_cursor = None
+    if searching:
+        sort = sort or "-date"
+        payments, next_cursor = await cancel_on_disconnect(
+            request,
+            payment_service.search_payments(
+                **filters,
+                sort=sort,
+                cursor=cursor,
+                limit=limit,
+                timeout=route_timeout(request),
+            ),
+        )
+    else:
+        payments = await cancel_on_disconnect(
+            request,
+            payment_service.get_payments(
+                skip=skip,
+                limit=limit,
+                timeout=route_timeout(request),
+            ),
+        )
+    response = render_payments(payments)
+    if next_cursor is not None:
+        response.headers["X-Next-Cursor"] = next_cursor
+    if include_total:
+        total, mode = await cancel_on_disconnect(
+            request,
+            payment_service.count_payments(
+                **filters,
+                sort=sort,
+                timeout=route_timeout(request),
+            ),
+        )
+        response.headers["X-Total-Count"] = str(total)
+        response.headers["X-Total-Count-Mode"] = mode
+    return response
 
-@router.get("/all", response_model=list[PaymentSchema])
-@limiter.limit("20/minute")
-async def read_payments(
+@router.get("/all", response_model=list[PaymentRecord])
+@limiter.limit(route_limit("20/minute"))
+async def read_all_payments(
     request: Request,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_principal),
 ):
     """
     Retrieves all payment records.
 
-    This endpoint fetches all available payment records from the database.
-    It requires authentication and is rate-limited to 10 requests per minute.
+    This endpoint fetches all available payment records from the database,
+    archived payments included.
+    It requires authentication and is rate-limited to 20 units per minute,
+    one unit per ``RATE_LIMIT_ROWS_PER_UNIT`` rows returned.
 
     Args:
         request (Request): The FastAPI request object.
-        current_user (User): The authenticated user making the request.
+        current_user (Principal): The authenticated caller.
 
     Returns:
-        List[PaymentSchema]: A list of all payment records.
+        List[PaymentRecord]: A list of all payment records.
 
     Raises:
-        HTTPException: If any error occurs while fetching the payments.
+        HTTPException: 504 if the query exceeds its ``QUERY_TIMEOUTS`` entry,
+            499 if the client disconnects (the query is cancelled), 500 on
+            other errors.
     """
 
-    payments = await payment_service.get_all_payments()
-    return payments
+    payments = await cancel_on_disconnect(
+        request,
+        payment_service.get_all_payments(timeout=route_timeout(request)),
+    )
+    charge_rows(request, len(payments))
+    return render_payments(payments)
 
-@router.get("/interval", response_model=list[PaymentSchema])
-@limiter.limit("20/minute")
+@router.get("/interval", response_model=list[PaymentRecord])
+@limiter.limit(route_limit("20/minute"))
 async def read_payment_by_interval(
     request: Request,
     start_date: str,
     end_date: str,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_principal),
 ):
     """
     Retrieves payments that occurred within a given date range.
 
     This endpoint fetches a list of payments from the database that occurred
     within the given date range. It requires authentication and is rate-limited
-    to 10 requests per minute.
+    to 20 units per minute, one unit per ``RATE_LIMIT_ROWS_PER_UNIT`` rows
+    returned.
 
     Args:
         request (Request): The FastAPI request object.
         start_date (str): The start date of the range in ISO 8601 format.
         end_date (str): The end date of the range in ISO 8601 format.
-        current_user (User): The authenticated user making the request.
+        current_user (Principal): The authenticated caller.
 
     Returns:
-        List[PaymentSchema]: A list of payment records that occurred within the given
+        List[PaymentRecord]: A list of payment records that occurred within the given
             date range.
 
     Raises:
-        HTTPException: If any error occurs while fetching the payments.
+        HTTPException: 504 if the query exceeds its ``QUERY_TIMEOUTS`` entry,
+            499 if the client disconnects (the query is cancelled), 500 on
+            other errors.
+    """
+    payments = await cancel_on_disconnect(
+        request,
+        payment_service.get_payment_by_interval(
+            start_date,
+            end_date,
+            timeout=route_timeout(request),
+        ),
+    )
+    charge_rows(request, len(payments))
+    return render_payments(payments)
+
+@router.get("/export")
+@limiter.limit(route_limit("5/minute"))
+async def export_payments(
+    request: Request,
+    format: Literal["arrow", "parquet"] = "arrow",
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    current_user: Principal = Depends(get_current_principal),
+):
+    """
+    Exports payments in a columnar format for analytics jobs.
+
+    Payments are read from the database in record batches and streamed as an
+    Apache Arrow IPC stream or a Parquet file, so memory stays bounded per
+    batch. ``amount`` is encoded as ``decimal128(15, 2)``. It requires
+    authentication and is rate-limited to 5 requests per minute.
+
+    Args:
+        request (Request): The FastAPI request object.
+        format (str, optional): ``arrow`` or ``parquet``. Defaults to ``arrow``.
+        start_date (str, optional): Lower bound of the date range in ISO 8601 format.
+        end_date (str, optional): Upper bound of the date range in ISO 8601 format.
+        current_user (Principal): The authenticated caller.
+
+    Returns:
+        StreamingResponse: The encoded payments.
+
+    Raises:
+        HTTPException: If a date is invalid or pyarrow is not installed.
     """
-    payments = await payment_service.get_payment_by_interval(
-        start_date,
-        end_date,
+    export_service.check_format(format)
+    start, end = export_service.parse_interval(start_date, end_date)
+    return StreamingResponse(
+        export_service.stream(format, start, end),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={
+            "Content-Disposition": f'attachment; filename="payments.{format}"',
+        },
     )
-    return payments
+
+async def create_payments(
+    request: Request,
+    principal: Principal,
+    idempotency_key: Optional[str],
+    batch: bool,
+) -> Response:
+    """
+    Creates one payment or a batch from the raw request body, at most once
+    per ``Idempotency-Key``.
+
+    The body is only parsed when the request actually runs, so a replayed
+    request returns the stored response without being validated or
+    inserted again. Replays carry an ``Idempotent-Replayed: true`` header.
+    """
+    body = await request.body()
+    created = []
+
+    async def handler(connection):
+        try:
+            if batch:
+                items = payment_batch_adapter.validate_json(body)
+            else:
+                items = [payment_create_adapter.validate_json(body)]
+        except ValidationError as err:
+            raise RequestValidationError(err.errors(include_url=False)) from err
+        payments = await payment_service.create_payments(items, connection)
+        created.extend(payments)
+        records = [payment_service.to_record(payment) for payment in payments]
+        if batch:
+            return 201, payment_list_adapter.dump_json(records)
+        return 201, payment_record_adapter.dump_json(records[0])
+
+    status_code, content, replayed = await idempotency_service.execute(
+        principal.user_id,
+        idempotency_key,
+        request_hash(request.method, request.url.path, body),
+        handler,
+    )
+    if created:
+        payment_cache.add_payments(created)
+        webhook_dispatcher.notify()
+        charge_rows(request, len(created))
+    return Response(
+        content=content,
+        status_code=status_code,
+        media_type="application/json",
+        headers={"Idempotent-Replayed": "true"} if replayed else None,
+    )
+
+@router.post(
+    "/",
+    status_code=201,
+    response_model=PaymentRecord,
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {
+                "application/json": {
+                    "schema": PaymentCreate.model_json_schema(),
+                },
+            },
+        },
+    },
+)
+@limiter.limit(route_limit("60/minute"))
+async def create_payment(
+    request: Request,
+    idempotency_key: Optional[str] = Header(
+        default=None,
+        alias="Idempotency-Key",
+    ),
+    current_user: Principal = Depends(get_current_principal),
+):
+    """
+    Creates a payment.
+
+    Sending an ``Idempotency-Key`` header makes retries safe: the payment is
+    created once and later requests with the same key get the same
+    response. It requires authentication and is rate-limited to 60 requests
+    per minute.
+
+    Args:
+        request (Request): The FastAPI request object, whose body is a
+            ``PaymentCreate``.
+        idempotency_key (str, optional): Client-chosen unique key.
+        current_user (Principal): The authenticated caller.
+
+    Returns:
+        PaymentRecord: The created payment.
+
+    Raises:
+        HTTPException: 409 if the document already exists or a request with
+            the same key is in progress, 422 if the body is invalid or the
+            key was used for a different request.
+    """
+    return await create_payments(request, current_user, idempotency_key, False)
+
+@router.post(
+    "/batch",
+    status_code=201,
+    response_model=list[PaymentRecord],
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {
+                "application/json": {
+                    "schema": {
+                        "type": "array",
+                        "items": PaymentCreate.model_json_schema(),
+                    },
+                },
+            },
+        },
+    },
+)
+@limiter.limit(route_limit("20/minute"))
+async def create_payment_batch(
+    request: Request,
+    idempotency_key: Optional[str] = Header(
+        default=None,
+        alias="Idempotency-Key",
+    ),
+    current_user: Principal = Depends(get_current_principal),
+):
+    """
+    Creates up to ``PAYMENT_BATCH_MAX_SIZE`` payments in one transaction.
+
+    Either every payment is created or none is. With an ``Idempotency-Key``
+    header the batch is applied once and retries get the same response. It
+    requires authentication and is rate-limited to 20 requests per minute.
+
+    Args:
+        request (Request): The FastAPI request object, whose body is a list
+            of ``PaymentCreate``.
+        idempotency_key (str, optional): Client-chosen unique key.
+        current_user (Principal): The authenticated caller.
+
+    Returns:
+        List[PaymentRecord]: The created payments.
+
+    Raises:
+        HTTPException: 409 if a document already exists or a request with
+            the same key is in progress, 422 if the body is invalid or the
+            key was used for a different request.
+    """
+    return await create_payments(request, current_user, idempotency_key, True)
@@ -0,0 +1,93 @@
+# app/api/endpoints/reconciliation.py
+from datetime import date
+from typing import List
+
+from fastapi import APIRouter, Depends, Query, Request
+
+from app.api.endpoints.payments import render_payments
+from app.core.auth import Principal
+from app.core.queries import cancel_on_disconnect, route_timeout
+from app.core.ratelimit import charge_rows, route_limit
+from app.dependencies import get_current_principal, limiter
+from app.schemas import PaymentRecord, ReconciliationReport
+from app.services.reconciliation_service import ReconciliationService
+
+router = APIRouter()
+reconciliation_service = ReconciliationService()
+
+
+@router.get(
+    "/fingerprints",
+    response_model=ReconciliationReport,
+    response_model_exclude_none=True,
+)
+@limiter.limit(route_limit("20/minute"))
+async def read_fingerprints(
+    request: Request,
+    start_date: date,
+    end_date: date,
+    hours: bool = False,
+    current_user: Principal = Depends(get_current_principal),
+):
+    """
+    Returns order-independent fingerprints of the payments dated from
+    `start_date` to `end_date` (UTC days, inclusive): one for the range,
+    one per day and, with `hours=true`, one per non-empty hour.
+
+    Compare the range fingerprint first, then the days, then the hours of
+    the days that differ, and fetch the rows of the remaining buckets with
+    `/reconciliation/rows`. See `app/services/reconciliation_service.py`
+    for how fingerprints are computed.
+
+    **Authentication:** Required
+
+    **Response Codes:**
+    *   `200 OK`: The fingerprints.
+    *   `400 Bad Request`: The range is empty or longer than
+        `RECONCILIATION_MAX_DAYS`.
+    *   `401 Unauthorized`: Authentication required.
+    *   `504 Gateway Timeout`: Computing the days not stored yet timed
+        out. The days computed so far are kept, so a retry goes further.
+    """
+    return await cancel_on_disconnect(
+        request,
+        reconciliation_service.fingerprints(
+            start_date,
+            end_date,
+            include_hours=hours,
+            timeout=route_timeout(request),
+        ),
+    )
+
+
+@router.get("/rows", response_model=list[PaymentRecord])
+@limiter.limit(route_limit("20/minute"))
+async def read_bucket_rows(
+    request: Request,
+    bucket: List[str] = Query(...),
+    current_user: Principal = Depends(get_current_principal),
+):
+    """
+    Returns the payments of mismatched buckets, by date. Each `bucket` is
+    a UTC day (`2026-01-31`) or hour (`2026-01-31T13`); repeat the
+    parameter for several buckets.
+
+    **Authentication:** Required
+
+    **Response Codes:**
+    *   `200 OK`: The payments. The rows served are charged to the rate
+        limit, one unit per `RATE_LIMIT_ROWS_PER_UNIT`.
+    *   `400 Bad Request`: A bucket is malformed, or more than
+        `RECONCILIATION_MAX_BUCKETS` were requested.
+    *   `401 Unauthorized`: Authentication required.
+    *   `504 Gateway Timeout`: The query timed out.
+    """
+    payments = await cancel_on_disconnect(
+        request,
+        reconciliation_service.bucket_rows(
+            bucket,
+            timeout=route_timeout(request),
+        ),
+    )
+    charge_rows(request, len(payments))
+    return render_payments(payments)
@@ -0,0 +1,83 @@
+import logging
+import uuid
+from typing import List
+
+from fastapi import APIRouter, Depends
+from app.dependencies import get_current_account_user
+from app.schemas import WebhookCreate, WebhookInfo
+from app.services.webhook_service import WebhookService
+
+logger = logging.getLogger("app.api.webhooks")
+router = APIRouter()
+webhook_service = WebhookService()
+
+
+@router.post("/", status_code=201)
+async def create_webhook(
+    params: WebhookCreate,
+    current_user=Depends(get_current_account_user),
+):
+    """
+    Subscribes a URL to the `payment.created` events.
+
+    Events are POSTed in batches as `{"events": [...]}`, each with an `id`,
+    `type`, `created_at` and the payment as `data`. Requests carry a
+    `Webhook-Timestamp` header and a `Webhook-Signature` header holding
+    `sha256=` and the hex HMAC-SHA256 of `"{timestamp}.{body}"` keyed with
+    the secret. Failed deliveries are retried with exponential backoff, so
+    an event may arrive more than once. Deliveries to hosts that no longer
+    resolve to public addresses fail like any other.
+
+    **Authentication:** Required
+
+    **Response Codes:**
+    *   `201 Created`: The subscription and its signing secret, which is
+        only returned here.
+    *   `400 Bad Request`: The URL does not resolve, or resolves to a
+        loopback, private, link-local or reserved address.
+    *   `401 Unauthorized`: Authentication required.
+    *   `422 Unprocessable Entity`: The URL is not a valid HTTP(S) URL.
+    """
+    subscription = await webhook_service.subscribe(current_user, str(params.url))
+    logger.debug(
+        "User %s subscribed %s",
+        current_user.username,
+        subscription.url,
+    )
+    return {
+        "id": str(subscription.uuid),
+        "url": subscription.url,
+        "secret": subscription.secret,
+        "msg": "Webhook created successfully",
+    }
+
+
+@router.get("/", response_model=List[WebhookInfo])
+async def list_webhooks(current_user=Depends(get_current_account_user)):
+    """
+    Lists the authenticated user's active webhooks.
+
+    **Authentication:** Required
+
+    **Response Codes:**
+    *   `200 OK`: The webhooks, newest first. Secrets are never returned.
+    *   `401 Unauthorized`: Authentication required.
+    """
+    return await webhook_service.list_subscriptions(current_user)
+
+
+@router.delete("/{webhook_id}", status_code=204)
+async def delete_webhook(
+    webhook_id: uuid.UUID,
+    current_user=Depends(get_current_account_user),
+):
+    """
+    Unsubscribes a webhook. Events not delivered yet are dropped.
+
+    **Authentication:** Required
+
+    **Response Codes:**
+    *   `204 No Content`: The webhook was removed.
+    *   `404 Not Found`: No such webhook for the user.
+    """
+    await webhook_service.unsubscribe(current_user, webhook_id)
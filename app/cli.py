@@ -0,0 +1,256 @@
+# app/cli.py
+"""
+Command line entry point for maintenance tasks.
+
+Usage:
+    python -m app.cli export --format parquet --output payments.parquet \\
+        --start-date 2025-01-01 --end-date 2025-01-31
+    python -m app.cli import data/payments.sql --workers 4
+    python -m app.cli archive --before 2024-01-01
+    python -m app.cli worker
+    python -m app.cli webhooks
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+from tortoise import Tortoise
+
+from app.config import settings, TORTOISE_ORM
+from app.logging_config import setup_logging
+from app.services.archive_service import payment_archive
+from app.services.export_service import ExportService, EXPORT_MEDIA_TYPES
+from app.services.import_service import ImportService
+from app.services.import_sources import IMPORT_FORMATS
+from app.services.job_service import job_manager
+from app.services.webhook_service import webhook_dispatcher
+
+logger = logging.getLogger("app.cli")
+
+
+async def run_export(args: argparse.Namespace) -> int:
+    """
+    Writes payments to a local Arrow IPC or Parquet file.
+    """
+    export_service = ExportService()
+    export_service.check_format(args.format)
+    start, end = export_service.parse_interval(args.start_date, args.end_date)
+    await Tortoise.init(config=TORTOISE_ORM)
+    try:
+        written = await export_service.write(
+            args.format,
+            args.output,
+            start,
+            end,
+            batch_size=args.batch_size,
+        )
+    finally:
+        await Tortoise.close_connections()
+    print(f"{written} bytes written to {args.output}")
+    return 0
+
+
+async def run_import(args: argparse.Namespace) -> int:
+    """
+    Loads payments from a CSV file or SQL dump, resuming an interrupted
+    import of the same file from its checkpoint.
+    """
+    checkpoint = args.checkpoint or f"{args.path}.import.json"
+    if args.restart and os.path.exists(checkpoint):
+        os.remove(checkpoint)
+    started = time.monotonic()
+
+    async def report(rows: int):
+        elapsed = time.monotonic() - started
+        print(
+            f"\r{rows} rows committed ({rows / max(elapsed, 1e-9):.0f} rows/s)",
+            end="",
+            file=sys.stderr,
+            flush=True,
+        )
+
+    await Tortoise.init(config=TORTOISE_ORM)
+    try:
+        imported = await ImportService().import_file(
+            args.path,
+            args.format,
+            batch_size=args.batch_size,
+            workers=args.workers,
+            checkpoint_path=checkpoint,
+            on_progress=report,
+        )
+    except ValueError as err:
+        print(f"\nImport stopped: {err}", file=sys.stderr)
+        return 1
+    finally:
+        await Tortoise.close_connections()
+    print(
+        f"\n{imported} rows imported from {args.path} "
+        f"in {time.monotonic() - started:.1f}s",
+        file=sys.stderr,
+    )
+    return 0
+
+
+async def run_archive(args: argparse.Namespace) -> int:
+    """
+    Moves payments dated before the cutoff to the compressed archive.
+    """
+    if args.before:
+        try:
+            cutoff = datetime.fromisoformat(args.before)
+        except ValueError as err:
+            print(f"Invalid --before date: {err}", file=sys.stderr)
+            return 1
+    else:
+        cutoff = datetime.now(timezone.utc) - timedelta(
+            days=settings.ARCHIVE_AFTER_DAYS
+        )
+    await Tortoise.init(config=TORTOISE_ORM)
+    try:
+        moved = await payment_archive.archive(cutoff, batch_size=args.batch_size)
+    except RuntimeError as err:
+        print(f"Archive stopped: {err}", file=sys.stderr)
+        return 1
+    finally:
+        await Tortoise.close_connections()
+    print(f"{moved} payments archived to {payment_archive.directory}")
+    return 0
+
+
+async def run_worker(args: argparse.Namespace) -> int:
+    """
+    Runs queued export and import jobs until interrupted.
+    """
+    await Tortoise.init(config=TORTOISE_ORM)
+    logger.info("Job worker started")
+    try:
+        await job_manager.run_worker(poll_interval=args.poll_interval)
+    finally:
+        await Tortoise.close_connections()
+    return 0
+
+
+async def run_webhooks(args: argparse.Namespace) -> int:
+    """
+    Delivers queued webhook events until interrupted.
+    """
+    await Tortoise.init(config=TORTOISE_ORM)
+    logger.info("Webhook dispatcher started")
+    try:
+        await webhook_dispatcher.run()
+    finally:
+        await Tortoise.close_connections()
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m app.cli")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export = commands.add_parser(
+        "export",
+        help="Export payments as Arrow IPC stream or Parquet file",
+    )
+    export.add_argument(
+        "--format",
+        choices=sorted(EXPORT_MEDIA_TYPES),
+        default="parquet",
+    )
+    export.add_argument("--output", required=True)
+    export.add_argument("--start-date", default=None)
+    export.add_argument("--end-date", default=None)
+    export.add_argument(
+        "--batch-size",
+        type=int,
+        default=settings.EXPORT_BATCH_SIZE,
+    )
+    export.set_defaults(handler=run_export)
+
+    load = commands.add_parser(
+        "import",
+        help="Import payments from a CSV file or a SQL dump",
+    )
+    load.add_argument("path")
+    load.add_argument(
+        "--format",
+        choices=IMPORT_FORMATS,
+        default=None,
+        help="Defaults to the file extension",
+    )
+    load.add_argument(
+        "--batch-size",
+        type=int,
+        default=settings.IMPORT_BATCH_SIZE,
+    )
+    load.add_argument(
+        "--workers",
+        type=int,
+        default=settings.IMPORT_WORKERS,
+        help="Batches inserted in parallel, each over its own connection",
+    )
+    load.add_argument(
+        "--checkpoint",
+        default=None,
+        help="Progress file (default: PATH.import.json)",
+    )
+    load.add_argument(
+        "--restart",
+        action="store_true",
+        help="Ignore the progress of an earlier run",
+    )
+    load.set_defaults(handler=run_import)
+
+    archive = commands.add_parser(
+        "archive",
+        help="Move old payments to compressed Arrow files",
+    )
+    archive.add_argument(
+        "--before",
+        default=None,
+        help=(
+            "Archive payments dated before this ISO 8601 date "
+            f"(default: {settings.ARCHIVE_AFTER_DAYS} days ago)"
+        ),
+    )
+    archive.add_argument(
+        "--batch-size",
+        type=int,
+        default=settings.EXPORT_BATCH_SIZE,
+    )
+    archive.set_defaults(handler=run_archive)
+
+    worker = commands.add_parser(
+        "worker",
+        help="Run queued jobs (use with JOBS_MODE=worker)",
+    )
+    worker.add_argument(
+        "--poll-interval",
+        type=float,
+        default=settings.JOB_POLL_SECONDS,
+    )
+    worker.set_defaults(handler=run_worker)
+
+    webhooks = commands.add_parser(
+        "webhooks",
+        help="Deliver webhook events (use with WEBHOOK_DELIVERY_ENABLED=false)",
+    )
+    webhooks.set_defaults(handler=run_webhooks)
+    return parser
+
+
+def main(argv=None) -> int:
+    setup_logging()
+    args = build_parser().parse_args(argv)
+    try:
+        return asyncio.run(args.handler(args))
+    except KeyboardInterrupt:
+        return 130
+
+
+if __name__ == "__main__":
+    sys.exit(main())
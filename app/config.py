@@ -1,5 +1,9 @@
 # app/config.py
+from typing import Optional
+
+from pydantic import model_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
+from tortoise.backends.base.config_generator import expand_db_url
 
 class Settings(BaseSettings):
     APP_NAME: str = "App"
@@ -9,17 +13,165 @@ class Settings(BaseSettings):
     DATABASE_URL: str
     SECRET_KEY: str
     ALGORITHM: str = "HS256"
+    JWT_PRIVATE_KEY_FILE: Optional[str] = None
+    JWT_PRIVATE_KEY_PASSWORD: Optional[str] = None
+    JWT_PUBLIC_KEY_FILES: list = []
+    JWKS_MAX_AGE_SECONDS: int = 300
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+    REFRESH_TOKEN_EXPIRE_DAYS: int = 30
+    REVOCATION_REFRESH_SECONDS: float = 30.0
+    PASSWORD_HASH_WORKERS: int = 4
+    # Invites are looked up, hashed and inserted this many at a time.
+    PROVISION_BATCH_SIZE: int = 100
+    # Each invite costs a bcrypt hash, spread over PASSWORD_HASH_WORKERS.
+    PROVISION_MAX_USERS: int = 1000
+    API_KEY_CACHE_SIZE: int = 10000
+    RATE_LIMIT_ROWS_PER_UNIT: int = 100
+    API_KEY_USAGE_BUCKET_SECONDS: int = 3600
+    API_KEY_USAGE_FLUSH_SECONDS: float = 10.0
+    HEALTH_CACHE_SECONDS: float = 2.0
+    HEALTH_DB_TIMEOUT_SECONDS: float = 1.0
+    HEALTH_POOL_SATURATION_THRESHOLD: float = 0.9
+    HEALTH_LOOP_LAG_THRESHOLD_SECONDS: float = 0.5
+    # Lag sampling period of the readiness check when the loop monitor is off.
+    HEALTH_LOOP_SAMPLE_SECONDS: float = 0.5
+    LOOP_MONITOR_ENABLED: bool = False
+    LOOP_MONITOR_INTERVAL_SECONDS: float = 0.1
+    LOOP_MONITOR_SLOW_SECONDS: float = 0.1
+    LOOP_MONITOR_HISTORY: int = 50
+    LOOP_MONITOR_STACK_DEPTH: int = 30
+    LOAD_SHEDDING_ENABLED: bool = False
+    LOAD_SHED_P95_TARGET_SECONDS: float = 1.0
+    LOAD_SHED_LAG_TARGET_SECONDS: float = 0.2
+    LOAD_SHED_LAG_INTERVAL_SECONDS: float = 0.1
+    LOAD_SHED_WINDOW_SECONDS: float = 10.0
+    LOAD_SHED_MIN_SAMPLES: int = 20
+    LOAD_SHED_QUEUE_TIMEOUT_SECONDS: float = 2.0
+    LOAD_SHED_RETRY_AFTER_SECONDS: int = 5
+    # Keys are "METHOD /path", "{api}" standing for API_PREFIX and
+    # API_VERSION. Unlisted routes are "normal" priority and have no
+    # concurrency cap.
+    ROUTE_PRIORITY: dict = {
+        "GET {api}/pagamentos/all": "low",
+        "GET {api}/pagamentos/export": "low",
+        "POST {api}/jobs/export": "low",
+        "POST {api}/jobs/import": "low",
+        "GET {api}/reconciliation/fingerprints": "low",
+        "GET /health": "high",
+        "GET /health/live": "high",
+        "GET /health/ready": "high",
+        "GET /metrics": "high",
+    }
+    ROUTE_CONCURRENCY: dict = {
+        "GET {api}/pagamentos/all": 2,
+        "GET {api}/pagamentos/export": 2,
+        "POST {api}/auth/token": 8,
+        "POST {api}/auth/register": 4,
+    }
+    TRACING_ENABLED: bool = False
+    TRACING_EXPORTER: str = "otlp"
+    TRACING_OTLP_ENDPOINT: str = "http://localhost:4318/v1/traces"
+    TRACING_FILE: str = "logs/traces.jsonl"
+    TRACING_SAMPLE_RATIO: float = 1.0
+    TRACING_SERVICE_NAME: str = "api-payments"
+    PAYMENT_CACHE_ENABLED: bool = False
+    PAYMENT_CACHE_WINDOW_DAYS: int = 7
+    PAYMENT_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    PAYMENT_CACHE_REFRESH_SECONDS: float = 60.0
+    PAYMENT_BATCH_MAX_SIZE: int = 1000
+    # Largest listing page; at RATE_LIMIT_ROWS_PER_UNIT rows per unit it
+    # must fit in the listing's 20 units per minute.
+    PAYMENT_PAGE_MAX_SIZE: int = 1000
+    # Totals of listings expected to reach this many rows are estimated.
+    PAYMENT_COUNT_EXACT_LIMIT: int = 10000
+    IDEMPOTENCY_KEY_TTL_SECONDS: int = 86400
+    IDEMPOTENCY_LOCK_SECONDS: float = 60.0
+    IDEMPOTENCY_SWEEP_SECONDS: float = 300.0
+    WEBHOOK_DELIVERY_ENABLED: bool = True
+    WEBHOOK_POLL_SECONDS: float = 1.0
+    WEBHOOK_FETCH_SIZE: int = 1000
+    WEBHOOK_BATCH_SIZE: int = 100
+    WEBHOOK_DESTINATION_CONCURRENCY: int = 4
+    WEBHOOK_MAX_CONNECTIONS: int = 100
+    WEBHOOK_TIMEOUT_SECONDS: float = 10.0
+    WEBHOOK_LEASE_SECONDS: float = 60.0
+    WEBHOOK_MAX_ATTEMPTS: int = 10
+    WEBHOOK_RETRY_BASE_SECONDS: float = 2.0
+    WEBHOOK_RETRY_MAX_SECONDS: float = 3600.0
+    # Networks webhooks may reach although they are not public, e.g.
+    # ["127.0.0.1/32"] for a receiver on the same host.
+    WEBHOOK_ALLOWED_NETWORKS: list = []
+    # A day is closed, and its fingerprints stored, this long after it ends.
+    RECONCILIATION_SETTLE_SECONDS: float = 3600.0
+    RECONCILIATION_MAX_DAYS: int = 366
+    RECONCILIATION_MAX_BUCKETS: int = 100
+    QUERY_TIMEOUT_SECONDS: float = 30.0
+    # Keys are "METHOD /path", like ROUTE_PRIORITY.
+    QUERY_TIMEOUTS: dict = {
+        "GET {api}/pagamentos/": 5.0,
+        "GET {api}/pagamentos/interval": 15.0,
+        "GET {api}/pagamentos/all": 60.0,
+        "GET {api}/reconciliation/fingerprints": 60.0,
+    }
+    # PostgreSQL statement_timeout of every pooled connection, a backstop
+    # for queries the process fails to cancel. It also bounds exports,
+    # imports and migrations, so it is off by default.
+    DATABASE_STATEMENT_TIMEOUT_SECONDS: Optional[float] = None
+    # "orm" or "asyncpg" (raw prepared statements, PostgreSQL only).
+    REPOSITORY_BACKEND: str = "orm"
     API_VERSION: str = "v1"
     API_PREFIX: str = "/api/"
+    EXPORT_BATCH_SIZE: int = 10000
+    ARCHIVE_DIR: str = "archive"
+    # Default cutoff of the archive command, in days before now.
+    ARCHIVE_AFTER_DAYS: int = 730
+    # Arrow IPC buffer compression: "zstd" or "lz4".
+    ARCHIVE_COMPRESSION: str = "zstd"
+    IMPORT_BATCH_SIZE: int = 5000
+    IMPORT_WORKERS: int = 4
+    JOBS_DIR: str = "jobs"
+    JOBS_MODE: str = "inprocess"
+    JOB_TYPE_CONCURRENCY: dict = {"export": 2, "import": 1}
+    JOB_USER_CONCURRENCY: int = 1
+    JOB_MAX_PENDING_PER_USER: int = 10
+    JOB_POLL_SECONDS: float = 2.0
 
     model_config = SettingsConfigDict(env_file=".api.config")
 
+    @model_validator(mode="after")
+    def expand_route_keys(self):
+        api = f"{self.API_PREFIX}{self.API_VERSION}"
+        for name in ("ROUTE_PRIORITY", "ROUTE_CONCURRENCY", "QUERY_TIMEOUTS"):
+            routes = getattr(self, name)
+            setattr(self, name, {
+                key.replace("{api}", api): value
+                for key, value in routes.items()
+            })
+        return self
+
 
 settings = Settings()
 
+
+
+def database_connection(url: str):
+    """
+    Returns the Tortoise connection config of ``url``: the URL itself,
+    or on PostgreSQL with ``DATABASE_STATEMENT_TIMEOUT_SECONDS`` its
+    expansion with the timeout as a server setting of the pool.
+    """
+    seconds = settings.DATABASE_STATEMENT_TIMEOUT_SECONDS
+    if not seconds or not url.startswith(("postgres://", "asyncpg://")):
+        return url
+    config = expand_db_url(url)
+    config["credentials"].setdefault("server_settings", {})[
+        "statement_timeout"
+    ] = str(max(1, int(seconds * 1000)))
+    return config
+
+
 TORTOISE_ORM = {
-    "connections": {"default": settings.DATABASE_URL},
+    "connections": {"default": database_connection(settings.DATABASE_URL)},
     "apps": {
         "models": {
             "models": ["app.models", "aerich.models"],
@@ -1,13 +1,45 @@
 # app/core/auth.py
+import asyncio
+import hashlib
 import logging
 import bcrypt
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from datetime import datetime, timedelta, timezone
+from typing import Optional
 from app.config import settings
-import jwt
 from jwt import PyJWTError
+from app.core.keys import KeyRing
 
 logger = logging.getLogger("app.core.auth")
 
+# Keys are parsed once; verification then only looks them up by ``kid``.
+key_ring = KeyRing.from_settings()
+
+# bcrypt releases the GIL, so hashing in threads keeps the event loop free
+# and hashes several passwords in parallel.
+_password_pool = ThreadPoolExecutor(
+    max_workers=settings.PASSWORD_HASH_WORKERS,
+    thread_name_prefix="bcrypt",
+)
+
+# API keys already checked against their bcrypt hash, keyed by the SHA-256
+# of the raw key. Entries only skip bcrypt: the key row is still loaded on
+# every request, so revoked or expired keys are rejected regardless.
+_verified_api_keys: "OrderedDict[str, str]" = OrderedDict()
+
+
+@dataclass(frozen=True)
+class Principal:
+    """
+    Authenticated caller, resolved from token claims or an API key.
+    """
+
+    user_id: str
+    username: str
+    token_version: int = 0
+
 
 # Verify password
 def verify_password(plain_password: str, hashed_password: str) -> bool:
@@ -27,6 +59,87 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     )
 
 
+def hash_password(plain_password: str) -> str:
+    """
+    Hashes a password with bcrypt.
+
+    Args:
+        plain_password (str): The password to hash.
+
+    Returns:
+        str: The bcrypt hash.
+    """
+    return bcrypt.hashpw(
+        plain_password.encode("utf-8"),
+        bcrypt.gensalt(),
+    ).decode("utf-8")
+
+
+async def hash_password_async(plain_password: str) -> str:
+    """
+    Hashes a password in the password worker pool.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_password_pool, hash_password, plain_password)
+
+
+async def hash_passwords(plain_passwords: list) -> list:
+    """
+    Hashes several passwords in parallel in the password worker pool.
+
+    Args:
+        plain_passwords (list): The passwords to hash.
+
+    Returns:
+        list: The bcrypt hashes, in the same order.
+    """
+    return await asyncio.gather(
+        *(hash_password_async(password) for password in plain_passwords)
+    )
+
+
+async def verify_api_key(raw_key: str, hashed_key: str) -> bool:
+    """
+    Checks a raw API key against its stored bcrypt hash.
+
+    The first check of a key runs bcrypt in the password worker pool;
+    successful checks are remembered (up to ``API_KEY_CACHE_SIZE`` keys),
+    so later requests with the same key only compare hashes.
+
+    Args:
+        raw_key (str): The API key sent by the client.
+        hashed_key (str): The bcrypt hash stored for the key.
+
+    Returns:
+        bool: True if the key matches the hash.
+    """
+    digest = hashlib.sha256(raw_key.encode("utf-8")).hexdigest()
+    if _verified_api_keys.get(digest) == hashed_key:
+        _verified_api_keys.move_to_end(digest)
+        return True
+    loop = asyncio.get_running_loop()
+    valid = await loop.run_in_executor(
+        _password_pool,
+        verify_password,
+        raw_key,
+        hashed_key,
+    )
+    if valid:
+        _verified_api_keys[digest] = hashed_key
+        if len(_verified_api_keys) > settings.API_KEY_CACHE_SIZE:
+            _verified_api_keys.popitem(last=False)
+    return valid
+
+
+def forget_api_key(hashed_key: str):
+    """
+    Drops a revoked or rotated key from the verification cache.
+    """
+    for digest, cached in list(_verified_api_keys.items()):
+        if cached == hashed_key:
+            del _verified_api_keys[digest]
+
+
 def create_access_token(data: dict, expires_delta: timedelta = None):
     """
     Creates an access token for a given user.
@@ -46,31 +159,81 @@ def create_access_token(data: dict, expires_delta: timedelta = None):
             minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES
         )
     to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(
-        to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM
-    )
+    encoded_jwt = key_ring.encode(to_encode)
     return encoded_jwt
 
 
-def verify_token(token: str):
+def create_user_token(user, expires_delta: timedelta = None):
     """
-    Verifies a JWT token.
+    Creates an access token carrying the claims needed to authenticate
+    the user without a database lookup.
 
     Args:
-        token (str): The JWT token to verify.
+        user (User): The user the token is issued to.
+        expires_delta (timedelta, optional): Token lifetime. Defaults to
+            ``ACCESS_TOKEN_EXPIRE_MINUTES``.
 
     Returns:
-        str: The username if the token is valid, None otherwise.
+        str: The encoded JWT.
+    """
+    return create_access_token(
+        data={
+            "sub": user.username,
+            "uid": str(user.uuid),
+            "ver": user.token_version,
+        },
+        expires_delta=expires_delta,
+    )
+
+
+def decode_token(token: str) -> dict:
+    """
+    Decodes and validates a JWT token.
+
+    Args:
+        token (str): The JWT token to decode.
+
+    Returns:
+        dict: The token claims.
+
+    Raises:
+        PyJWTError: If the token is invalid or expired.
     """
     try:
-        payload = jwt.decode(
-            token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]
-        )
-        logger.debug("Token payload: %s", payload)
-        username: str = payload.get("sub")
-        if username is None:
-            return None
-        return username
+        return key_ring.decode(token)
     except PyJWTError as err:
         logger.error("JWT error: %s", err)
         raise err
+
+
+def principal_from_claims(claims: dict) -> Optional[Principal]:
+    """
+    Builds a Principal from token claims, if the token carries the user id
+    and token version.
+
+    Returns:
+        Optional[Principal]: None for tokens issued without these claims.
+    """
+    user_id = claims.get("uid")
+    username = claims.get("sub")
+    token_version = claims.get("ver")
+    if user_id is None or username is None or token_version is None:
+        return None
+    return Principal(
+        user_id=user_id,
+        username=username,
+        token_version=token_version,
+    )
+
+
+def verify_token(token: str):
+    """
+    Verifies a JWT token.
+
+    Args:
+        token (str): The JWT token to verify.
+
+    Returns:
+        str: The username if the token is valid, None otherwise.
+    """
+    return decode_token(token).get("sub")
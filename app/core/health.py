@@ -0,0 +1,168 @@
+# app/core/health.py
+import asyncio
+import logging
+import time
+from typing import Optional
+
+from tortoise import connections
+
+from app.config import settings
+from app.core.loop_monitor import loop_monitor
+from app.dependencies import limiter
+
+logger = logging.getLogger("app.core.health")
+
+
+class HealthChecker:
+    """
+    Readiness probes for the API and its dependencies.
+
+    Each probe returns a dict with ``ok`` and details such as its latency.
+    Results are cached for ``HEALTH_CACHE_SECONDS`` and concurrent callers
+    share a single run, so frequent load balancer checks do not turn into
+    database load.
+
+    Event-loop lag comes from the loop monitor when it runs; otherwise a
+    task of its own sleeps ``HEALTH_LOOP_SAMPLE_SECONDS`` at a time and
+    records how late it wakes up.
+    """
+
+    def __init__(self, limiter=None):
+        self.limiter = limiter
+        self.started = False
+        self._result: Optional[dict] = None
+        self._checked_at = 0.0
+        self._running: Optional[asyncio.Task] = None
+        self._lag: Optional[float] = None
+        self._sampler: Optional[asyncio.Task] = None
+
+    def start(self):
+        self.started = True
+        self._result = None
+        if not loop_monitor.running and self._sampler is None:
+            self._lag = None
+            self._sampler = asyncio.create_task(
+                self._sample_lag(settings.HEALTH_LOOP_SAMPLE_SECONDS)
+            )
+
+    def stop(self):
+        self.started = False
+        self._result = None
+        if self._sampler is not None:
+            self._sampler.cancel()
+            self._sampler = None
+
+    async def _sample_lag(self, interval: float):
+        loop = asyncio.get_running_loop()
+        while True:
+            due = loop.time() + interval
+            await asyncio.sleep(interval)
+            self._lag = max(0.0, loop.time() - due)
+
+    async def check_database(self) -> dict:
+        start = time.perf_counter()
+        try:
+            connection = connections.get("default")
+            await asyncio.wait_for(
+                connection.execute_query("SELECT 1"),
+                timeout=settings.HEALTH_DB_TIMEOUT_SECONDS,
+            )
+        except asyncio.TimeoutError:
+            return {"ok": False, "error": "timeout"}
+        except Exception as err:
+            return {"ok": False, "error": str(err)}
+        return {
+            "ok": True,
+            "latency_ms": round((time.perf_counter() - start) * 1000, 2),
+        }
+
+    def check_pool(self) -> dict:
+        try:
+            pool = getattr(connections.get("default"), "_pool", None)
+        except Exception as err:
+            return {"ok": False, "error": str(err)}
+        if pool is None:
+            # SQLite, or a pool that is created on first use.
+            return {"ok": True, "size": None}
+        in_use = pool.get_size() - pool.get_idle_size()
+        max_size = pool.get_max_size()
+        saturation = in_use / max_size if max_size else 0.0
+        return {
+            "ok": saturation < settings.HEALTH_POOL_SATURATION_THRESHOLD,
+            "in_use": in_use,
+            "size": max_size,
+            "saturation": round(saturation, 2),
+        }
+
+    async def check_rate_limit_storage(self) -> dict:
+        if self.limiter is None:
+            return {"ok": True}
+        start = time.perf_counter()
+        try:
+            # Storage checks are synchronous and may hit the network (Redis).
+            ok = await asyncio.wait_for(
+                asyncio.to_thread(self.limiter._storage.check),
+                timeout=settings.HEALTH_DB_TIMEOUT_SECONDS,
+            )
+        except asyncio.TimeoutError:
+            return {"ok": False, "error": "timeout"}
+        except Exception as err:
+            return {"ok": False, "error": str(err)}
+        return {
+            "ok": bool(ok),
+            "latency_ms": round((time.perf_counter() - start) * 1000, 2),
+        }
+
+    def check_event_loop(self) -> dict:
+        lag = loop_monitor.last_lag if loop_monitor.running else self._lag
+        if lag is None:
+            # No sample yet: not known to be lagging.
+            return {"ok": True, "lag_ms": None}
+        return {
+            "ok": lag < settings.HEALTH_LOOP_LAG_THRESHOLD_SECONDS,
+            "lag_ms": round(lag * 1000, 2),
+        }
+
+    async def _probe(self) -> dict:
+        if not self.started:
+            return {"status": "unavailable", "checks": {}}
+        database, rate_limit_storage = await asyncio.gather(
+            self.check_database(),
+            self.check_rate_limit_storage(),
+        )
+        checks = {
+            "database": database,
+            "pool": self.check_pool(),
+            "rate_limit_storage": rate_limit_storage,
+            "event_loop": self.check_event_loop(),
+        }
+        ok = all(check["ok"] for check in checks.values())
+        if not ok:
+            logger.warning("Readiness check failed: %s", checks)
+        return {"status": "ok" if ok else "unavailable", "checks": checks}
+
+    async def readiness(self) -> dict:
+        """
+        Returns the cached readiness result, probing again if it is older
+        than ``HEALTH_CACHE_SECONDS``.
+        """
+        now = time.monotonic()
+        if (
+            self._result is not None
+            and now - self._checked_at < settings.HEALTH_CACHE_SECONDS
+        ):
+            return self._result
+        if self._running is None:
+            self._running = asyncio.create_task(self._probe())
+        task = self._running
+        try:
+            result = await asyncio.shield(task)
+        finally:
+            if self._running is task and task.done():
+                self._running = None
+        self._result = result
+        self._checked_at = time.monotonic()
+        return result
+
+
+health_checker = HealthChecker(limiter)
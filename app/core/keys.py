@@ -0,0 +1,188 @@
+# app/core/keys.py
+import base64
+import hashlib
+import json
+import logging
+from typing import Dict, List, Optional, Tuple
+
+import jwt
+from jwt.algorithms import get_default_algorithms
+from jwt.exceptions import InvalidKeyError, InvalidTokenError
+
+from app.config import settings
+
+logger = logging.getLogger("app.core.keys")
+
+# Members of a JWK that make up its RFC 7638 thumbprint, by key type.
+_THUMBPRINT_MEMBERS = {
+    "RSA": ("e", "kty", "n"),
+    "EC": ("crv", "kty", "x", "y"),
+    "OKP": ("crv", "kty", "x"),
+}
+_EC_ALGORITHMS = {"P-256": "ES256", "P-384": "ES384", "P-521": "ES512"}
+
+
+def is_symmetric(algorithm: str) -> bool:
+    return algorithm.startswith("HS")
+
+
+def jwk_thumbprint(jwk: dict) -> str:
+    """
+    Computes the RFC 7638 thumbprint of a public JWK, used as its ``kid``.
+    """
+    members = {name: jwk[name] for name in _THUMBPRINT_MEMBERS[jwk["kty"]]}
+    digest = hashlib.sha256(
+        json.dumps(members, separators=(",", ":"), sort_keys=True).encode()
+    ).digest()
+    return base64.urlsafe_b64encode(digest).rstrip(b"=").decode()
+
+
+class KeyRing:
+    """
+    Signing key and verification keys for access tokens.
+
+    With an ``HS*`` algorithm the shared ``SECRET_KEY`` is used for both.
+    With an asymmetric algorithm (RS256, ES256, EdDSA, ...) tokens are
+    signed with the private key and carry its ``kid``; verification picks
+    the public key by ``kid`` from keys parsed once at startup. Public keys
+    of previous signing keys can be kept in the ring during a rotation, so
+    tokens they signed stay valid until they expire.
+    """
+
+    def __init__(
+        self,
+        algorithm: str,
+        secret_key: Optional[str] = None,
+        private_key_pem: Optional[bytes] = None,
+        public_keys_pem: Optional[List[bytes]] = None,
+        private_key_password: Optional[bytes] = None,
+    ):
+        self.algorithm = algorithm
+        self.signing_kid: Optional[str] = None
+        self._verification_keys: Dict[Optional[str], Tuple[object, str]] = {}
+        self._jwks: List[dict] = []
+        algorithm_obj = get_default_algorithms()[algorithm]
+
+        if is_symmetric(algorithm):
+            self.signing_key = algorithm_obj.prepare_key(secret_key)
+            self._verification_keys[None] = (self.signing_key, algorithm)
+            return
+
+        if private_key_pem is None:
+            raise InvalidKeyError(
+                f"{algorithm} requires JWT_PRIVATE_KEY_FILE to be set"
+            )
+        from cryptography.hazmat.primitives.serialization import (
+            load_pem_private_key,
+            load_pem_public_key,
+        )
+
+        self.signing_key = load_pem_private_key(
+            private_key_pem,
+            password=private_key_password,
+        )
+        self.signing_kid = self._add_public_key(
+            self.signing_key.public_key(),
+            algorithm,
+        )
+        for pem in public_keys_pem or []:
+            self._add_public_key(load_pem_public_key(pem))
+
+    def _add_public_key(self, public_key, algorithm: Optional[str] = None) -> str:
+        jwk = self._to_jwk(public_key)
+        algorithm = algorithm or self._default_algorithm(jwk)
+        kid = jwk_thumbprint(jwk)
+        jwk.update({"kid": kid, "alg": algorithm, "use": "sig"})
+        if kid not in self._verification_keys:
+            self._verification_keys[kid] = (public_key, algorithm)
+            self._jwks.append(jwk)
+        return kid
+
+    @staticmethod
+    def _to_jwk(public_key) -> dict:
+        from cryptography.hazmat.primitives.asymmetric import ec, rsa
+
+        if isinstance(public_key, rsa.RSAPublicKey):
+            name = "RS256"
+        elif isinstance(public_key, ec.EllipticCurvePublicKey):
+            name = "ES256"
+        else:
+            name = "EdDSA"
+        try:
+            return get_default_algorithms()[name].to_jwk(public_key, as_dict=True)
+        except (AttributeError, InvalidKeyError) as err:
+            raise InvalidKeyError(
+                f"Unsupported public key: {type(public_key).__name__}"
+            ) from err
+
+    def _default_algorithm(self, jwk: dict) -> str:
+        if jwk["kty"] == "OKP":
+            return "EdDSA"
+        if jwk["kty"] == "EC":
+            return _EC_ALGORITHMS[jwk["crv"]]
+        if self.algorithm[:2] in ("RS", "PS"):
+            return self.algorithm
+        return "RS256"
+
+    @property
+    def jwks(self) -> dict:
+        """
+        Public keys as a JWK Set. Empty for symmetric algorithms.
+        """
+        return {"keys": list(self._jwks)}
+
+    def encode(self, claims: dict) -> str:
+        headers = {"kid": self.signing_kid} if self.signing_kid else None
+        return jwt.encode(
+            claims,
+            self.signing_key,
+            algorithm=self.algorithm,
+            headers=headers,
+        )
+
+    def decode(self, token: str) -> dict:
+        """
+        Verifies a token with the key named by its ``kid`` header.
+
+        Raises:
+            PyJWTError: If the token is invalid, expired, or signed with an
+                unknown key.
+        """
+        kid = None
+        if self.signing_kid is not None:
+            kid = jwt.get_unverified_header(token).get("kid")
+        try:
+            key, algorithm = self._verification_keys[kid]
+        except KeyError as err:
+            raise InvalidTokenError(f"Unknown key id: {kid}") from err
+        return jwt.decode(token, key, algorithms=[algorithm])
+
+    @classmethod
+    def from_settings(cls) -> "KeyRing":
+        """
+        Builds the key ring from ``Settings``, reading key files once.
+        """
+        if is_symmetric(settings.ALGORITHM):
+            return cls(settings.ALGORITHM, secret_key=settings.SECRET_KEY)
+
+        def read(path: str) -> bytes:
+            with open(path, "rb") as handle:
+                return handle.read()
+
+        password = settings.JWT_PRIVATE_KEY_PASSWORD
+        ring = cls(
+            settings.ALGORITHM,
+            private_key_pem=(
+                read(settings.JWT_PRIVATE_KEY_FILE)
+                if settings.JWT_PRIVATE_KEY_FILE
+                else None
+            ),
+            public_keys_pem=[read(path) for path in settings.JWT_PUBLIC_KEY_FILES],
+            private_key_password=password.encode() if password else None,
+        )
+        logger.info(
+            "Loaded %d JWT verification keys, signing with kid %s",
+            len(ring._jwks),
+            ring.signing_kid,
+        )
+        return ring
@@ -0,0 +1,251 @@
+# app/core/load_shedding.py
+import asyncio
+import bisect
+import logging
+import math
+import time
+from collections import Counter, deque
+from typing import Deque, Dict, Optional, Tuple
+
+from starlette.responses import JSONResponse
+
+from app.config import settings
+from app.core.metrics import registry
+
+logger = logging.getLogger("app.core.load_shedding")
+
+# A route is shed once the overload level reaches its rank, so "high"
+# routes (health checks, metrics) are never shed.
+PRIORITY_RANKS = {"low": 1, "normal": 2, "high": 3}
+MAX_LEVEL = 2
+# Latencies are counted in buckets 9% wide, from 1 ms to about 130 s,
+# and the window in ten slots, so the p95 costs the same at any rate.
+LATENCY_BOUNDS = tuple(0.001 * 2 ** (i / 8) for i in range(137))
+WINDOW_SLOTS = 10
+
+SHED_REQUESTS = registry.counter(
+    "load_shed_requests_total",
+    "Requests rejected with 503, by route and reason (overload, queue_timeout).",
+    ["route", "reason"],
+)
+OVERLOAD_LEVEL = registry.gauge(
+    "load_shed_level",
+    "Overload level: 0 normal, 1 shedding low priority, 2 shedding normal priority.",
+)
+ROUTE_IN_FLIGHT = registry.gauge(
+    "route_in_flight",
+    "Requests running on routes with a concurrency cap.",
+    ["route"],
+)
+QUEUE_WAIT = registry.histogram(
+    "route_queue_wait_seconds",
+    "Time requests waited for a slot on routes with a concurrency cap.",
+    ["route"],
+    buckets=(0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+
+
+def route_key(scope: dict) -> str:
+    """
+    Returns ``"METHOD /path"``, the key of ``ROUTE_PRIORITY`` and
+    ``ROUTE_CONCURRENCY``.
+    """
+    return f"{scope.get('method')} {scope.get('path')}"
+
+
+class LoadShedder:
+    """
+    Decides which requests to reject when the API is overloaded.
+
+    The overload level is derived from the p95 latency of the requests
+    completed in the last ``LOAD_SHED_WINDOW_SECONDS`` and from event
+    loop lag, sampled every ``LOAD_SHED_LAG_INTERVAL_SECONDS``. Past
+    their target, low priority routes are shed; past twice their target,
+    normal priority routes too. Latencies of low priority routes are not
+    counted, since long exports are expected to be slow.
+
+    Independently of the level, routes listed in ``ROUTE_CONCURRENCY``
+    run at most that many requests at a time; the others wait up to
+    ``LOAD_SHED_QUEUE_TIMEOUT_SECONDS`` for a slot.
+    """
+
+    def __init__(self):
+        self.running = False
+        self.level = 0
+        self.lag = 0.0
+        # (slot number, latency counts by bucket) of the recent slots, and
+        # their sum over the window.
+        self._windows: Deque[Tuple[int, Counter]] = deque()
+        self._totals = [0] * (len(LATENCY_BOUNDS) + 1)
+        self._samples = 0
+        self._slots: Dict[str, asyncio.Semaphore] = {}
+        self._evaluated_at = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    def priority(self, route: str) -> str:
+        return settings.ROUTE_PRIORITY.get(route, "normal")
+
+    def slot(self, route: str) -> Optional[asyncio.Semaphore]:
+        """
+        Returns the semaphore capping the concurrency of ``route``, if any.
+        """
+        limit = settings.ROUTE_CONCURRENCY.get(route)
+        if limit is None:
+            return None
+        semaphore = self._slots.get(route)
+        if semaphore is None:
+            semaphore = self._slots[route] = asyncio.Semaphore(limit)
+        return semaphore
+
+    def _expire(self) -> int:
+        """
+        Drops the slots that left the window. Returns the current slot.
+        """
+        width = settings.LOAD_SHED_WINDOW_SECONDS / WINDOW_SLOTS
+        current = int(time.monotonic() // width)
+        while self._windows and self._windows[0][0] <= current - WINDOW_SLOTS:
+            _, counts = self._windows.popleft()
+            for bucket, count in counts.items():
+                self._totals[bucket] -= count
+                self._samples -= count
+        return current
+
+    def observe(self, route: str, seconds: float):
+        if self.priority(route) == "low":
+            return
+        current = self._expire()
+        if not self._windows or self._windows[-1][0] != current:
+            self._windows.append((current, Counter()))
+        bucket = bisect.bisect_left(LATENCY_BOUNDS, seconds)
+        self._windows[-1][1][bucket] += 1
+        self._totals[bucket] += 1
+        self._samples += 1
+
+    def p95(self) -> float:
+        """
+        p95 latency of the recent requests, rounded up to its bucket's
+        bound, 0 with too few samples.
+        """
+        self._expire()
+        if self._samples < settings.LOAD_SHED_MIN_SAMPLES:
+            return 0.0
+        rank = math.ceil(0.95 * self._samples)
+        seen = 0
+        for bucket, count in enumerate(self._totals):
+            seen += count
+            if seen >= rank:
+                break
+        return LATENCY_BOUNDS[min(bucket, len(LATENCY_BOUNDS) - 1)]
+
+    def evaluate(self) -> int:
+        """
+        Recomputes the overload level, at most every 100 ms.
+        """
+        now = time.monotonic()
+        if now - self._evaluated_at < 0.1:
+            return self.level
+        self._evaluated_at = now
+        p95 = self.p95()
+        pressure = max(
+            p95 / settings.LOAD_SHED_P95_TARGET_SECONDS,
+            self.lag / settings.LOAD_SHED_LAG_TARGET_SECONDS,
+        )
+        level = 0 if pressure <= 1 else 1 if pressure <= 2 else MAX_LEVEL
+        if level != self.level:
+            logger.warning(
+                "Overload level %d -> %d (p95 %.3fs, loop lag %.3fs)",
+                self.level,
+                level,
+                p95,
+                self.lag,
+            )
+            self.level = level
+            OVERLOAD_LEVEL.set(level)
+        return level
+
+    def should_shed(self, route: str) -> bool:
+        return self.evaluate() >= PRIORITY_RANKS[self.priority(route)]
+
+    async def _sample(self):
+        loop = asyncio.get_running_loop()
+        interval = settings.LOAD_SHED_LAG_INTERVAL_SECONDS
+        while True:
+            due = loop.time() + interval
+            await asyncio.sleep(interval)
+            self.lag = max(0.0, loop.time() - due)
+
+    def start(self):
+        self.level = 0
+        self.lag = 0.0
+        self._windows.clear()
+        self._totals = [0] * (len(LATENCY_BOUNDS) + 1)
+        self._samples = 0
+        self._slots = {}
+        self._evaluated_at = 0.0
+        OVERLOAD_LEVEL.set(0)
+        self._task = asyncio.create_task(self._sample())
+        self.running = True
+        logger.info("Load shedding started")
+
+    def stop(self):
+        self.running = False
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+
+load_shedder = LoadShedder()
+
+
+class LoadSheddingMiddleware:
+    """
+    ASGI middleware rejecting requests with ``503`` and ``Retry-After``
+    when the load shedder decides so, before any other work is done.
+    """
+
+    def __init__(self, app, shedder: LoadShedder = load_shedder):
+        self.app = app
+        self.shedder = shedder
+
+    async def _reject(self, scope, receive, send, route: str, reason: str):
+        label = route if (
+            route in settings.ROUTE_PRIORITY
+            or route in settings.ROUTE_CONCURRENCY
+        ) else "other"
+        SHED_REQUESTS.inc(route=label, reason=reason)
+        response = JSONResponse(
+            status_code=503,
+            content={"detail": "Server is overloaded, retry later"},
+            headers={"Retry-After": str(settings.LOAD_SHED_RETRY_AFTER_SECONDS)},
+        )
+        await response(scope, receive, send)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.shedder.running:
+            await self.app(scope, receive, send)
+            return
+        route = route_key(scope)
+        if self.shedder.should_shed(route):
+            await self._reject(scope, receive, send, route, "overload")
+            return
+        slot = self.shedder.slot(route)
+        if slot is not None:
+            queued = time.perf_counter()
+            try:
+                await asyncio.wait_for(
+                    slot.acquire(),
+                    timeout=settings.LOAD_SHED_QUEUE_TIMEOUT_SECONDS,
+                )
+            except asyncio.TimeoutError:
+                await self._reject(scope, receive, send, route, "queue_timeout")
+                return
+            QUEUE_WAIT.observe(time.perf_counter() - queued, route=route)
+            ROUTE_IN_FLIGHT.inc(route=route)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.shedder.observe(route, time.perf_counter() - start)
+            if slot is not None:
+                slot.release()
+                ROUTE_IN_FLIGHT.dec(route=route)
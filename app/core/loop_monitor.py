@@ -0,0 +1,195 @@
+# app/core/loop_monitor.py
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+from app.config import settings
+from app.core.metrics import registry
+
+logger = logging.getLogger("app.core.loop_monitor")
+
+LOOP_LAG = registry.histogram(
+    "event_loop_lag_seconds",
+    "Delay between when a loop timer was due and when it ran.",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+SLOW_CALLBACKS = registry.counter(
+    "event_loop_slow_callbacks_total",
+    "Times the event loop was blocked longer than LOOP_MONITOR_SLOW_SECONDS.",
+    ["route"],
+)
+
+
+def describe_scope(scope: Optional[dict]) -> Optional[str]:
+    """
+    Returns ``"METHOD /route/template"`` for an ASGI HTTP scope.
+    """
+    if scope is None:
+        return None
+    route = scope.get("route")
+    return f"{scope.get('method')} {getattr(route, 'path', scope.get('path'))}"
+
+
+class LoopMonitor:
+    """
+    Measures event-loop scheduling lag and catches callbacks that block it.
+
+    A task sleeps for ``interval`` seconds in a loop; how late it wakes up
+    is the lag, recorded in the ``event_loop_lag_seconds`` histogram. Each
+    wake-up also refreshes a heartbeat. A watchdog thread notices when the
+    heartbeat stops for longer than ``slow_threshold`` and captures the
+    loop thread's stack and the route of the request running at that
+    moment, so blocking code (bcrypt, synchronous I/O, ...) can be found in
+    production. Both only wake up a few times per second.
+    """
+
+    def __init__(
+        self,
+        interval: Optional[float] = None,
+        slow_threshold: Optional[float] = None,
+        history: Optional[int] = None,
+    ):
+        self.interval = interval or settings.LOOP_MONITOR_INTERVAL_SECONDS
+        self.slow_threshold = (
+            slow_threshold or settings.LOOP_MONITOR_SLOW_SECONDS
+        )
+        self.slow_callbacks = deque(
+            maxlen=history or settings.LOOP_MONITOR_HISTORY,
+        )
+        self.last_lag = 0.0
+        self.running = False
+        self._heartbeat = time.monotonic()
+        self._pending: Optional[dict] = None
+        self._requests: Dict[asyncio.Task, dict] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+
+    def track(self, task: asyncio.Task, scope: dict):
+        self._requests[task] = scope
+
+    def untrack(self, task: asyncio.Task):
+        self._requests.pop(task, None)
+
+    async def _sample(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            due = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - due)
+            self._heartbeat = time.monotonic()
+            self.last_lag = lag
+            LOOP_LAG.observe(lag)
+            if lag >= self.slow_threshold or self._pending is not None:
+                self._finish_slow_callback(lag)
+
+    def _finish_slow_callback(self, lag: float):
+        entry, self._pending = self._pending, None
+        if entry is None:
+            # Blocked for less than a watchdog period: no stack captured.
+            entry = {
+                "detected_at": datetime.now(timezone.utc).isoformat(),
+                "route": None,
+                "stack": None,
+            }
+            self.slow_callbacks.append(entry)
+        entry["duration_ms"] = round(lag * 1000, 2)
+        SLOW_CALLBACKS.inc(route=entry["route"] or "")
+        logger.warning(
+            "Event loop blocked for %.1f ms (route: %s)\n%s",
+            lag * 1000,
+            entry["route"],
+            entry["stack"] or "",
+        )
+
+    def _watch(self):
+        while not self._stopped.wait(self.slow_threshold / 2):
+            stalled = time.monotonic() - self._heartbeat - self.interval
+            if stalled > self.slow_threshold and self._pending is None:
+                self._pending = self._capture()
+                self.slow_callbacks.append(self._pending)
+
+    def _capture(self) -> dict:
+        frame = sys._current_frames().get(self._loop_thread_id)
+        task = asyncio.current_task(self._loop)
+        stack = None
+        if frame is not None:
+            stack = "".join(
+                traceback.format_stack(
+                    frame,
+                    limit=settings.LOOP_MONITOR_STACK_DEPTH,
+                )
+            )
+        return {
+            "detected_at": datetime.now(timezone.utc).isoformat(),
+            "route": describe_scope(self._requests.get(task)),
+            "stack": stack,
+            "duration_ms": None,
+        }
+
+    def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._stopped.clear()
+        self._task = asyncio.create_task(self._sample())
+        self._thread = threading.Thread(
+            target=self._watch,
+            name="loop-monitor",
+            daemon=True,
+        )
+        self._thread.start()
+        self.running = True
+        logger.info(
+            "Event loop monitor started (interval %.3fs, slow threshold %.3fs)",
+            self.interval,
+            self.slow_threshold,
+        )
+
+    def stop(self):
+        self.running = False
+        self._stopped.set()
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        self._thread = None
+
+    def snapshot(self) -> dict:
+        return {
+            "running": self.running,
+            "last_lag_ms": round(self.last_lag * 1000, 2),
+            "slow_callbacks": list(self.slow_callbacks),
+        }
+
+
+loop_monitor = LoopMonitor()
+
+
+class LoopMonitorMiddleware:
+    """
+    ASGI middleware that lets the loop monitor tell which request was
+    running when the loop blocked.
+    """
+
+    def __init__(self, app, monitor: LoopMonitor = loop_monitor):
+        self.app = app
+        self.monitor = monitor
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.monitor.running:
+            await self.app(scope, receive, send)
+            return
+        task = asyncio.current_task()
+        self.monitor.track(task, scope)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.monitor.untrack(task)
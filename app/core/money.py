@@ -0,0 +1,33 @@
+# app/core/money.py
+from decimal import Decimal
+
+from tortoise.expressions import RawSQL
+
+# Amounts are DECIMAL(15, 2): at most 13 integer digits, so the value in
+# cents always fits in a BIGINT (and exactly in a Python int).
+AMOUNT_CENTS = RawSQL('CAST(ROUND("amount" * 100) AS BIGINT)')
+
+
+def cents_to_str(cents: int) -> str:
+    """
+    Formats an amount in cents as an exact decimal string, e.g.
+    ``-505`` as ``"-5.05"``, using integer arithmetic only.
+    """
+    if cents < 0:
+        units, fraction = divmod(-cents, 100)
+        return f"-{units}.{fraction:02d}"
+    units, fraction = divmod(cents, 100)
+    return f"{units}.{fraction:02d}"
+
+
+def decimal_to_cents(amount: Decimal) -> int:
+    """
+    Converts a ``Decimal`` amount with at most two decimal places to cents.
+
+    Raises:
+        ValueError: If the amount has more than two decimal places.
+    """
+    cents = amount * 100
+    if cents != cents.to_integral_value():
+        raise ValueError(f"Amount {amount} has more than two decimal places")
+    return int(cents)
@@ -0,0 +1,307 @@
+# app/core/profiling.py
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from typing import Dict, List, Optional, Set, Tuple
+
+logger = logging.getLogger("app.core.profiling")
+
+# Repository root, stripped from file names in profiles.
+_ROOT = os.path.dirname(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+)
+
+
+class ProfilerBusy(Exception):
+    pass
+
+
+def _frame_name(frame) -> Tuple[str, str, int]:
+    code = frame.f_code
+    filename = code.co_filename
+    if filename.startswith(_ROOT):
+        filename = os.path.relpath(filename, _ROOT)
+    return code.co_name, filename, code.co_firstlineno
+
+
+class SamplingProfiler:
+    """
+    Statistical profiler for the event loop thread.
+
+    A background thread reads the loop thread's current stack with
+    ``sys._current_frames()`` every ``interval`` seconds and counts each
+    distinct stack. Nothing is hooked into the interpreter, so the
+    profiled code runs at full speed; the cost is one stack walk per
+    sample.
+
+    When profiling a route, samples are only kept while a request to that
+    route is the running task, and profiling stops after ``requests``
+    such requests have completed.
+    """
+
+    def __init__(self):
+        self.active = False
+        self.route: Optional[str] = None
+        self._remaining_requests = 0
+        self._tasks: Set[asyncio.Task] = set()
+        self._samples: Counter = Counter()
+        self._interval = 0.005
+        self._started_at = 0.0
+        self._elapsed = 0.0
+        self._stopped = threading.Event()
+        self._done: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def matches(self, path: str) -> bool:
+        return self.route is not None and (
+            path == self.route or path.endswith(self.route)
+        )
+
+    def request_started(self, task: asyncio.Task):
+        self._tasks.add(task)
+
+    def request_finished(self, task: asyncio.Task):
+        self._tasks.discard(task)
+        self._remaining_requests -= 1
+        if self._remaining_requests <= 0 and self._done is not None:
+            self._done.set()
+
+    def _sample(self):
+        current_frames = sys._current_frames
+        while not self._stopped.wait(self._interval):
+            if self.route is not None and (
+                asyncio.current_task(self._loop) not in self._tasks
+            ):
+                continue
+            frame = current_frames().get(self._loop_thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(_frame_name(frame))
+                frame = frame.f_back
+            stack.reverse()
+            self._samples[tuple(stack)] += 1
+
+    async def run(
+        self,
+        seconds: float,
+        interval: float = 0.005,
+        route: Optional[str] = None,
+        requests: int = 0,
+    ) -> Dict[tuple, int]:
+        """
+        Profiles for ``seconds``, or until ``requests`` requests to
+        ``route`` have completed (``seconds`` is then the time limit).
+
+        Returns:
+            Dict[tuple, int]: Sample count per stack, outermost frame
+                first. Each frame is ``(function, file, first line)``.
+
+        Raises:
+            ProfilerBusy: If a profile is already running.
+        """
+        if self.active:
+            raise ProfilerBusy()
+        self.active = True
+        self._samples = Counter()
+        self._interval = interval
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._done = asyncio.Event()
+        self._remaining_requests = requests
+        self._stopped.clear()
+        self._thread = threading.Thread(
+            target=self._sample,
+            name="sampling-profiler",
+            daemon=True,
+        )
+        self._started_at = time.perf_counter()
+        # Set the route last: the middleware starts tracking requests now.
+        self.route = route
+        self._thread.start()
+        try:
+            if route is None:
+                await asyncio.sleep(seconds)
+            else:
+                try:
+                    await asyncio.wait_for(self._done.wait(), timeout=seconds)
+                except asyncio.TimeoutError:
+                    logger.info("Route profile of %s hit its time limit", route)
+        finally:
+            self.route = None
+            self._stopped.set()
+            self._thread.join()
+            self._elapsed = time.perf_counter() - self._started_at
+            self._tasks.clear()
+            self._done = None
+            self.active = False
+        logger.info(
+            "Collected %d profile samples in %.1fs",
+            sum(self._samples.values()),
+            self._elapsed,
+        )
+        return dict(self._samples)
+
+    @staticmethod
+    def to_collapsed(samples: Dict[tuple, int]) -> str:
+        """
+        Formats samples as collapsed stacks, one ``frame;frame;... count``
+        line per stack, as read by flamegraph.pl, inferno and speedscope.
+        """
+        lines = []
+        for stack, count in sorted(samples.items()):
+            frames = ";".join(
+                f"{name} ({filename}:{line})" for name, filename, line in stack
+            )
+            lines.append(f"{frames} {count}")
+        return "\n".join(lines) + "\n"
+
+    def to_speedscope(self, samples: Dict[tuple, int], name: str) -> dict:
+        """
+        Formats samples as a speedscope sampled profile.
+        """
+        frame_index: Dict[tuple, int] = {}
+        frames: List[dict] = []
+        stacks, weights = [], []
+        for stack, count in samples.items():
+            indexes = []
+            for frame in stack:
+                if frame not in frame_index:
+                    frame_index[frame] = len(frames)
+                    frames.append(
+                        {"name": frame[0], "file": frame[1], "line": frame[2]}
+                    )
+                indexes.append(frame_index[frame])
+            stacks.append(indexes)
+            weights.append(count * self._interval)
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "shared": {"frames": frames},
+            "profiles": [
+                {
+                    "type": "sampled",
+                    "name": name,
+                    "unit": "seconds",
+                    "startValue": 0,
+                    "endValue": sum(weights),
+                    "samples": stacks,
+                    "weights": weights,
+                }
+            ],
+            "name": name,
+            "exporter": "api-payments",
+        }
+
+
+profiler = SamplingProfiler()
+
+
+class ProfilingMiddleware:
+    """
+    ASGI middleware that tells the profiler which requests belong to the
+    route being profiled. Does nothing while no route profile runs.
+    """
+
+    def __init__(self, app, sampling_profiler: SamplingProfiler = profiler):
+        self.app = app
+        self.profiler = sampling_profiler
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.profiler.matches(scope["path"]):
+            await self.app(scope, receive, send)
+            return
+        task = asyncio.current_task()
+        self.profiler.request_started(task)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.profiler.request_finished(task)
+
+
+class MemoryTracer:
+    """
+    Opt-in ``tracemalloc`` snapshots.
+
+    Tracing slows allocations down noticeably, so it only runs between
+    ``start`` and ``stop``. Each snapshot is compared with the previous
+    one, so the top entries show where memory grew in between.
+    """
+
+    def __init__(self):
+        self._previous: Optional[tracemalloc.Snapshot] = None
+
+    @property
+    def tracing(self) -> bool:
+        return tracemalloc.is_tracing()
+
+    def start(self, frames: int = 1):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+        self._previous = None
+
+    def stop(self):
+        tracemalloc.stop()
+        self._previous = None
+
+    def snapshot(
+        self,
+        limit: int = 25,
+        pattern: Optional[str] = None,
+        group_by: str = "lineno",
+    ) -> dict:
+        """
+        Takes a snapshot and returns the biggest allocation sites.
+
+        Args:
+            limit: Number of entries to return.
+            pattern: Only keep allocations from files matching this
+                ``fnmatch`` pattern, e.g. ``*/app/*`` or ``*pydantic*``.
+            group_by: ``lineno``, ``filename`` or ``traceback``.
+
+        Returns:
+            dict: Traced memory and the top entries, with the growth since
+                the previous snapshot when there is one.
+        """
+        filters = [
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+        ]
+        if pattern:
+            filters.append(tracemalloc.Filter(True, pattern))
+        snapshot = tracemalloc.take_snapshot().filter_traces(filters)
+        compared = self._previous is not None
+        if compared:
+            stats = snapshot.compare_to(self._previous, group_by)
+        else:
+            stats = snapshot.statistics(group_by)
+        self._previous = snapshot
+        current, peak = tracemalloc.get_traced_memory()
+
+        entries = []
+        for stat in stats[:limit]:
+            entry = {
+                "location": [
+                    f"{frame.filename}:{frame.lineno}" for frame in stat.traceback
+                ],
+                "size_kb": round(stat.size / 1024, 1),
+                "count": stat.count,
+            }
+            if compared:
+                entry["size_diff_kb"] = round(stat.size_diff / 1024, 1)
+                entry["count_diff"] = stat.count_diff
+            entries.append(entry)
+        return {
+            "traced_kb": round(current / 1024, 1),
+            "peak_kb": round(peak / 1024, 1),
+            "compared_to_previous": compared,
+            "top": entries,
+        }
+
+
+memory_tracer = MemoryTracer()
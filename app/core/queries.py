@@ -0,0 +1,161 @@
+# app/core/queries.py
+"""
+Deadlines and cancellation for database queries run by request handlers.
+
+A query gets a deadline with ``query_deadline`` and is tied to the
+client with ``cancel_on_disconnect``. Cancelling the awaiting task is
+enough to stop a query: asyncpg sends PostgreSQL a cancel request for
+the running statement and the pooled connection is released at once.
+Reads therefore run as single statements, outside any transaction; the
+server-side backstop is ``DATABASE_STATEMENT_TIMEOUT_SECONDS``, set once
+per pooled connection.
+"""
+import asyncio
+import json
+import logging
+from contextlib import asynccontextmanager
+from typing import Awaitable, Optional, TypeVar
+
+from fastapi import HTTPException, Request
+from tortoise import connections
+
+from app.config import settings
+
+logger = logging.getLogger("app.core.queries")
+
+T = TypeVar("T")
+
+# SQLSTATE of "canceling statement due to statement timeout".
+QUERY_CANCELED = "57014"
+# Status nginx uses for requests abandoned by the client.
+CLIENT_CLOSED_REQUEST = 499
+
+
+def route_timeout(request: Request) -> float:
+    """
+    Returns the query timeout of the route of ``request``, from
+    ``QUERY_TIMEOUTS`` (keyed by ``"METHOD /path"``) or the default
+    ``QUERY_TIMEOUT_SECONDS``.
+    """
+    return settings.QUERY_TIMEOUTS.get(
+        f"{request.method} {request.url.path}",
+        settings.QUERY_TIMEOUT_SECONDS,
+    )
+
+
+def is_query_timeout(err: BaseException) -> bool:
+    """
+    Tells whether ``err`` comes from a query deadline, whether it was
+    enforced by the client (``TimeoutError``) or by the server.
+    """
+    while err is not None:
+        if isinstance(err, TimeoutError):
+            return True
+        if getattr(err, "sqlstate", None) == QUERY_CANCELED:
+            return True
+        err = err.__cause__ or (
+            err.args[0] if err.args and isinstance(err.args[0], BaseException)
+            else None
+        )
+    return False
+
+
+def uses_asyncpg(client) -> bool:
+    try:
+        from tortoise.backends.asyncpg import AsyncpgDBClient
+    except ImportError:  # pragma: no cover - asyncpg is a main dependency
+        return False
+    return isinstance(client, AsyncpgDBClient)
+
+
+@asynccontextmanager
+async def query_deadline(seconds: float):
+    """
+    Runs the queries of the block within ``seconds``. Past the deadline
+    the block is cancelled, which cancels the running statement, and
+    ``TimeoutError`` is raised.
+    """
+    async with asyncio.timeout(seconds):
+        yield
+
+
+async def estimated_rows(query) -> Optional[int]:
+    """
+    Returns the number of rows the PostgreSQL planner expects ``query`` to
+    return, from the table statistics, without running it. None on other
+    databases.
+    """
+    if not uses_asyncpg(connections.get("default")):
+        return None
+    client = connections.get("default")
+    # The filter values are inlined in the statement, escaped by pypika.
+    rows = await client.execute_query_dict(
+        f"EXPLAIN (FORMAT JSON) {query.sql(params_inline=True)}"
+    )
+    plan = rows[0]["QUERY PLAN"]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+async def _wait_disconnect(request: Request):
+    while True:
+        message = await request.receive()
+        if message["type"] == "http.disconnect":
+            return
+
+
+async def cancel_on_disconnect(request: Request, awaitable: Awaitable[T]) -> T:
+    """
+    Awaits ``awaitable``, cancelling it if the client disconnects first.
+
+    The work runs in the request task, so profiles and slow callback
+    reports attribute it to the request; only the disconnect watcher is
+    a separate task, which cancels the request task.
+
+    Only for requests whose body was already read, since the client is
+    watched by reading further ASGI messages.
+
+    Raises:
+        HTTPException: 499 if the client disconnected.
+    """
+    request_task = asyncio.current_task()
+    disconnected = False
+
+    async def watch():
+        nonlocal disconnected
+        await _wait_disconnect(request)
+        disconnected = True
+        request_task.cancel()
+
+    watcher = asyncio.create_task(watch())
+    try:
+        return await awaitable
+    except asyncio.CancelledError:
+        # Cancellations from elsewhere, e.g. server shutdown, go through.
+        if not disconnected or request_task.uncancel() > 0:
+            raise
+        logger.info(
+            "Client disconnected, cancelled %s %s",
+            request.method,
+            request.url.path,
+        )
+        raise HTTPException(
+            status_code=CLIENT_CLOSED_REQUEST,
+            detail="Client closed request",
+        ) from None
+    finally:
+        # Synchronous with the work finishing: the watcher cannot cancel
+        # the request task once the result is in.
+        watcher.cancel()
+
+
+def query_error(err: Exception, action: str) -> HTTPException:
+    """
+    Maps an error raised by a query to the HTTP error to answer with.
+    """
+    if is_query_timeout(err):
+        logger.warning("Query timed out while %s: %s", action, err)
+        return HTTPException(status_code=504, detail="Query timed out")
+    logger.error("Error %s: %s", action, str(err))
+    return HTTPException(status_code=500, detail=f"Database error: {str(err)}")
@@ -0,0 +1,134 @@
+# app/core/ratelimit.py
+"""
+Keys, costs and per API key quotas for the rate limiter.
+
+Limits are checked after the endpoint dependencies ran, so the caller is
+already authenticated: ``identify`` records who it is on the request and
+``rate_limit_key`` reads it back, without authenticating again. Requests
+without credentials are keyed on the client address.
+"""
+import logging
+import math
+from collections import OrderedDict
+from typing import Callable, Optional
+
+from fastapi import Query, Request
+from slowapi.util import get_remote_address
+
+from app.config import settings
+
+logger = logging.getLogger("app.core.ratelimit")
+
+
+class QuotaCache:
+    """
+    Rate limits of API keys, by limit key.
+
+    The auth dependency loads the API key row on every request anyway, so
+    it refreshes the entry of the key in use for free and the limiter
+    reads it from memory. Keys without a quota use the route limits.
+    """
+
+    def __init__(self, size: int):
+        self.size = size
+        self._quotas: "OrderedDict[str, str]" = OrderedDict()
+
+    def remember(self, key: str, quota: Optional[str]):
+        if quota is None:
+            self._quotas.pop(key, None)
+            return
+        self._quotas[key] = quota
+        self._quotas.move_to_end(key)
+        if len(self._quotas) > self.size:
+            self._quotas.popitem(last=False)
+
+    def get(self, key: str) -> Optional[str]:
+        return self._quotas.get(key)
+
+    def clear(self):
+        self._quotas.clear()
+
+
+quota_cache = QuotaCache(settings.API_KEY_CACHE_SIZE)
+
+
+def identify(
+    request: Request,
+    user_id: str,
+    api_key_id: Optional[str] = None,
+    quota: Optional[str] = None,
+):
+    """
+    Records the authenticated caller as the rate limit key of the request.
+    Requests made with an API key are limited per key, others per user.
+    """
+    if api_key_id is not None:
+        key = f"apikey:{api_key_id}"
+        quota_cache.remember(key, quota)
+    else:
+        key = f"user:{user_id}"
+    request.state.rate_limit_key = key
+
+
+def rate_limit_key(request: Request) -> str:
+    """
+    Returns the key the limits of a request are counted on.
+    """
+    return getattr(request.state, "rate_limit_key", None) or get_remote_address(
+        request
+    )
+
+
+def route_limit(default: str) -> Callable[[str], str]:
+    """
+    Returns a limit provider using the quota of the calling API key, if
+    it has one, instead of ``default``.
+    """
+
+    def provider(key: str) -> str:
+        return quota_cache.get(key) or default
+
+    return provider
+
+
+def row_units(rows: int) -> int:
+    """
+    Cost of serving ``rows`` rows: one unit per started
+    ``RATE_LIMIT_ROWS_PER_UNIT`` rows, at least one.
+    """
+    return max(1, math.ceil(rows / settings.RATE_LIMIT_ROWS_PER_UNIT))
+
+
+def page_limit(
+    request: Request,
+    limit: int = Query(default=100, ge=1, le=settings.PAYMENT_PAGE_MAX_SIZE),
+) -> int:
+    """
+    Dependency validating the ``limit`` query parameter of a paginated
+    route and keeping it for ``page_cost``.
+    """
+    request.state.page_limit = limit
+    return limit
+
+
+def page_cost(request: Request) -> int:
+    """
+    Cost of a paginated request, from its ``limit`` as validated by
+    ``page_limit``.
+    """
+    return row_units(getattr(request.state, "page_limit", 1))
+
+
+def charge_rows(request: Request, rows: int):
+    """
+    Charges the units of a response whose size is only known once it was
+    fetched. The request was let in for one unit; the rest is added to
+    the counter of the limit that admitted it, so the following requests
+    of the caller are rejected until the window has paid it off.
+    """
+    extra = row_units(rows) - 1
+    current = getattr(request.state, "view_rate_limit", None)
+    if extra <= 0 or current is None:
+        return
+    item, args = current
+    request.app.state.limiter.limiter.hit(item, *args, cost=extra)
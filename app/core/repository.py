@@ -0,0 +1,265 @@
+# app/core/repository.py
+"""
+Read-only access for the hottest queries: payment listings and the API
+key lookup of ``get_current_principal``.
+
+Two implementations answer the same calls with the same results:
+
+* ``OrmRepository`` builds the queries with Tortoise, as everywhere else.
+* ``AsyncpgRepository`` runs fixed SQL directly on the pooled asyncpg
+  connections. asyncpg prepares each statement once per connection, as a
+  named server-side statement kept in its statement cache, and rows come
+  back as plain tuples, so a call costs neither query building nor model
+  instances.
+
+``REPOSITORY_BACKEND`` picks one; ``asyncpg`` falls back to the ORM on
+other databases. Writes and migrations always go through Tortoise.
+"""
+import logging
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import List, Optional, Sequence
+
+from tortoise import connections
+from tortoise.expressions import Q
+
+from app.config import settings
+from app.core.money import AMOUNT_CENTS, cents_to_str
+from app.core.queries import query_deadline, uses_asyncpg
+from app.core.tracing import db_span
+from app.models import ApiKey, Payment
+
+logger = logging.getLogger("app.core.repository")
+
+
+@dataclass(frozen=True)
+class ApiKeyRecord:
+    """
+    An active API key with the fields of its user needed to authenticate.
+    """
+
+    uuid: str
+    hashed_key: str
+    scope: str
+    rate_limit: Optional[str]
+    user_id: str
+    username: str
+    disabled: bool
+    token_version: int
+
+    @classmethod
+    def from_model(cls, key: ApiKey) -> "ApiKeyRecord":
+        """
+        Builds the record of a key loaded with ``select_related("user")``.
+        """
+        return cls(
+            uuid=str(key.uuid),
+            hashed_key=key.hashed_key,
+            scope=key.scope,
+            rate_limit=key.rate_limit,
+            user_id=str(key.user.uuid),
+            username=key.user.username,
+            disabled=key.user.disabled,
+            token_version=key.user.token_version,
+        )
+
+
+def _aware(value: datetime) -> datetime:
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+class OrmRepository:
+    name = "orm"
+
+    @staticmethod
+    async def fetch_records(
+        query,
+        timeout: Optional[float] = None,
+        extra: Sequence[str] = (),
+    ) -> List[dict]:
+        """
+        Runs a payment query for the read path.
+
+        The database returns ``amount`` as integer cents, formatted into an
+        exact decimal string without building ``Decimal`` objects. The
+        query is cancelled after ``timeout`` seconds (default
+        ``QUERY_TIMEOUT_SECONDS``). ``extra`` fields are read as well.
+
+        Returns:
+            List[PaymentRecord]: The payments as dicts.
+
+        Raises:
+            TimeoutError: If the query ran out of time.
+        """
+        with db_span("SELECT", "payments"):
+            async with query_deadline(
+                timeout or settings.QUERY_TIMEOUT_SECONDS
+            ):
+                rows = await query.annotate(
+                    amount_cents=AMOUNT_CENTS,
+                ).values(
+                    "date",
+                    "document",
+                    "beneficiary",
+                    "amount_cents",
+                    *extra,
+                )
+        for row in rows:
+            row["amount"] = cents_to_str(row.pop("amount_cents"))
+        return rows
+
+    async def latest_payments(
+        self,
+        skip: int,
+        limit: int,
+        timeout: Optional[float] = None,
+    ) -> List[dict]:
+        return await self.fetch_records(
+            Payment.all().order_by("-date", "-uuid").offset(skip).limit(limit),
+            timeout,
+        )
+
+    async def all_payments(self, timeout: Optional[float] = None) -> List[dict]:
+        return await self.fetch_records(Payment.all(), timeout)
+
+    async def payments_between(
+        self,
+        start: datetime,
+        end: datetime,
+        timeout: Optional[float] = None,
+    ) -> List[dict]:
+        return await self.fetch_records(
+            Payment.filter(date__range=(start, end)),
+            timeout,
+        )
+
+    async def api_keys(self, key_prefix: str) -> List[ApiKeyRecord]:
+        """
+        Returns the active, unexpired keys with ``key_prefix``.
+        """
+        async with query_deadline(settings.QUERY_TIMEOUT_SECONDS):
+            rows = await ApiKey.filter(
+                Q(expires_at__isnull=True)
+                | Q(expires_at__gt=datetime.now(timezone.utc)),
+                key_prefix=key_prefix,
+                is_active=True,
+            ).values_list(
+                "uuid",
+                "hashed_key",
+                "scope",
+                "rate_limit",
+                "user__uuid",
+                "user__username",
+                "user__disabled",
+                "user__token_version",
+            )
+        return [
+            ApiKeyRecord(str(row[0]), *row[1:4], str(row[4]), *row[5:])
+            for row in rows
+        ]
+
+
+_PAYMENT_COLUMNS = (
+    '"date", "document", "beneficiary", '
+    'CAST(ROUND("amount" * 100) AS BIGINT) AS "amount_cents"'
+)
+LATEST_PAYMENTS = (
+    f'SELECT {_PAYMENT_COLUMNS} FROM "payments" '
+    'ORDER BY "date" DESC, "uuid" DESC LIMIT $2 OFFSET $1'
+)
+ALL_PAYMENTS = f'SELECT {_PAYMENT_COLUMNS} FROM "payments"'
+PAYMENTS_BETWEEN = (
+    f'SELECT {_PAYMENT_COLUMNS} FROM "payments" '
+    'WHERE "date" BETWEEN $1 AND $2'
+)
+API_KEYS = (
+    'SELECT k."uuid", k."hashed_key", k."scope", k."rate_limit", '
+    'u."uuid", u."username", u."disabled", u."token_version" '
+    'FROM "apikeys" k JOIN "users" u ON u."uuid" = k."user_id" '
+    'WHERE k."key_prefix" = $1 AND k."is_active" '
+    'AND (k."expires_at" IS NULL OR k."expires_at" > $2)'
+)
+
+
+class AsyncpgRepository:
+    name = "asyncpg"
+
+    async def _fetch(self, sql: str, *args, timeout: Optional[float] = None):
+        client = connections.get("default")
+        async with query_deadline(timeout or settings.QUERY_TIMEOUT_SECONDS):
+            async with client.acquire_connection() as connection:
+                # ``fetch`` goes through the connection's statement cache:
+                # the statement is prepared on first use only.
+                return await connection.fetch(sql, *args)
+
+    async def _payments(self, sql: str, *args, timeout=None) -> List[dict]:
+        with db_span("SELECT", "payments"):
+            rows = await self._fetch(sql, *args, timeout=timeout)
+        return [
+            {
+                "date": date,
+                "document": document,
+                "beneficiary": beneficiary,
+                "amount": cents_to_str(cents),
+            }
+            for date, document, beneficiary, cents in rows
+        ]
+
+    async def latest_payments(
+        self,
+        skip: int,
+        limit: int,
+        timeout: Optional[float] = None,
+    ) -> List[dict]:
+        return await self._payments(LATEST_PAYMENTS, skip, limit, timeout=timeout)
+
+    async def all_payments(self, timeout: Optional[float] = None) -> List[dict]:
+        return await self._payments(ALL_PAYMENTS, timeout=timeout)
+
+    async def payments_between(
+        self,
+        start: datetime,
+        end: datetime,
+        timeout: Optional[float] = None,
+    ) -> List[dict]:
+        return await self._payments(
+            PAYMENTS_BETWEEN,
+            _aware(start),
+            _aware(end),
+            timeout=timeout,
+        )
+
+    async def api_keys(self, key_prefix: str) -> List[ApiKeyRecord]:
+        with db_span("SELECT", "apikeys"):
+            rows = await self._fetch(
+                API_KEYS,
+                key_prefix,
+                datetime.now(timezone.utc),
+            )
+        return [
+            ApiKeyRecord(str(row[0]), *row[1:4], str(row[4]), *row[5:])
+            for row in rows
+        ]
+
+
+orm_repository = OrmRepository()
+asyncpg_repository = AsyncpgRepository()
+_fallback_logged = False
+
+
+def get_repository():
+    """
+    Returns the repository selected by ``REPOSITORY_BACKEND``.
+    """
+    if settings.REPOSITORY_BACKEND != "asyncpg":
+        return orm_repository
+    if not uses_asyncpg(connections.get("default")):
+        global _fallback_logged
+        if not _fallback_logged:
+            logger.warning(
+                "REPOSITORY_BACKEND is asyncpg but the database is not "
+                "PostgreSQL, using the ORM"
+            )
+            _fallback_logged = True
+        return orm_repository
+    return asyncpg_repository
@@ -0,0 +1,108 @@
+# app/core/revocation.py
+import asyncio
+import logging
+from typing import Dict, Optional, Set
+
+from tortoise.expressions import F, Q
+from tortoise.signals import post_save
+
+from app.config import settings
+from app.models import User
+
+logger = logging.getLogger("app.core.revocation")
+
+
+class RevocationCache:
+    """
+    In-memory view of which users are disabled and which token versions
+    they currently accept.
+
+    Bearer tokens carry the user id (``uid``) and token version (``ver``),
+    so checking them against this cache replaces a ``User`` query per
+    request. Only disabled users and users whose tokens were revoked at
+    least once are kept, so the set stays small. The cache is refreshed
+    from the database every ``REVOCATION_REFRESH_SECONDS`` and updated
+    immediately whenever a ``User`` is saved in this process.
+    """
+
+    def __init__(self):
+        self._disabled: Set[str] = set()
+        self._versions: Dict[str, int] = {}
+        self._task: Optional[asyncio.Task] = None
+        self.ready = False
+
+    def is_revoked(self, user_id: str, token_version: int) -> bool:
+        return token_version < self._versions.get(user_id, 0)
+
+    def is_disabled(self, user_id: str) -> bool:
+        return user_id in self._disabled
+
+    def update_user(self, user_id: str, disabled: bool, token_version: int):
+        if disabled:
+            self._disabled.add(user_id)
+        else:
+            self._disabled.discard(user_id)
+        if token_version:
+            self._versions[user_id] = token_version
+        else:
+            self._versions.pop(user_id, None)
+
+    async def refresh(self):
+        """
+        Reloads disabled users and token versions from the database.
+        """
+        rows = await User.filter(
+            Q(disabled=True) | Q(token_version__gt=0),
+        ).values_list("uuid", "disabled", "token_version")
+        self._disabled = {str(uuid) for uuid, disabled, _ in rows if disabled}
+        self._versions = {
+            str(uuid): version for uuid, _, version in rows if version
+        }
+        self.ready = True
+        logger.debug(
+            "Revocation cache refreshed: %d disabled, %d versioned users",
+            len(self._disabled),
+            len(self._versions),
+        )
+
+    async def _run(self, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.refresh()
+            except Exception as err:
+                logger.error("Error refreshing revocation cache: %s", err)
+
+    async def start(self):
+        await self.refresh()
+        self._task = asyncio.create_task(
+            self._run(settings.REVOCATION_REFRESH_SECONDS)
+        )
+
+    async def stop(self):
+        self.ready = False
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+
+revocation_cache = RevocationCache()
+
+
+async def revoke_user_tokens(user_id: str):
+    """
+    Invalidates every access token issued to a user so far by bumping
+    their token version.
+    """
+    await User.filter(uuid=user_id).update(token_version=F("token_version") + 1)
+    user = await User.get(uuid=user_id)
+    revocation_cache.update_user(str(user.uuid), user.disabled, user.token_version)
+
+
+@post_save(User)
+async def _user_saved(sender, instance: User, created, using_db, update_fields):
+    revocation_cache.update_user(
+        str(instance.uuid),
+        instance.disabled,
+        instance.token_version,
+    )
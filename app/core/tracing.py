@@ -0,0 +1,199 @@
+# app/core/tracing.py
+import contextlib
+import logging
+import threading
+from typing import Optional
+
+from app.config import settings
+
+logger = logging.getLogger("app.core.tracing")
+
+try:
+    from opentelemetry import propagate, trace
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import (
+        BatchSpanProcessor,
+        ConsoleSpanExporter,
+        SimpleSpanProcessor,
+        SpanExporter,
+        SpanExportResult,
+    )
+    from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
+except ImportError:  # pragma: no cover - exercised without the tracing extra
+    trace = None
+    SpanExporter = object
+
+# Returned by ``span`` while tracing is off: entering and leaving it does
+# nothing, so instrumented code pays one global lookup per span.
+_NOOP_SPAN = contextlib.nullcontext()
+_tracer = None
+_provider = None
+_DB_SYSTEM = settings.DATABASE_URL.split(":", 1)[0]
+
+
+class FileSpanExporter(SpanExporter):
+    """
+    Writes finished spans to a file, one JSON object per line.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, spans):
+        with self._lock, open(self.path, "a", encoding="utf-8") as handle:
+            for finished in spans:
+                handle.write(finished.to_json(indent=None) + "\n")
+        return SpanExportResult.SUCCESS
+
+    def shutdown(self):
+        pass
+
+
+def _build_exporter():
+    if settings.TRACING_EXPORTER == "file":
+        return FileSpanExporter(settings.TRACING_FILE)
+    if settings.TRACING_EXPORTER == "console":
+        return ConsoleSpanExporter()
+    from opentelemetry.exporter.otlp.proto.http.trace_exporter import (
+        OTLPSpanExporter,
+    )
+
+    return OTLPSpanExporter(endpoint=settings.TRACING_OTLP_ENDPOINT)
+
+
+def setup_tracing(exporter=None, sample_ratio: Optional[float] = None):
+    """
+    Starts exporting spans.
+
+    Spans are sampled with ``TRACING_SAMPLE_RATIO`` unless the incoming
+    request carries a sampling decision in its ``traceparent`` header,
+    and exported to an OTLP/HTTP collector, a JSON lines file or the
+    console according to ``TRACING_EXPORTER``. Passing ``exporter``
+    exports synchronously to it instead, which is meant for tests.
+
+    Raises:
+        RuntimeError: If the ``opentelemetry-sdk`` package is missing.
+    """
+    global _tracer, _provider
+    if trace is None:
+        raise RuntimeError(
+            "Tracing requires the opentelemetry-sdk package "
+            "(install the 'tracing' extra)"
+        )
+    ratio = sample_ratio
+    if ratio is None:
+        ratio = settings.TRACING_SAMPLE_RATIO
+    _provider = TracerProvider(
+        resource=Resource.create(
+            {"service.name": settings.TRACING_SERVICE_NAME},
+        ),
+        sampler=ParentBased(TraceIdRatioBased(ratio)),
+    )
+    if exporter is not None:
+        _provider.add_span_processor(SimpleSpanProcessor(exporter))
+    else:
+        _provider.add_span_processor(BatchSpanProcessor(_build_exporter()))
+    _tracer = _provider.get_tracer("app")
+    logger.info(
+        "Tracing enabled (exporter %s, sample ratio %s)",
+        "custom" if exporter is not None else settings.TRACING_EXPORTER,
+        ratio,
+    )
+
+
+def shutdown_tracing():
+    """
+    Flushes pending spans and turns tracing off.
+    """
+    global _tracer, _provider
+    if _provider is not None:
+        _provider.shutdown()
+    _tracer = None
+    _provider = None
+
+
+def is_enabled() -> bool:
+    return _tracer is not None
+
+
+def span(name: str, attributes: Optional[dict] = None):
+    """
+    Returns a context manager timing a block as a child span of the
+    current span.
+
+    Example:
+        with span("PaymentService.get_all_payments"):
+            ...
+    """
+    if _tracer is None:
+        return _NOOP_SPAN
+    return _tracer.start_as_current_span(name, attributes=attributes)
+
+
+def db_span(operation: str, table: str):
+    """
+    Returns a span for a database query, named like ``SELECT payments``.
+    """
+    if _tracer is None:
+        return _NOOP_SPAN
+    return _tracer.start_as_current_span(
+        f"{operation} {table}",
+        kind=trace.SpanKind.CLIENT,
+        attributes={
+            "db.system": _DB_SYSTEM,
+            "db.operation.name": operation,
+            "db.collection.name": table,
+        },
+    )
+
+
+class TracingMiddleware:
+    """
+    ASGI middleware opening a server span per HTTP request.
+
+    The W3C ``traceparent``/``tracestate`` headers of the request are
+    honoured, so the span joins the caller's trace. Passes requests
+    straight through while tracing is off.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if _tracer is None or scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        carrier = {
+            key.decode("latin-1"): value.decode("latin-1")
+            for key, value in scope["headers"]
+        }
+        context = propagate.extract(carrier)
+        method = scope["method"]
+        with _tracer.start_as_current_span(
+            f"{method} {scope['path']}",
+            context=context,
+            kind=trace.SpanKind.SERVER,
+            attributes={
+                "http.request.method": method,
+                "url.path": scope["path"],
+            },
+        ) as server_span:
+
+            async def send_wrapper(message):
+                if message["type"] == "http.response.start":
+                    server_span.set_attribute(
+                        "http.response.status_code",
+                        message["status"],
+                    )
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                route = scope.get("route")
+                if route is not None:
+                    server_span.update_name(f"{method} {route.path}")
+                    server_span.set_attribute("http.route", route.path)
@@ -0,0 +1,178 @@
+# app/core/usage.py
+import asyncio
+import logging
+import uuid
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from tortoise import connections
+
+from app.config import settings
+
+logger = logging.getLogger("app.core.usage")
+
+_UPSERT_SQL = """
+INSERT INTO "apikey_usage"
+    ("uuid", "api_key_id", "bucket_start", "request_count", "bytes_served", "last_used_at")
+VALUES ({placeholders})
+ON CONFLICT ("api_key_id", "bucket_start") DO UPDATE SET
+    "request_count" = "apikey_usage"."request_count" + EXCLUDED."request_count",
+    "bytes_served" = "apikey_usage"."bytes_served" + EXCLUDED."bytes_served",
+    "last_used_at" = {greatest}("apikey_usage"."last_used_at", EXCLUDED."last_used_at")
+"""
+
+
+class UsageRecorder:
+    """
+    Accumulates API key usage in memory and writes it to ``apikey_usage``.
+
+    Each request authenticated with an API key adds to the counters of
+    its ``(key, bucket)`` pair, where buckets are
+    ``API_KEY_USAGE_BUCKET_SECONDS`` long. Every
+    ``API_KEY_USAGE_FLUSH_SECONDS``, and once more at shutdown, the
+    pending counters are written with a single batched upsert, so the
+    number of writes depends on the number of active keys rather than on
+    the number of requests.
+    """
+
+    def __init__(self):
+        # (api_key_id, bucket_start) -> [request_count, bytes_served, last_used_at]
+        self._pending: Dict[Tuple[str, datetime], list] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+
+    @staticmethod
+    def bucket_start(moment: datetime) -> datetime:
+        size = settings.API_KEY_USAGE_BUCKET_SECONDS
+        timestamp = int(moment.timestamp())
+        return datetime.fromtimestamp(timestamp - timestamp % size, tz=timezone.utc)
+
+    def record(
+        self,
+        api_key_id: str,
+        bytes_served: int,
+        moment: Optional[datetime] = None,
+    ):
+        moment = moment or datetime.now(timezone.utc)
+        key = (api_key_id, self.bucket_start(moment))
+        counters = self._pending.get(key)
+        if counters is None:
+            self._pending[key] = [1, bytes_served, moment]
+        else:
+            counters[0] += 1
+            counters[1] += bytes_served
+            counters[2] = max(counters[2], moment)
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    async def flush(self) -> int:
+        """
+        Writes the pending counters to the database.
+
+        Returns:
+            int: Number of ``(key, bucket)`` rows upserted.
+        """
+        async with self._lock:
+            if not self._pending:
+                return 0
+            pending, self._pending = self._pending, {}
+            connection = connections.get("default")
+            dialect = connection.capabilities.dialect
+            query, rows = self._build(dialect, pending)
+            try:
+                await connection.execute_many(query, rows)
+            except Exception as err:
+                # Usually a key deleted since its requests were counted:
+                # write the rows one by one so the others are kept.
+                logger.warning("Batched usage flush failed, retrying per row: %s", err)
+                written = 0
+                for row in rows:
+                    try:
+                        await connection.execute_query(query, row)
+                        written += 1
+                    except Exception as row_err:
+                        logger.error("Dropping usage row for %s: %s", row[1], row_err)
+                return written
+            logger.debug("Flushed usage for %d API key buckets", len(rows))
+            return len(rows)
+
+    @staticmethod
+    def _build(dialect: str, pending: dict) -> Tuple[str, List[list]]:
+        if dialect == "postgres":
+            placeholders = ", ".join(f"${index}" for index in range(1, 7))
+            greatest = "GREATEST"
+        else:
+            placeholders = ", ".join("?" * 6)
+            greatest = "MAX"
+        rows = []
+        for (api_key_id, bucket_start), (count, size, last_used) in pending.items():
+            if dialect == "sqlite":
+                # Stored as text; keep the format Tortoise uses so values compare.
+                bucket_start = bucket_start.isoformat(sep=" ", timespec="microseconds")
+                last_used = last_used.isoformat(sep=" ", timespec="microseconds")
+            rows.append(
+                [str(uuid.uuid4()), api_key_id, bucket_start, count, size, last_used]
+            )
+        query = _UPSERT_SQL.format(placeholders=placeholders, greatest=greatest)
+        return query, rows
+
+    async def _run(self, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.flush()
+            except Exception as err:
+                logger.error("Error flushing API key usage: %s", err)
+
+    async def start(self):
+        self._task = asyncio.create_task(
+            self._run(settings.API_KEY_USAGE_FLUSH_SECONDS)
+        )
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        try:
+            await self.flush()
+        except Exception as err:
+            logger.error("Error flushing API key usage at shutdown: %s", err)
+
+
+usage_recorder = UsageRecorder()
+
+
+class UsageMiddleware:
+    """
+    ASGI middleware that counts the response bytes of requests
+    authenticated with an API key.
+
+    The API key is identified by ``request.state.api_key_id``, set by
+    ``get_current_user`` when a key matches.
+    """
+
+    def __init__(self, app, recorder: UsageRecorder = usage_recorder):
+        self.app = app
+        self.recorder = recorder
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        bytes_served = 0
+
+        async def send_wrapper(message):
+            nonlocal bytes_served
+            if message["type"] == "http.response.body":
+                bytes_served += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            api_key_id = scope.get("state", {}).get("api_key_id")
+            if api_key_id is not None:
+                self.recorder.record(api_key_id, bytes_served)
@@ -1,27 +1,52 @@
 import logging
-from typing import Optional
-
-import bcrypt
+from typing import Optional, Tuple
 
 from fastapi import Depends, HTTPException, status, Request
 from fastapi.security import OAuth2PasswordBearer
 
 from slowapi import Limiter
-from slowapi.util import get_remote_address
 
 from jwt import PyJWTError
 
-from app.core.auth import verify_token
-from app.models import User, ApiKey
+from app.core.auth import (
+    Principal,
+    decode_token,
+    principal_from_claims,
+    verify_api_key,
+)
+from app.core.ratelimit import identify, rate_limit_key
+from app.core.repository import ApiKeyRecord, get_repository
+from app.core.revocation import revocation_cache
+from app.core.tracing import span
+from app.models import User
 from app.config import settings
 
 logger = logging.getLogger("app.dependencies")
-limiter = Limiter(
-    key_func=get_remote_address,
+
+
+class TracedLimiter(Limiter):
+    """
+    Limiter that records each rate limit check as a span.
+    """
+
+    def _check_request_limit(self, *args, **kwargs):
+        with span("ratelimit.check"):
+            return super()._check_request_limit(*args, **kwargs)
+
+
+limiter = TracedLimiter(
+    key_func=rate_limit_key,
     auto_check=True,
     enabled=True,
     default_limits=["5/second"],
 )
+# HTTP methods each API key scope may use; None allows every method.
+# Routes authenticated with ``get_scoped_user`` list their scopes instead.
+API_KEY_SCOPES = {
+    "full": None,
+    "read": {"GET", "HEAD"},
+    "ingest": {"POST", "PUT"},
+}
 oauth2_scheme = OAuth2PasswordBearer(
     tokenUrl=f"{settings.API_PREFIX}{settings.API_VERSION}/auth/token",
     auto_error=False,
@@ -31,68 +56,117 @@ oauth2_scheme = OAuth2PasswordBearer(
 async def get_current_user(
     request: Request,
     token: Optional[str] = Depends(oauth2_scheme),
-):
-   
+) -> Principal:
     """
     Checks for an API key in the request headers or query parameters
-    and returns the associated user if found. If no API key is found,
-    it falls back to JWT token authentication and returns the user
-    associated with the given token. If no token is provided, it raises
-    a 401 error.
-    
+    and returns the associated caller if found. If no API key is found,
+    it falls back to JWT token authentication. If no token is provided,
+    it raises a 401 error.
+
+    Bearer tokens carrying the user id and token version are checked
+    against the in-memory revocation cache, so no database query is made;
+    handlers needing the ``User`` row load it themselves.
+
     :param request: The FastAPI request object
     :param token: The JWT token to verify
-    :return: The associated user
+    :return: The authenticated principal
     :raises HTTPException: If the API key is invalid, or if the user is disabled
     """
-    logger.debug("Checking for API key...")
-    api_key = request.headers.get("X-API-KEY") or request.query_params.get(
-        "api_key",
-    )
-    if api_key:
-        key_prefix = api_key[:10]
-        logger.debug("API key provided: %s...", key_prefix)
-        potential_keys = await ApiKey.filter(
-            key_prefix=key_prefix,
-        ).prefetch_related("user")
-        for key in potential_keys:
-            if bcrypt.checkpw(
-                api_key.encode("utf-8"),
-                key.hashed_key.encode("utf-8"),
-            ):
-                if key.user.disabled:
-                    raise HTTPException(
-                        status_code=400,
-                        detail="User disabled",
-                    )
-                return key.user
-        api_keys = await ApiKey.all().prefetch_related("user")
-        logger.debug("Found %d API keys in the database", len(api_keys))
-        for key in api_keys:
-            logger.debug("Checking API key: %s", key.hashed_key)
-            if bcrypt.checkpw(
-                api_key.encode("utf-8"),
-                key.hashed_key.encode("utf-8"),
-            ):
-                logger.debug("API key matched for user: %s", key.user.username)
-                if key.user.disabled:
-                    logger.warning("User %s is disabled", key.user.username)
-                    raise HTTPException(
-                        status_code=400,
-                        detail="User account is disabled",
-                    )
-                return key.user
-        logger.warning("No matching API key found")
+    with span("auth.get_current_user"):
+        return await _authenticate_principal(request, token)
+
+
+def get_scoped_user(*scopes: str):
+    """
+    Returns a dependency authenticating like ``get_current_user`` for
+    routes whose API key scopes do not follow from the HTTP method, such
+    as a POST that starts a bulk read: only API keys with one of
+    ``scopes`` are accepted, whatever the method.
+
+    :param scopes: The API key scopes allowed on the route
+    :return: The dependency
+    """
+
+    async def get_user(
+        request: Request,
+        token: Optional[str] = Depends(oauth2_scheme),
+    ) -> Principal:
+        with span("auth.get_current_user"):
+            return await _authenticate_principal(request, token, scopes)
+
+    return get_user
+
+
+# Bulk reads started with a POST, e.g. export jobs.
+get_current_reader = get_scoped_user("full", "read")
+
+
+def _accept_api_key(
+    request: Request,
+    key: ApiKeyRecord,
+    scopes: Optional[Tuple[str, ...]] = None,
+):
+    """
+    Checks that the user of a matched API key is enabled and that the
+    key scope allows the request, then identifies the caller.
+
+    The scope is checked against ``scopes`` when the route sets them,
+    and against the HTTP method otherwise.
+    """
+    logger.debug("API key matched for user: %s", key.username)
+    if key.disabled:
+        logger.warning("User %s is disabled", key.username)
         raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid API key",
-            headers={"WWW-Authenticate": "API key"},
+            status_code=400,
+            detail="User account is disabled",
+        )
+    if scopes is not None:
+        allowed = key.scope in scopes
+    else:
+        allowed_methods = API_KEY_SCOPES[key.scope]
+        allowed = allowed_methods is None or request.method in allowed_methods
+    if not allowed:
+        logger.warning(
+            "API key %s with scope %s used for %s",
+            key.uuid,
+            key.scope,
+            request.method,
         )
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="API key scope does not allow this request",
+        )
+    request.state.api_key_id = key.uuid
+    request.state.api_key_scope = key.scope
+    identify(
+        request,
+        key.user_id,
+        api_key_id=key.uuid,
+        quota=key.rate_limit,
+    )
+
+
+def _reject_api_key():
+    logger.warning("No matching API key found")
+    raise HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Invalid API key",
+        headers={"WWW-Authenticate": "API key"},
+    )
+
+
+async def _authenticate_token(request: Request, token: Optional[str]) -> User:
+    """
+    Authenticates a bearer token against the ``users`` table, for tokens
+    issued without the user id and version claims, or before the
+    revocation cache is loaded.
+    """
     if not token:
         raise HTTPException(status_code=401, detail="Not authenticated")
     logger.debug("No API key provided, falling back to JWT token")
     try:
-        username = verify_token(token)
+        claims = decode_token(token)
+        username = claims.get("sub")
         if not username:
             logger.warning("Invalid token: no username found")
             raise ValueError("Invalid token")
@@ -106,6 +180,10 @@ async def get_current_user(
                 status_code=400,
                 detail="User account is disabled",
             )
+        if claims.get("ver", 0) < user.token_version:
+            logger.warning("Revoked token used by %s", username)
+            raise PyJWTError("Token has been revoked")
+        identify(request, str(user.uuid))
     except PyJWTError as err:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -127,3 +205,124 @@ async def get_current_user(
             headers={"WWW-Authenticate": "Bearer"},
         ) from err
     return user
+
+
+async def get_current_account_user(
+    request: Request,
+    current_user: Principal = Depends(get_current_user),
+) -> Principal:
+    """
+    Returns the authenticated caller for account management endpoints,
+    which are not available to API keys with a restricted scope.
+
+    :param request: The FastAPI request object
+    :param current_user: The authenticated principal
+    :return: The authenticated principal
+    :raises HTTPException: 403 if a scoped API key was used
+    """
+    if getattr(request.state, "api_key_scope", "full") != "full":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="API key scope does not allow this request",
+        )
+    return current_user
+
+
+async def get_current_admin(
+    principal: Principal = Depends(get_current_account_user),
+) -> User:
+    """
+    Returns the authenticated user if they are an administrator. The
+    ``User`` row is loaded here, as the admin flag is not in the token.
+
+    :param principal: The authenticated principal
+    :return: The authenticated user
+    :raises HTTPException: 403 if the user is not an administrator
+    """
+    current_user = await User.get_or_none(uuid=principal.user_id)
+    if current_user is None or not current_user.is_admin:
+        logger.warning("User %s is not an administrator", principal.username)
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Administrator privileges required",
+        )
+    return current_user
+
+
+async def get_current_principal(
+    request: Request,
+    token: Optional[str] = Depends(oauth2_scheme),
+) -> Principal:
+    """
+    Authenticates the request like ``get_current_user``, traced as its
+    own span for the hot payment and reconciliation routes.
+
+    Bearer tokens carrying the user id and token version are checked
+    against the in-memory revocation cache, so no database query is made.
+    API keys are looked up through the repository; older tokens fall back
+    to the ``users`` table.
+
+    :param request: The FastAPI request object
+    :param token: The JWT token to verify
+    :return: The authenticated principal
+    :raises HTTPException: If the credentials are invalid, revoked, or the
+        user is disabled
+    """
+    with span("auth.get_current_principal"):
+        return await _authenticate_principal(request, token)
+
+
+async def _authenticate_principal(
+    request: Request,
+    token: Optional[str],
+    scopes: Optional[Tuple[str, ...]] = None,
+) -> Principal:
+    api_key = request.headers.get("X-API-KEY") or request.query_params.get(
+        "api_key",
+    )
+    if token and not api_key and revocation_cache.ready:
+        try:
+            principal = principal_from_claims(decode_token(token))
+        except PyJWTError as err:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Invalid authentication credentials",
+                headers={"WWW-Authenticate": "Bearer"},
+            ) from err
+        if principal is not None:
+            if revocation_cache.is_disabled(principal.user_id):
+                logger.warning("User %s is disabled", principal.username)
+                raise HTTPException(
+                    status_code=400,
+                    detail="User account is disabled",
+                )
+            if revocation_cache.is_revoked(
+                principal.user_id,
+                principal.token_version,
+            ):
+                logger.warning("Revoked token used by %s", principal.username)
+                raise HTTPException(
+                    status_code=status.HTTP_401_UNAUTHORIZED,
+                    detail="Invalid authentication credentials",
+                    headers={"WWW-Authenticate": "Bearer"},
+                )
+            identify(request, principal.user_id)
+            return principal
+    if api_key:
+        # Only the key and a few user fields are needed, so the lookup
+        # goes through the repository instead of loading models.
+        for key in await get_repository().api_keys(api_key[:10]):
+            if await verify_api_key(api_key, key.hashed_key):
+                _accept_api_key(request, key, scopes)
+                return Principal(
+                    user_id=key.user_id,
+                    username=key.username,
+                    token_version=key.token_version,
+                )
+        _reject_api_key()
+    user = await _authenticate_token(request, token)
+    return Principal(
+        user_id=str(user.uuid),
+        username=user.username,
+        token_version=user.token_version,
+    )
@@ -13,7 +13,34 @@ from slowapi.errors import RateLimitExceeded
 
 from app.config import settings, TORTOISE_ORM
 from app.dependencies import limiter
-from app.api.endpoints import auth, payments, users, apikeys
+from app.api.endpoints import (
+    auth,
+    payments,
+    users,
+    apikeys,
+    jobs,
+    jwks,
+    health,
+    metrics,
+    admin,
+    webhooks,
+    reconciliation,
+)
+from app.core.health import health_checker
+from app.core.load_shedding import LoadSheddingMiddleware, load_shedder
+from app.core.loop_monitor import LoopMonitorMiddleware, loop_monitor
+from app.core.profiling import ProfilingMiddleware
+from app.core.revocation import revocation_cache
+from app.core.tracing import (
+    TracingMiddleware,
+    setup_tracing,
+    shutdown_tracing,
+)
+from app.core.usage import UsageMiddleware, usage_recorder
+from app.services.idempotency_service import idempotency_service
+from app.services.job_service import job_manager
+from app.services.payment_cache import payment_cache
+from app.services.webhook_service import webhook_dispatcher
 from app.logging_config import setup_logging
 
 logger = logging.getLogger(__name__)
@@ -24,15 +51,40 @@ setup_logging()
 async def lifespan(app: FastAPI):
 
     try:
+        if settings.TRACING_ENABLED:
+            setup_tracing()
         await Tortoise.init(config=TORTOISE_ORM)
         await Tortoise.generate_schemas()
         logger.info("Tortoise-ORM connected to database")
+        await revocation_cache.start()
+        await usage_recorder.start()
+        if settings.PAYMENT_CACHE_ENABLED:
+            await payment_cache.start()
+        idempotency_service.start()
+        if settings.WEBHOOK_DELIVERY_ENABLED:
+            webhook_dispatcher.start()
+        await job_manager.start()
+        if settings.LOOP_MONITOR_ENABLED:
+            loop_monitor.start()
+        if settings.LOAD_SHEDDING_ENABLED:
+            load_shedder.start()
+        health_checker.start()
         yield
     except Exception as err:
         logger.error("Error connecting to database: %s", err)
     finally:
+        health_checker.stop()
+        load_shedder.stop()
+        loop_monitor.stop()
+        await job_manager.shutdown()
+        await webhook_dispatcher.stop()
+        await idempotency_service.stop()
+        await payment_cache.stop()
+        await usage_recorder.stop()
+        await revocation_cache.stop()
         await Tortoise.close_connections()
         logger.info("Tortoise-ORM connections closed")
+        shutdown_tracing()
 
 
 app = FastAPI(title=settings.APP_NAME, lifespan=lifespan)
@@ -45,6 +97,13 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(UsageMiddleware)
+app.add_middleware(ProfilingMiddleware)
+app.add_middleware(TracingMiddleware)
+if settings.LOOP_MONITOR_ENABLED:
+    app.add_middleware(LoopMonitorMiddleware)
+# Outermost, so shed requests cost as little as possible.
+app.add_middleware(LoadSheddingMiddleware)
 
 app.include_router(
     auth.router,
@@ -66,6 +125,29 @@ app.include_router(
     prefix=f"{settings.API_PREFIX}{settings.API_VERSION}/apikeys",
     tags=["apikeys"],
 )
+app.include_router(jwks.router, tags=["auth"])
+app.include_router(health.router, tags=["health"])
+app.include_router(metrics.router, tags=["health"])
+app.include_router(
+    jobs.router,
+    prefix=f"{settings.API_PREFIX}{settings.API_VERSION}/jobs",
+    tags=["jobs"],
+)
+app.include_router(
+    admin.router,
+    prefix=f"{settings.API_PREFIX}{settings.API_VERSION}/admin",
+    tags=["admin"],
+)
+app.include_router(
+    webhooks.router,
+    prefix=f"{settings.API_PREFIX}{settings.API_VERSION}/webhooks",
+    tags=["webhooks"],
+)
+app.include_router(
+    reconciliation.router,
+    prefix=f"{settings.API_PREFIX}{settings.API_VERSION}/reconciliation",
+    tags=["reconciliation"],
+)
 
 @app.exception_handler(RateLimitExceeded)
 async def rate_limit_exceeded_handler(request, exc):
@@ -80,8 +162,3 @@ async def validation_exception_handler(request, exc):
         status_code=422,
         content={"detail": exc.errors()},
     )
-
-# Health check endpoint
-@app.get("/health")
-async def health_check():
-    return {"status": "ok"}
@@ -0,0 +1,17 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        CREATE INDEX IF NOT EXISTS "idx_payments_date_b60147" ON "payments" ("date", "uuid");
+        CREATE INDEX IF NOT EXISTS "idx_payments_amount_09bf55" ON "payments" ("amount", "uuid");
+        CREATE INDEX IF NOT EXISTS "idx_payments_benefic_73d71b" ON "payments" ("beneficiary", "date", "uuid");
+        CREATE INDEX IF NOT EXISTS "idx_payments_benefic_e73149" ON "payments" ("beneficiary", "amount", "uuid");"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        DROP INDEX IF EXISTS "idx_payments_benefic_e73149";
+        DROP INDEX IF EXISTS "idx_payments_benefic_73d71b";
+        DROP INDEX IF EXISTS "idx_payments_amount_09bf55";
+        DROP INDEX IF EXISTS "idx_payments_date_b60147";"""
@@ -0,0 +1,14 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        ALTER TABLE "reconciliation_digests" ADD "version" INT NOT NULL DEFAULT 0;
+        ALTER TABLE "reconciliation_digests" ALTER COLUMN "hours" DROP NOT NULL;"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        DELETE FROM "reconciliation_digests" WHERE "hours" IS NULL;
+        ALTER TABLE "reconciliation_digests" ALTER COLUMN "hours" SET NOT NULL;
+        ALTER TABLE "reconciliation_digests" DROP COLUMN "version";"""
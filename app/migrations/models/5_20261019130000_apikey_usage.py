@@ -0,0 +1,19 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        CREATE TABLE IF NOT EXISTS "apikey_usage" (
+    "uuid" UUID NOT NULL PRIMARY KEY,
+    "bucket_start" TIMESTAMPTZ NOT NULL,
+    "request_count" BIGINT NOT NULL DEFAULT 0,
+    "bytes_served" BIGINT NOT NULL DEFAULT 0,
+    "last_used_at" TIMESTAMPTZ NOT NULL,
+    "api_key_id" UUID NOT NULL REFERENCES "apikeys" ("uuid") ON DELETE CASCADE,
+    CONSTRAINT "uid_apikey_usag_api_key_5d9b85" UNIQUE ("api_key_id", "bucket_start")
+);"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        DROP TABLE IF EXISTS "apikey_usage";"""
@@ -0,0 +1,15 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        ALTER TABLE "apikeys" ADD "scope" VARCHAR(10) NOT NULL DEFAULT 'full';
+        ALTER TABLE "apikeys" ADD "expires_at" TIMESTAMPTZ;
+        CREATE INDEX IF NOT EXISTS "idx_apikeys_key_pre_64f0f3" ON "apikeys" ("key_prefix");"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        DROP INDEX IF EXISTS "idx_apikeys_key_pre_64f0f3";
+        ALTER TABLE "apikeys" DROP COLUMN "expires_at";
+        ALTER TABLE "apikeys" DROP COLUMN "scope";"""
@@ -0,0 +1,23 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        CREATE TABLE IF NOT EXISTS "idempotency_keys" (
+    "uuid" UUID NOT NULL PRIMARY KEY,
+    "key" VARCHAR(255) NOT NULL,
+    "request_hash" VARCHAR(64) NOT NULL,
+    "status_code" INT,
+    "response_body" TEXT,
+    "locked_until" TIMESTAMPTZ,
+    "created_at" TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    "expires_at" TIMESTAMPTZ NOT NULL,
+    "user_id" UUID NOT NULL REFERENCES "users" ("uuid") ON DELETE CASCADE,
+    CONSTRAINT "uid_idempotency_user_id_bc4599" UNIQUE ("user_id", "key")
+);
+        CREATE INDEX IF NOT EXISTS "idx_idempotency_expires_ae52bb" ON "idempotency_keys" ("expires_at");"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        DROP TABLE IF EXISTS "idempotency_keys";"""
@@ -0,0 +1,32 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        CREATE TABLE IF NOT EXISTS "webhook_subscriptions" (
+    "uuid" UUID NOT NULL PRIMARY KEY,
+    "url" VARCHAR(2000) NOT NULL,
+    "secret" VARCHAR(64) NOT NULL,
+    "is_active" BOOL NOT NULL DEFAULT True,
+    "created_at" TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    "user_id" UUID NOT NULL REFERENCES "users" ("uuid") ON DELETE CASCADE
+);
+        CREATE TABLE IF NOT EXISTS "webhook_outbox" (
+    "uuid" UUID NOT NULL PRIMARY KEY,
+    "event_type" VARCHAR(50) NOT NULL,
+    "payload" JSONB NOT NULL,
+    "status" VARCHAR(10) NOT NULL DEFAULT 'pending',
+    "attempts" INT NOT NULL DEFAULT 0,
+    "next_attempt_at" TIMESTAMPTZ NOT NULL,
+    "locked_until" TIMESTAMPTZ,
+    "last_error" TEXT,
+    "created_at" TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    "subscription_id" UUID NOT NULL REFERENCES "webhook_subscriptions" ("uuid") ON DELETE CASCADE
+);
+        CREATE INDEX IF NOT EXISTS "idx_webhook_out_status_c54b8c" ON "webhook_outbox" ("status", "next_attempt_at");"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        DROP TABLE IF EXISTS "webhook_outbox";
+        DROP TABLE IF EXISTS "webhook_subscriptions";"""
@@ -14,6 +14,14 @@ class Payment(Model):
 
     class Meta:
         table = "payments"
+        # Keyset pagination of the filtered listing: every filter and sort
+        # of ``PaymentService.search_payments`` is served by one of these.
+        indexes = (
+            ("date", "uuid"),
+            ("amount", "uuid"),
+            ("beneficiary", "date", "uuid"),
+            ("beneficiary", "amount", "uuid"),
+        )
 
 
 class User(Model):
@@ -23,6 +31,8 @@ class User(Model):
     email = fields.CharField(max_length=255, unique=True, null=True)
     hashed_password = fields.CharField(max_length=128)
     disabled = fields.BooleanField(default=False)
+    is_admin = fields.BooleanField(default=False)
+    token_version = fields.IntField(default=0)
     created_at = fields.DatetimeField(auto_now_add=True)
     updated_at = fields.DatetimeField(auto_now=True)
 
@@ -50,9 +60,126 @@ class ApiKey(Model):
     uuid = fields.UUIDField(primary_key=True, default=uuid.uuid4)
     user = fields.ForeignKeyField("models.User", related_name="apikeys")
     hashed_key = fields.CharField(max_length=128)
-    key_prefix = fields.CharField(max_length=10)
+    key_prefix = fields.CharField(max_length=10, db_index=True)
+    scope = fields.CharField(max_length=10, default="full")
     created_at = fields.DatetimeField(auto_now_add=True)
+    expires_at = fields.DatetimeField(null=True)
     is_active = fields.BooleanField(default=True)
+    # Replaces the route rate limits for requests made with the key.
+    rate_limit = fields.CharField(max_length=100, null=True)
 
     class Meta:
         table = "apikeys"
+
+
+class Job(Model):
+
+    uuid = fields.UUIDField(primary_key=True, default=uuid.uuid4)
+    user = fields.ForeignKeyField("models.User", related_name="jobs")
+    kind = fields.CharField(max_length=20)
+    status = fields.CharField(max_length=20, default="pending", db_index=True)
+    params = fields.JSONField(default=dict)
+    progress = fields.BigIntField(default=0)
+    result_path = fields.CharField(max_length=500, null=True)
+    error = fields.TextField(null=True)
+    created_at = fields.DatetimeField(auto_now_add=True)
+    updated_at = fields.DatetimeField(auto_now=True)
+    finished_at = fields.DatetimeField(null=True)
+
+    class Meta:
+        table = "jobs"
+
+
+class RefreshToken(Model):
+
+    uuid = fields.UUIDField(primary_key=True, default=uuid.uuid4)
+    user = fields.ForeignKeyField("models.User", related_name="refresh_tokens")
+    token_hash = fields.CharField(max_length=64, unique=True)
+    family = fields.UUIDField(db_index=True)
+    expires_at = fields.DatetimeField()
+    created_at = fields.DatetimeField(auto_now_add=True)
+    revoked_at = fields.DatetimeField(null=True)
+
+    class Meta:
+        table = "refresh_tokens"
+
+
+class ApiKeyUsage(Model):
+
+    uuid = fields.UUIDField(primary_key=True, default=uuid.uuid4)
+    api_key = fields.ForeignKeyField("models.ApiKey", related_name="usage")
+    bucket_start = fields.DatetimeField()
+    request_count = fields.BigIntField(default=0)
+    bytes_served = fields.BigIntField(default=0)
+    last_used_at = fields.DatetimeField()
+
+    class Meta:
+        table = "apikey_usage"
+        unique_together = (("api_key", "bucket_start"),)
+
+
+class IdempotencyKey(Model):
+
+    uuid = fields.UUIDField(primary_key=True, default=uuid.uuid4)
+    user = fields.ForeignKeyField("models.User", related_name="idempotency_keys")
+    key = fields.CharField(max_length=255)
+    request_hash = fields.CharField(max_length=64)
+    # Null while the request is being processed.
+    status_code = fields.IntField(null=True)
+    response_body = fields.TextField(null=True)
+    locked_until = fields.DatetimeField(null=True)
+    created_at = fields.DatetimeField(auto_now_add=True)
+    expires_at = fields.DatetimeField(db_index=True)
+
+    class Meta:
+        table = "idempotency_keys"
+        unique_together = (("user", "key"),)
+
+
+class WebhookSubscription(Model):
+
+    uuid = fields.UUIDField(primary_key=True, default=uuid.uuid4)
+    user = fields.ForeignKeyField("models.User", related_name="webhooks")
+    url = fields.CharField(max_length=2000)
+    secret = fields.CharField(max_length=64)
+    is_active = fields.BooleanField(default=True)
+    created_at = fields.DatetimeField(auto_now_add=True)
+
+    class Meta:
+        table = "webhook_subscriptions"
+
+
+class WebhookOutbox(Model):
+
+    # Also the event id sent to the receiver.
+    uuid = fields.UUIDField(primary_key=True, default=uuid.uuid4)
+    subscription = fields.ForeignKeyField(
+        "models.WebhookSubscription",
+        related_name="outbox",
+    )
+    event_type = fields.CharField(max_length=50)
+    payload = fields.JSONField()
+    status = fields.CharField(max_length=10, default="pending")
+    attempts = fields.IntField(default=0)
+    next_attempt_at = fields.DatetimeField()
+    locked_until = fields.DatetimeField(null=True)
+    last_error = fields.TextField(null=True)
+    created_at = fields.DatetimeField(auto_now_add=True)
+
+    class Meta:
+        table = "webhook_outbox"
+        indexes = (("status", "next_attempt_at"),)
+
+
+class ReconciliationDigest(Model):
+
+    # Fingerprints of a closed UTC day, one [count, sum] pair per hour.
+    # Writes to the day clear them and bump the version, so a digest
+    # computed meanwhile is not stored.
+    day = fields.DateField(primary_key=True)
+    hours = fields.JSONField(null=True)
+    version = fields.IntField(default=0)
+    computed_at = fields.DatetimeField(auto_now=True)
+
+    class Meta:
+        table = "reconciliation_digests"
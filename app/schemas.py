@@ -1,7 +1,18 @@
-from pydantic import BaseModel, EmailStr, ConfigDict
-from datetime import datetime
+from limits import parse_many
+from pydantic import (
+    BaseModel,
+    EmailStr,
+    ConfigDict,
+    Field,
+    HttpUrl,
+    field_validator,
+)
+from pydantic_core import PydanticCustomError
+from datetime import date, datetime
 from decimal import Decimal
-from typing import Optional
+from typing import List, Literal, Optional
+from typing_extensions import TypedDict
+from uuid import UUID
 
 class PaymentSchema(BaseModel):
 
@@ -12,6 +23,28 @@ class PaymentSchema(BaseModel):
     model_config = ConfigDict(from_attributes=True)
 
 
+class PaymentRecord(TypedDict):
+    """
+    Payment as read by the listing endpoints. ``amount`` is the exact
+    decimal string built from integer cents, e.g. ``"100.00"``.
+    """
+
+    date: Optional[datetime]
+    document: Optional[str]
+    beneficiary: str
+    amount: str
+
+
+class PaymentCreate(BaseModel):
+
+    date: Optional[datetime] = None
+    document: Optional[str] = Field(default=None, max_length=200)
+    beneficiary: str = Field(max_length=200)
+    amount: Decimal = Field(max_digits=15, decimal_places=2)
+
+    model_config = ConfigDict()
+
+
 class UserCreate(BaseModel):
 
     username: str
@@ -19,6 +52,22 @@ class UserCreate(BaseModel):
     password: str
 
     model_config = ConfigDict()
+class UserInvite(BaseModel):
+
+    username: str
+    email: EmailStr
+    password: Optional[str] = None
+
+    model_config = ConfigDict()
+
+
+class UserProvision(BaseModel):
+
+    users: list[UserInvite] = Field(min_length=1)
+
+    model_config = ConfigDict()
+
+
 class UserPasswordUpdate(BaseModel):
    
     old_password: str
@@ -26,8 +75,148 @@ class UserPasswordUpdate(BaseModel):
 
     model_config = ConfigDict()
 
+class RefreshTokenRequest(BaseModel):
+
+    refresh_token: str
+
+    model_config = ConfigDict()
+
+
 class ApiKeySchema(BaseModel):
     
     api_key: str
 
     model_config = ConfigDict(from_attributes=True)
+
+class ApiKeyCreate(BaseModel):
+
+    scope: Literal["full", "read", "ingest"] = "full"
+    expires_at: Optional[datetime] = None
+
+    model_config = ConfigDict()
+
+
+class ApiKeyInfo(BaseModel):
+
+    id: UUID = Field(validation_alias="uuid")
+    key_prefix: str
+    scope: str
+    created_at: datetime
+    expires_at: Optional[datetime] = None
+    is_active: bool
+    rate_limit: Optional[str] = None
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class ApiKeyRateLimit(BaseModel):
+
+    rate_limit: Optional[str] = Field(
+        default=None,
+        max_length=100,
+        examples=["1000/minute", "100/minute;10000/day"],
+    )
+
+    model_config = ConfigDict()
+
+    @field_validator("rate_limit")
+    @classmethod
+    def check_rate_limit(cls, value: Optional[str]) -> Optional[str]:
+        if value is not None:
+            try:
+                parse_many(value)
+            except ValueError as err:
+                raise PydanticCustomError("rate_limit", str(err)) from err
+        return value
+
+
+class ApiKeyUsageSchema(BaseModel):
+
+    api_key_id: UUID
+    key_prefix: str
+    bucket_start: datetime
+    request_count: int
+    bytes_served: int
+    last_used_at: datetime
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class JobSchema(BaseModel):
+
+    id: UUID = Field(validation_alias="uuid")
+    kind: str
+    status: str
+    progress: int
+    error: Optional[str] = None
+    created_at: datetime
+    finished_at: Optional[datetime] = None
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class ExportJobCreate(BaseModel):
+
+    format: Literal["arrow", "parquet"] = "parquet"
+    start_date: Optional[str] = None
+    end_date: Optional[str] = None
+
+    model_config = ConfigDict()
+
+
+class WebhookCreate(BaseModel):
+
+    url: HttpUrl = Field(max_length=2000)
+
+    model_config = ConfigDict()
+
+
+class WebhookInfo(BaseModel):
+
+    id: UUID = Field(validation_alias="uuid")
+    url: str
+    is_active: bool
+    created_at: datetime
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class HourFingerprint(BaseModel):
+
+    hour: int
+    count: int
+    fingerprint: str
+
+    model_config = ConfigDict()
+
+
+class DayFingerprint(BaseModel):
+
+    day: date
+    count: int
+    fingerprint: str
+    hours: Optional[List[HourFingerprint]] = None
+
+    model_config = ConfigDict()
+
+
+class ReconciliationReport(BaseModel):
+
+    start_date: date
+    end_date: date
+    count: int
+    fingerprint: str
+    days: List[DayFingerprint]
+
+    model_config = ConfigDict()
+
+
+class ProfileRequest(BaseModel):
+
+    seconds: float = Field(default=10.0, gt=0, le=300)
+    route: Optional[str] = None
+    requests: int = Field(default=10, ge=1)
+    format: Literal["collapsed", "speedscope"] = "collapsed"
+    interval_ms: float = Field(default=5.0, ge=1, le=1000)
+
+    model_config = ConfigDict()
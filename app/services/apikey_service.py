@@ -0,0 +1,146 @@
+# app/services/apikey_service.py
+import logging
+import secrets
+import uuid
+from datetime import datetime, timezone
+from typing import List, Optional, Tuple
+
+from fastapi import HTTPException
+from tortoise.transactions import in_transaction
+
+from app.core.auth import Principal, forget_api_key, hash_password_async
+from app.models import ApiKey
+
+
+logger = logging.getLogger("app.services.apikey_service")
+
+
+class ApiKeyService:
+    async def generate(
+        self,
+        user: Principal,
+        scope: str = "full",
+        expires_at: Optional[datetime] = None,
+    ) -> Tuple[ApiKey, str]:
+        """
+        Creates an API key for a user.
+
+        Args:
+            user: Owner of the key.
+            scope: ``full``, ``read`` (GET/HEAD only) or ``ingest``
+                (POST/PUT only).
+            expires_at: When the key stops working. Naive datetimes are
+                taken as UTC. None for a key that does not expire.
+
+        Returns:
+            Tuple[ApiKey, str]: The stored key and the raw key. Only the
+                bcrypt hash of the raw key is stored.
+
+        Raises:
+            HTTPException: 400 if ``expires_at`` is in the past.
+        """
+        if expires_at is not None:
+            if expires_at.tzinfo is None:
+                expires_at = expires_at.replace(tzinfo=timezone.utc)
+            if expires_at <= datetime.now(timezone.utc):
+                raise HTTPException(
+                    status_code=400,
+                    detail="Expiry must be in the future",
+                )
+        raw_api_key = secrets.token_urlsafe(32)
+        api_key = await ApiKey.create(
+            user_id=user.user_id,
+            hashed_key=await hash_password_async(raw_api_key),
+            key_prefix=raw_api_key[:10],
+            scope=scope,
+            expires_at=expires_at,
+        )
+        return api_key, raw_api_key
+
+    async def list_keys(self, user: Principal) -> List[ApiKey]:
+        return await ApiKey.filter(user_id=user.user_id).order_by("-created_at")
+
+    async def get_user_key(self, user: Principal, key_id: uuid.UUID) -> ApiKey:
+        api_key = await ApiKey.get_or_none(uuid=key_id, user_id=user.user_id)
+        if api_key is None:
+            raise HTTPException(status_code=404, detail="API key not found")
+        return api_key
+
+    async def revoke(self, user: Principal, key_id: uuid.UUID) -> ApiKey:
+        """
+        Deactivates an API key. The row is kept for its usage history.
+
+        Every worker loads the key row on each request, so the key is
+        rejected everywhere as soon as this update commits.
+        """
+        api_key = await self.get_user_key(user, key_id)
+        if api_key.is_active:
+            api_key.is_active = False
+            await api_key.save(update_fields=["is_active"])
+            logger.info("API key %s... revoked", api_key.key_prefix)
+        forget_api_key(api_key.hashed_key)
+        return api_key
+
+    async def rotate(self, user: Principal, key_id: uuid.UUID) -> Tuple[ApiKey, str]:
+        """
+        Replaces an active API key with a new one of the same scope and
+        expiry, revoking the old key.
+
+        Raises:
+            HTTPException: 404 if the key does not exist, 409 if it is
+                already revoked.
+        """
+        old_key = await self.get_user_key(user, key_id)
+        if not old_key.is_active:
+            raise HTTPException(status_code=409, detail="API key is revoked")
+        raw_api_key = secrets.token_urlsafe(32)
+        hashed_key = await hash_password_async(raw_api_key)
+        async with in_transaction() as connection:
+            updated = await ApiKey.filter(
+                uuid=old_key.uuid,
+                is_active=True,
+            ).using_db(connection).update(is_active=False)
+            if not updated:
+                raise HTTPException(status_code=409, detail="API key is revoked")
+            new_key = await ApiKey.create(
+                user_id=user.user_id,
+                hashed_key=hashed_key,
+                key_prefix=raw_api_key[:10],
+                scope=old_key.scope,
+                expires_at=old_key.expires_at,
+                using_db=connection,
+            )
+        forget_api_key(old_key.hashed_key)
+        logger.info(
+            "API key %s... rotated to %s...",
+            old_key.key_prefix,
+            new_key.key_prefix,
+        )
+        return new_key, raw_api_key
+
+    async def set_rate_limit(
+        self,
+        key_id: uuid.UUID,
+        rate_limit: Optional[str],
+    ) -> ApiKey:
+        """
+        Sets the rate limit of an API key, replacing the route limits for
+        requests made with it. None restores the route limits.
+
+        The key row is loaded on every request, so every worker applies
+        the new limit from the next request made with the key.
+
+        Raises:
+            HTTPException: 404 if the key does not exist.
+        """
+        api_key = await ApiKey.get_or_none(uuid=key_id)
+        if api_key is None:
+            raise HTTPException(status_code=404, detail="API key not found")
+        api_key.rate_limit = rate_limit
+        await api_key.save(update_fields=["rate_limit"])
+        logger.info(
+            "API key %s... rate limit set to %s",
+            api_key.key_prefix,
+            rate_limit,
+        )
+        return api_key
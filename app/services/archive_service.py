@@ -0,0 +1,387 @@
+# app/services/archive_service.py
+"""
+Archive of cold payments in compressed, date-partitioned Arrow files.
+
+Payments dated before a cutoff are moved out of the ``payments`` table
+into one Arrow IPC file per UTC month under ``ARCHIVE_DIR``
+(``YYYY/payments-YYYY-MM.arrow``, ``ARCHIVE_COMPRESSION`` buffers), with
+the schema of the columnar export. ``index.json`` lists the partitions
+with their row count and date bounds.
+
+Reads open the partitions overlapping the requested range and filter
+them with Arrow compute kernels in a thread. The files are memory-mapped,
+but with buffer compression every column of a partition is still
+decompressed in full when it is read, so callers reading many ranges of
+one request pass a ``cache`` to decode each partition once.
+
+A month is published (its partition and the index replaced) before its
+rows are deleted from the table, so until the deletion commits, or for
+good after a crash in between, rows exist in both places. Readers pass
+the uuids of the live rows they read as ``exclude``: the table wins.
+"""
+import asyncio
+import json
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Collection, Dict, List, Optional, Tuple
+
+from tortoise.transactions import in_transaction
+
+from app.config import settings
+from app.models import Payment
+from app.services.export_service import ExportService, payment_schema
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+except ImportError:  # pragma: no cover - optional dependency
+    pa = None
+    pc = None
+
+
+logger = logging.getLogger("app.services.archive_service")
+
+INDEX_FILE = "index.json"
+ONE_MICROSECOND = timedelta(microseconds=1)
+
+
+def utc(moment: datetime) -> datetime:
+    # Naive datetimes are UTC, as in Tortoise's default configuration.
+    if moment.tzinfo is None:
+        return moment.replace(tzinfo=timezone.utc)
+    return moment.astimezone(timezone.utc)
+
+
+def month_start(moment: datetime) -> datetime:
+    return utc(moment).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def next_month(start: datetime) -> datetime:
+    return (start + timedelta(days=32)).replace(day=1)
+
+
+class PaymentArchive:
+    """
+    Reads and writes the archive under ``ARCHIVE_DIR``.
+
+    The index is cached and reloaded when its modification time changes,
+    so archives written by the CLI are picked up by running servers.
+    """
+
+    def __init__(self, directory: Optional[str] = None):
+        self._directory = directory
+        self._index: Dict[str, dict] = {}
+        self._index_mtime: Optional[float] = None
+
+    @property
+    def directory(self) -> str:
+        return self._directory or settings.ARCHIVE_DIR
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def partitions(self) -> Dict[str, dict]:
+        """
+        Returns the index: partition (``YYYY-MM``) to ``file``, ``rows``,
+        ``first`` and ``last`` (ISO dates of the oldest and newest rows).
+        """
+        path = self._path(INDEX_FILE)
+        try:
+            mtime = os.stat(path).st_mtime
+        except FileNotFoundError:
+            self._index, self._index_mtime = {}, None
+            return self._index
+        if mtime != self._index_mtime:
+            with open(path, encoding="utf-8") as handle:
+                self._index = json.load(handle)["partitions"]
+            self._index_mtime = mtime
+        return self._index
+
+    def _save_index(self, partitions: Dict[str, dict]):
+        path = self._path(INDEX_FILE)
+        with open(f"{path}.tmp", "w", encoding="utf-8") as handle:
+            json.dump({"partitions": partitions}, handle, indent=2, sort_keys=True)
+            handle.flush()
+            os.fsync(handle.fileno())
+        os.replace(f"{path}.tmp", path)
+
+    def _overlapping(
+        self,
+        start: Optional[datetime],
+        end: Optional[datetime],
+    ) -> List[dict]:
+        if pa is None:
+            return []
+        partitions = []
+        for _, partition in sorted(self.partitions().items()):
+            if start is not None and datetime.fromisoformat(
+                partition["last"]
+            ) < utc(start):
+                continue
+            if end is not None and datetime.fromisoformat(
+                partition["first"]
+            ) > utc(end):
+                continue
+            partitions.append(partition)
+        return partitions
+
+    def overlapping(
+        self,
+        start: Optional[datetime],
+        end: Optional[datetime],
+    ) -> List[str]:
+        """
+        Returns the files of the partitions holding rows between ``start``
+        and ``end`` (inclusive, None for unbounded).
+        """
+        return [
+            self._path(partition["file"])
+            for partition in self._overlapping(start, end)
+        ]
+
+    def span(
+        self,
+        start: Optional[datetime],
+        end: Optional[datetime],
+    ) -> Optional[Tuple[datetime, datetime]]:
+        """
+        Returns the dates of the oldest and newest archived rows of the
+        partitions overlapping ``start`` to ``end``, None if there are none.
+        Only live rows dated within it can also be archived.
+        """
+        partitions = self._overlapping(start, end)
+        if not partitions:
+            return None
+        return (
+            min(datetime.fromisoformat(p["first"]) for p in partitions),
+            max(datetime.fromisoformat(p["last"]) for p in partitions),
+        )
+
+    @staticmethod
+    def _read_table(
+        path: str,
+        start: Optional[datetime],
+        end: Optional[datetime],
+        exclude=None,
+        cache: Optional[dict] = None,
+    ):
+        table = None if cache is None else cache.get(path)
+        if table is None:
+            with pa.memory_map(path) as source:
+                # Decompresses every buffer of the partition.
+                table = pa.ipc.open_file(source).read_all()
+            if cache is not None:
+                cache[path] = table
+        mask = None
+        if start is not None:
+            mask = pc.greater_equal(table["date"], pa.scalar(utc(start)))
+        if end is not None:
+            before = pc.less_equal(table["date"], pa.scalar(utc(end)))
+            mask = before if mask is None else pc.and_(mask, before)
+        if exclude is not None:
+            kept = pc.invert(pc.is_in(table["uuid"], value_set=exclude))
+            mask = kept if mask is None else pc.and_(mask, kept)
+        return table if mask is None else table.filter(mask)
+
+    async def read_tables(
+        self,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        exclude: Collection[str] = (),
+        cache: Optional[dict] = None,
+    ):
+        """
+        Yields, per overlapping partition, an Arrow table of the archived
+        payments between ``start`` and ``end`` (inclusive) whose uuid is
+        not in ``exclude``.
+
+        With a ``cache`` dict, decoded partitions are kept in it for the
+        next calls, and those not overlapping this range are dropped, so
+        reading consecutive ranges holds about one partition at a time.
+        """
+        paths = self.overlapping(start, end)
+        if cache is not None:
+            for path in set(cache) - set(paths):
+                del cache[path]
+        value_set = pa.array(list(exclude), pa.string()) if exclude else None
+        for path in paths:
+            table = await asyncio.to_thread(
+                self._read_table,
+                path,
+                start,
+                end,
+                value_set,
+                cache,
+            )
+            if table.num_rows:
+                yield table
+
+    async def records(
+        self,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        exclude: Collection[str] = (),
+        cache: Optional[dict] = None,
+    ) -> List[dict]:
+        """
+        Returns the archived payments between ``start`` and ``end`` whose
+        uuid is not in ``exclude`` as records of the listing endpoints.
+        """
+        records = []
+        async for table in self.read_tables(start, end, exclude, cache):
+            records.extend(
+                {
+                    "date": date,
+                    "document": document,
+                    "beneficiary": beneficiary,
+                    "amount": amount,
+                }
+                for date, document, beneficiary, amount in zip(
+                    table["date"].to_pylist(),
+                    table["document"].to_pylist(),
+                    table["beneficiary"].to_pylist(),
+                    table["amount"].cast(pa.string()).to_pylist(),
+                )
+            )
+        return records
+
+    def _open_partition(self, name: str, existing: Optional[str]):
+        relative = os.path.join(name[:4], f"payments-{name}.arrow")
+        path = self._path(relative)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        writer = _PartitionWriter(relative, path)
+        if existing is not None:
+            with pa.memory_map(self._path(existing)) as source:
+                writer.write(pa.ipc.open_file(source).read_all())
+        return writer
+
+    async def archive(
+        self,
+        cutoff: datetime,
+        batch_size: Optional[int] = None,
+    ) -> int:
+        """
+        Moves the payments dated before ``cutoff`` to the archive, one
+        month at a time: the partition file and the index are replaced
+        first, then the archived rows are deleted from the table.
+
+        A run interrupted before the deletion leaves rows in both places;
+        running it again rewrites the partition without duplicates and
+        completes the deletion.
+
+        Args:
+            cutoff: Payments dated before this moment are archived.
+            batch_size: Rows read per query. Defaults to ``EXPORT_BATCH_SIZE``.
+
+        Returns:
+            int: Number of payments moved.
+
+        Raises:
+            RuntimeError: If pyarrow is not installed.
+        """
+        if pa is None:
+            raise RuntimeError("Archiving requires the 'pyarrow' package")
+        cutoff = utc(cutoff)
+        oldest = await Payment.filter(date__lt=cutoff).order_by("date").first()
+        if oldest is None:
+            return 0
+        os.makedirs(self.directory, exist_ok=True)
+        partitions = dict(self.partitions())
+        export_service = ExportService()
+        moved = 0
+        start = month_start(oldest.date)
+        while start < cutoff:
+            end = min(next_month(start), cutoff)
+            name = start.strftime("%Y-%m")
+            uuids: List[str] = []
+            writer = None
+            try:
+                async for rows in export_service.iter_rows(
+                    start,
+                    end - ONE_MICROSECOND,
+                    batch_size,
+                ):
+                    if writer is None:
+                        writer = self._open_partition(
+                            name,
+                            partitions.get(name, {}).get("file"),
+                        )
+                    uuids.extend(str(row[0]) for row in rows)
+                    writer.write(
+                        pa.Table.from_batches(
+                            [export_service.to_record_batch(rows)]
+                        )
+                    )
+            except BaseException:
+                if writer is not None:
+                    writer.abort()
+                raise
+            if writer is not None:
+                partitions[name] = writer.close()
+                self._save_index(partitions)
+                await self._delete(uuids, batch_size)
+                moved += len(uuids)
+                logger.info("Archived %d payments of %s", len(uuids), name)
+            start = next_month(start)
+        return moved
+
+    @staticmethod
+    async def _delete(uuids: List[str], batch_size: Optional[int]):
+        batch_size = batch_size or settings.EXPORT_BATCH_SIZE
+        async with in_transaction() as connection:
+            for offset in range(0, len(uuids), batch_size):
+                await Payment.filter(
+                    uuid__in=uuids[offset:offset + batch_size],
+                ).using_db(connection).delete()
+
+
+class _PartitionWriter:
+    """
+    Writes a partition to a temporary file, skipping rows whose uuid was
+    written already, and moves it into place on ``close``.
+    """
+
+    def __init__(self, relative: str, path: str):
+        self.relative = relative
+        self.path = path
+        self._writer = pa.ipc.new_file(
+            f"{path}.tmp",
+            payment_schema(),
+            options=pa.ipc.IpcWriteOptions(
+                compression=settings.ARCHIVE_COMPRESSION,
+            ),
+        )
+        self._seen = set()
+        self.rows = 0
+        self.first: Optional[datetime] = None
+        self.last: Optional[datetime] = None
+
+    def write(self, table):
+        uuids = table["uuid"].to_pylist()
+        table = table.filter(pa.array([uuid not in self._seen for uuid in uuids]))
+        if not table.num_rows:
+            return
+        self._seen.update(uuids)
+        self._writer.write_table(table)
+        self.rows += table.num_rows
+        bounds = pc.min_max(table["date"]).as_py()
+        self.first = min(self.first or bounds["min"], bounds["min"])
+        self.last = max(self.last or bounds["max"], bounds["max"])
+
+    def abort(self):
+        self._writer.close()
+        os.remove(f"{self.path}.tmp")
+
+    def close(self) -> dict:
+        self._writer.close()
+        os.replace(f"{self.path}.tmp", self.path)
+        return {
+            "file": self.relative,
+            "rows": self.rows,
+            "first": self.first.isoformat(),
+            "last": self.last.isoformat(),
+        }
+
+
+payment_archive = PaymentArchive()
@@ -0,0 +1,278 @@
+# app/services/export_service.py
+import logging
+from datetime import datetime
+from typing import AsyncIterator, Awaitable, Callable, List, Optional, Tuple
+
+from fastapi import HTTPException
+
+from app.config import settings
+from app.models import Payment
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - optional dependency
+    pa = None
+    pq = None
+
+
+logger = logging.getLogger("app.services.export_service")
+
+EXPORT_MEDIA_TYPES = {
+    "arrow": "application/vnd.apache.arrow.stream",
+    "parquet": "application/vnd.apache.parquet",
+}
+PAYMENT_COLUMNS = ("uuid", "date", "document", "beneficiary", "amount")
+
+ProgressCallback = Callable[[int], Awaitable[None]]
+
+
+def payment_schema():
+    """
+    Returns the Arrow schema used for exported payments.
+
+    ``amount`` is stored as ``decimal128(15, 2)`` to match
+    ``Payment.amount`` exactly.
+    """
+    return pa.schema(
+        [
+            ("uuid", pa.string()),
+            ("date", pa.timestamp("us", tz="UTC")),
+            ("document", pa.string()),
+            ("beneficiary", pa.string()),
+            ("amount", pa.decimal128(15, 2)),
+        ]
+    )
+
+
+class _ChunkSink:
+    """
+    Minimal writable file object collecting the bytes produced by the
+    Arrow writers, so they can be handed out batch by batch.
+    """
+
+    def __init__(self):
+        self.chunks: List[bytes] = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self.chunks.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+class ExportService:
+    def check_format(self, fmt: str):
+        """
+        Ensures the export format is known and pyarrow is installed.
+
+        Raises:
+            HTTPException: 400 for unknown formats, 501 if pyarrow is missing.
+        """
+        if fmt not in EXPORT_MEDIA_TYPES:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Unsupported export format: {fmt}",
+            )
+        if pa is None:
+            raise HTTPException(
+                status_code=501,
+                detail="Export requires the 'pyarrow' package",
+            )
+
+    @staticmethod
+    def parse_interval(
+        start_date: Optional[str],
+        end_date: Optional[str],
+    ) -> Tuple[Optional[datetime], Optional[datetime]]:
+        """
+        Parses optional ISO 8601 interval bounds.
+
+        Raises:
+            HTTPException: If any of the dates is not valid ISO 8601.
+        """
+        try:
+            start = datetime.fromisoformat(start_date) if start_date else None
+            end = datetime.fromisoformat(end_date) if end_date else None
+        except ValueError as err:
+            raise HTTPException(status_code=400, detail=str(err)) from err
+        return start, end
+
+    async def iter_rows(
+        self,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        batch_size: Optional[int] = None,
+    ) -> AsyncIterator[List[tuple]]:
+        """
+        Reads payments from the database in batches of plain tuples.
+
+        Batches are fetched with keyset pagination on ``uuid``, so each
+        query is an index range scan and only one batch is held in memory.
+
+        Args:
+            start: Optional lower bound (inclusive) for ``date``.
+            end: Optional upper bound (inclusive) for ``date``.
+            batch_size: Rows per batch. Defaults to ``EXPORT_BATCH_SIZE``.
+
+        Yields:
+            List[tuple]: Rows ordered as ``PAYMENT_COLUMNS``.
+        """
+        batch_size = batch_size or settings.EXPORT_BATCH_SIZE
+        query = Payment.all()
+        if start is not None:
+            query = query.filter(date__gte=start)
+        if end is not None:
+            query = query.filter(date__lte=end)
+        last_uuid = None
+        while True:
+            page = query
+            if last_uuid is not None:
+                page = page.filter(uuid__gt=last_uuid)
+            rows = await page.order_by("uuid").limit(batch_size).values_list(
+                *PAYMENT_COLUMNS
+            )
+            if not rows:
+                return
+            yield rows
+            if len(rows) < batch_size:
+                return
+            last_uuid = rows[-1][0]
+
+    @staticmethod
+    def to_record_batch(rows: List[tuple]):
+        """
+        Encodes a batch of row tuples column-wise into an Arrow record batch.
+        """
+        uuids, dates, documents, beneficiaries, amounts = zip(*rows)
+        schema = payment_schema()
+        return pa.record_batch(
+            [
+                pa.array([str(value) for value in uuids], type=pa.string()),
+                pa.array(dates, type=schema.field("date").type),
+                pa.array(documents, type=pa.string()),
+                pa.array(beneficiaries, type=pa.string()),
+                pa.array(amounts, type=schema.field("amount").type),
+            ],
+            schema=schema,
+        )
+
+    @staticmethod
+    def _open_writer(fmt: str, sink):
+        if fmt == "parquet":
+            return pq.ParquetWriter(sink, payment_schema())
+        return pa.ipc.new_stream(sink, payment_schema())
+
+    async def stream(
+        self,
+        fmt: str,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        batch_size: Optional[int] = None,
+        on_progress: Optional[ProgressCallback] = None,
+    ) -> AsyncIterator[bytes]:
+        """
+        Encodes payments as an Arrow IPC stream or Parquet file, yielding
+        the encoded bytes after every record batch.
+
+        The rows of the payments table are written first, followed by the
+        archived payments in the range that are not among them, read from
+        the archive partitions.
+
+        Args:
+            fmt: ``"arrow"`` or ``"parquet"``.
+            start: Optional lower bound for ``date``.
+            end: Optional upper bound for ``date``.
+            batch_size: Rows per record batch.
+            on_progress: Awaited with the number of exported rows after
+                each batch.
+
+        Yields:
+            bytes: Encoded output, in order.
+        """
+        # Imported here: the archive writes partitions with this service.
+        from app.services.archive_service import payment_archive, utc
+
+        sink = _ChunkSink()
+        writer = self._open_writer(fmt, pa.PythonFile(sink, mode="w"))
+        exported = 0
+        # Live rows dated within the archive may be archived as well,
+        # until their deletion commits: those are left out of the archive.
+        archived = payment_archive.span(start, end)
+        live = set()
+        try:
+            async for rows in self.iter_rows(start, end, batch_size):
+                if archived is not None:
+                    live.update(
+                        str(row[0]) for row in rows
+                        if archived[0] <= utc(row[1]) <= archived[1]
+                    )
+                writer.write_batch(self.to_record_batch(rows))
+                exported += len(rows)
+                if on_progress is not None:
+                    await on_progress(exported)
+                chunk = sink.drain()
+                if chunk:
+                    yield chunk
+            async for table in payment_archive.read_tables(
+                start,
+                end,
+                exclude=live,
+            ):
+                writer.write_table(table)
+                exported += table.num_rows
+                if on_progress is not None:
+                    await on_progress(exported)
+                chunk = sink.drain()
+                if chunk:
+                    yield chunk
+        except Exception as err:
+            logger.error("Error exporting payments: %s", str(err))
+            raise
+        finally:
+            writer.close()
+        chunk = sink.drain()
+        if chunk:
+            yield chunk
+
+    async def write(
+        self,
+        fmt: str,
+        path: str,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        batch_size: Optional[int] = None,
+        on_progress: Optional[ProgressCallback] = None,
+    ) -> int:
+        """
+        Writes an export to a local file.
+
+        Returns:
+            int: Number of bytes written.
+        """
+        self.check_format(fmt)
+        written = 0
+        with open(path, "wb") as handle:
+            async for chunk in self.stream(
+                fmt, start, end, batch_size, on_progress
+            ):
+                handle.write(chunk)
+                written += len(chunk)
+        logger.info("Exported %d bytes of payments to %s", written, path)
+        return written
@@ -0,0 +1,228 @@
+# app/services/idempotency_service.py
+import asyncio
+import hashlib
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Optional, Tuple
+
+from fastapi import HTTPException
+from tortoise.exceptions import IntegrityError
+from tortoise.transactions import in_transaction
+
+from app.config import settings
+from app.core.queries import query_deadline
+from app.models import IdempotencyKey
+
+
+logger = logging.getLogger("app.services.idempotency_service")
+
+# Runs the request inside the given transaction and returns the status
+# code and body of its response.
+Handler = Callable[[object], Awaitable[Tuple[int, bytes]]]
+
+
+def request_hash(method: str, path: str, body: bytes) -> str:
+    """
+    Fingerprints a request, so a key reused for a different request can
+    be rejected.
+    """
+    digest = hashlib.sha256(f"{method} {path}\n".encode("utf-8"))
+    digest.update(body)
+    return digest.hexdigest()
+
+
+class IdempotencyService:
+    """
+    Runs write requests at most once per ``Idempotency-Key``.
+
+    A key is reserved with a single INSERT, relying on the unique
+    constraint on ``(user, key)`` to settle concurrent requests. The
+    request then runs in a transaction that also stores its response, so
+    either both the write and the response are committed or neither is.
+    A retry with the same key gets the stored response without running
+    the request again. Keys expire after ``IDEMPOTENCY_KEY_TTL_SECONDS``
+    and are deleted every ``IDEMPOTENCY_SWEEP_SECONDS``.
+
+    A reservation is locked for ``IDEMPOTENCY_LOCK_SECONDS``, after which
+    another request may take it over. The ``locked_until`` value a
+    reservation set fences it: the response is only stored, and a failed
+    reservation only released, while the row still holds that value, and
+    the request gets a deadline ending before its lock does.
+    """
+
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+
+    async def _reserve(
+        self,
+        user_id: str,
+        key: str,
+        fingerprint: str,
+    ) -> IdempotencyKey:
+        now = datetime.now(timezone.utc)
+        lock_until = now + timedelta(seconds=settings.IDEMPOTENCY_LOCK_SECONDS)
+        for _ in range(2):
+            try:
+                return await IdempotencyKey.create(
+                    user_id=user_id,
+                    key=key,
+                    request_hash=fingerprint,
+                    locked_until=lock_until,
+                    expires_at=now + timedelta(
+                        seconds=settings.IDEMPOTENCY_KEY_TTL_SECONDS,
+                    ),
+                )
+            except IntegrityError:
+                record = await IdempotencyKey.get_or_none(
+                    user_id=user_id,
+                    key=key,
+                )
+            if record is None:
+                # Released or swept in between: try to reserve it again.
+                continue
+            if record.expires_at <= now:
+                await IdempotencyKey.filter(uuid=record.uuid).delete()
+                continue
+            if record.request_hash != fingerprint:
+                raise HTTPException(
+                    status_code=422,
+                    detail="Idempotency-Key was already used for a different request",
+                )
+            if record.status_code is not None:
+                return record
+            # Still running, unless the worker holding it died: take over
+            # a stale reservation with a conditional update.
+            taken = await IdempotencyKey.filter(
+                uuid=record.uuid,
+                status_code__isnull=True,
+                locked_until__lt=now,
+            ).update(locked_until=lock_until)
+            if taken:
+                record.locked_until = lock_until
+                return record
+            raise HTTPException(
+                status_code=409,
+                detail="A request with this Idempotency-Key is in progress",
+            )
+        raise HTTPException(
+            status_code=409,
+            detail="A request with this Idempotency-Key is in progress",
+        )
+
+    async def execute(
+        self,
+        user_id: str,
+        key: Optional[str],
+        fingerprint: str,
+        handler: Handler,
+    ) -> Tuple[int, bytes, bool]:
+        """
+        Runs ``handler`` in a transaction, once per ``key``.
+
+        Args:
+            user_id: Caller owning the key. Keys of different users never
+                collide.
+            key: Value of the ``Idempotency-Key`` header. Without a key the
+                handler simply runs.
+            fingerprint: ``request_hash`` of the request.
+            handler: Performs the write with the given connection and
+                returns the status code and body of the response.
+
+        Returns:
+            Tuple[int, bytes, bool]: Status code, body and whether they
+                were replayed from an earlier request.
+
+        Raises:
+            HTTPException: 400 if the key is too long, 409 while another
+                request with the key is running or if it took the key
+                over, 422 if the key was used for a different request,
+                504 if the request outlived its lock.
+        """
+        if key is None:
+            async with in_transaction() as connection:
+                status_code, body = await handler(connection)
+            return status_code, body, False
+        if not key or len(key) > 255:
+            raise HTTPException(
+                status_code=400,
+                detail="Idempotency-Key must have 1 to 255 characters",
+            )
+        record = await self._reserve(user_id, key, fingerprint)
+        if record.status_code is not None:
+            logger.debug("Replaying response for Idempotency-Key %s", key)
+            return (
+                record.status_code,
+                record.response_body.encode("utf-8"),
+                True,
+            )
+        # Leave a tenth of the lock to commit before a takeover is allowed.
+        deadline = (
+            record.locked_until - datetime.now(timezone.utc)
+        ).total_seconds() - settings.IDEMPOTENCY_LOCK_SECONDS / 10
+        try:
+            async with query_deadline(deadline), in_transaction() as connection:
+                status_code, body = await handler(connection)
+                stored = await IdempotencyKey.filter(
+                    uuid=record.uuid,
+                    locked_until=record.locked_until,
+                ).using_db(connection).update(
+                    status_code=status_code,
+                    response_body=body.decode("utf-8"),
+                    locked_until=None,
+                )
+                if not stored:
+                    # Taken over by another request: roll the write back.
+                    raise HTTPException(
+                        status_code=409,
+                        detail="A request with this Idempotency-Key is in progress",
+                    )
+        except BaseException as err:
+            # Failed requests are not stored, so the client can retry them,
+            # unless another request holds the key by now.
+            await IdempotencyKey.filter(
+                uuid=record.uuid,
+                locked_until=record.locked_until,
+            ).delete()
+            if isinstance(err, TimeoutError):
+                logger.warning("Request with Idempotency-Key %s timed out", key)
+                raise HTTPException(
+                    status_code=504,
+                    detail="Request timed out",
+                ) from err
+            raise
+        return status_code, body, False
+
+    async def sweep(self) -> int:
+        """
+        Deletes expired keys.
+
+        Returns:
+            int: Number of deleted keys.
+        """
+        deleted = await IdempotencyKey.filter(
+            expires_at__lte=datetime.now(timezone.utc),
+        ).delete()
+        if deleted:
+            logger.info("Deleted %d expired idempotency keys", deleted)
+        return deleted
+
+    async def _run(self, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.sweep()
+            except Exception as err:
+                logger.error("Error sweeping idempotency keys: %s", err)
+
+    def start(self):
+        self._task = asyncio.create_task(
+            self._run(settings.IDEMPOTENCY_SWEEP_SECONDS)
+        )
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+
+idempotency_service = IdempotencyService()
@@ -0,0 +1,369 @@
+# app/services/import_service.py
+import asyncio
+import itertools
+import json
+import logging
+import os
+import uuid
+from datetime import datetime, timezone
+from decimal import Decimal, InvalidOperation
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from tortoise import connections
+from tortoise.expressions import Q
+
+from app.config import settings
+from app.models import Payment
+from app.services.import_sources import detect_format, read_rows
+from app.services.payment_cache import payment_cache
+from app.services.reconciliation_service import ReconciliationService
+
+
+logger = logging.getLogger("app.services.import_service")
+
+ProgressCallback = Callable[[int], Awaitable[None]]
+
+COPY_COLUMNS = ("uuid", "date", "document", "beneficiary", "amount")
+# Rows are copied into a per-connection staging table first, so rows that
+# conflict with existing payments (same uuid, e.g. already imported, or
+# same document) are skipped instead of failing COPY.
+_STAGING_TABLE = """
+    CREATE TEMP TABLE IF NOT EXISTS "payments_import"
+    (LIKE "payments" INCLUDING DEFAULTS) ON COMMIT DELETE ROWS
+"""
+_MERGE_STAGED = """
+    INSERT INTO "payments" ("uuid", "date", "document", "beneficiary", "amount")
+    SELECT "uuid", "date", "document", "beneficiary", "amount"
+    FROM "payments_import"
+    ON CONFLICT DO NOTHING
+    RETURNING "uuid"
+"""
+
+
+def _copy_client():
+    """
+    Returns the default connection if it can use COPY (asyncpg), else None.
+    """
+    try:
+        from tortoise.backends.asyncpg import AsyncpgDBClient
+    except ImportError:  # pragma: no cover - asyncpg is a main dependency
+        return None
+    client = connections.get("default")
+    return client if isinstance(client, AsyncpgDBClient) else None
+
+
+class ImportCheckpoint:
+    """
+    Progress of an import, saved after every committed batch so an
+    interrupted import resumes where it stopped.
+
+    ``rows`` counts the rows of the source committed without gaps; batches
+    committed out of order by parallel workers are only counted once the
+    batches before them are. ``inserted`` counts the payments actually
+    inserted, leaving out rows skipped on a conflict. Rows without a uuid get one derived from
+    ``namespace`` and their position, so rows imported again after a
+    resume keep their uuid and are skipped.
+    """
+
+    def __init__(self, path: Optional[str], source: str, fmt: str):
+        self.path = path
+        self.source = source
+        self.format = fmt
+        self.namespace = uuid.uuid4()
+        self.started_at = datetime.now(timezone.utc).isoformat()
+        self.rows = 0
+        self.inserted = 0
+
+    @classmethod
+    def load(cls, path: Optional[str], source: str, fmt: str):
+        """
+        Reads the checkpoint at ``path``, or starts a new one.
+
+        Raises:
+            ValueError: If the checkpoint belongs to another source.
+        """
+        checkpoint = cls(path, os.path.abspath(source), fmt)
+        if path is None or not os.path.exists(path):
+            return checkpoint
+        with open(path, encoding="utf-8") as handle:
+            state = json.load(handle)
+        if state["source"] != checkpoint.source or state["format"] != fmt:
+            raise ValueError(
+                f"Checkpoint {path} belongs to {state['source']} "
+                f"({state['format']})"
+            )
+        checkpoint.namespace = uuid.UUID(state["namespace"])
+        checkpoint.started_at = state["started_at"]
+        checkpoint.rows = state["rows"]
+        checkpoint.inserted = state.get("inserted", state["rows"])
+        return checkpoint
+
+    def save(self):
+        if self.path is None:
+            return
+        temporary = f"{self.path}.tmp"
+        with open(temporary, "w", encoding="utf-8") as handle:
+            json.dump(
+                {
+                    "source": self.source,
+                    "format": self.format,
+                    "namespace": str(self.namespace),
+                    "started_at": self.started_at,
+                    "rows": self.rows,
+                    "inserted": self.inserted,
+                },
+                handle,
+            )
+        os.replace(temporary, self.path)
+
+
+class ImportService:
+    @staticmethod
+    def to_payment(row: Dict[str, str], line: int) -> Payment:
+        """
+        Builds an unsaved Payment from an imported row.
+
+        Args:
+            row: Mapping with ``date``, ``document``, ``beneficiary`` and
+                ``amount`` keys; ``uuid`` is optional.
+            line: Line number, used in error messages.
+
+        Raises:
+            ValueError: If a value cannot be parsed.
+        """
+        try:
+            return Payment(
+                uuid=uuid.UUID(row["uuid"]) if row.get("uuid") else uuid.uuid4(),
+                date=datetime.fromisoformat(row["date"]) if row.get("date") else None,
+                document=row.get("document") or None,
+                beneficiary=row["beneficiary"],
+                amount=Decimal(row["amount"]),
+            )
+        except (KeyError, ValueError, InvalidOperation) as err:
+            raise ValueError(f"Invalid row at line {line}: {err!r}") from err
+
+    async def import_csv(
+        self,
+        path: str,
+        batch_size: Optional[int] = None,
+        on_progress: Optional[ProgressCallback] = None,
+    ) -> int:
+        """
+        Imports payments from a CSV file with a header line.
+
+        Returns:
+            int: Number of inserted payments.
+        """
+        return await self.import_file(
+            path,
+            "csv",
+            batch_size=batch_size,
+            workers=1,
+            on_progress=on_progress,
+        )
+
+    async def import_file(
+        self,
+        path: str,
+        fmt: Optional[str] = None,
+        batch_size: Optional[int] = None,
+        workers: Optional[int] = None,
+        checkpoint_path: Optional[str] = None,
+        on_progress: Optional[ProgressCallback] = None,
+    ) -> int:
+        """
+        Imports payments from a CSV file or a SQL dump as a stream.
+
+        The file is parsed in a thread, one batch at a time, while
+        ``workers`` tasks insert earlier batches over their own
+        connections: with asyncpg through ``COPY`` into a staging table,
+        otherwise with ``bulk_create``. At most ``workers`` parsed batches
+        wait in memory, so memory is bounded by the batch size whatever
+        the file size.
+
+        Either way, rows whose uuid or document already exists are
+        skipped: rows committed again on resume, or payments already
+        registered.
+
+        Args:
+            path: Path of the file.
+            fmt: ``csv`` or ``sql``. Guessed from the extension if omitted.
+            batch_size: Rows per insert. Defaults to ``IMPORT_BATCH_SIZE``.
+            workers: Concurrent inserts. Defaults to ``IMPORT_WORKERS``.
+            checkpoint_path: File recording progress. When it exists, rows
+                already committed are skipped.
+            on_progress: Awaited with the number of committed rows of the
+                source after each batch.
+
+        Returns:
+            int: Number of inserted payments, including those inserted by
+                earlier runs with the same checkpoint.
+
+        Raises:
+            ValueError: If a row cannot be parsed or the checkpoint belongs
+                to another file. Batches committed before are kept.
+        """
+        fmt = fmt or detect_format(path)
+        batch_size = batch_size or settings.IMPORT_BATCH_SIZE
+        workers = workers or settings.IMPORT_WORKERS
+        checkpoint = ImportCheckpoint.load(checkpoint_path, path, fmt)
+        resumed = checkpoint.rows
+        inserted_before = checkpoint.inserted
+        copy_client = _copy_client()
+        queue: asyncio.Queue = asyncio.Queue(maxsize=workers)
+        finished: Dict[int, int] = {}
+        next_number = itertools.count()
+        expected = 0
+
+        async def insert(payments: List[Payment]) -> int:
+            if copy_client is not None:
+                inserted = await self._copy_batch(copy_client, payments)
+            else:
+                inserted = await self._create_batch(payments)
+            await ReconciliationService.invalidate(inserted)
+            payment_cache.add_payments(inserted)
+            return len(inserted)
+
+        async def commit(number: int, count: int, inserted: int):
+            nonlocal expected
+            finished[number] = count
+            checkpoint.inserted += inserted
+            advanced = False
+            while expected in finished:
+                checkpoint.rows += finished.pop(expected)
+                expected += 1
+                advanced = True
+            if advanced:
+                checkpoint.save()
+                if on_progress is not None:
+                    await on_progress(checkpoint.rows)
+
+        async def consume():
+            while True:
+                item = await queue.get()
+                if item is None:
+                    return
+                number, payments = item
+                inserted = await insert(payments)
+                await commit(number, len(payments), inserted)
+
+        with open(path, newline="", encoding="utf-8") as handle:
+            rows = read_rows(handle, fmt, checkpoint.started_at)
+            position = itertools.count(resumed)
+
+            def skip_committed():
+                for _ in itertools.islice(rows, resumed):
+                    pass
+
+            def parse_batch() -> List[Payment]:
+                batch = []
+                for line, row in itertools.islice(rows, batch_size):
+                    index = next(position)
+                    if not row.get("uuid"):
+                        row["uuid"] = str(
+                            uuid.uuid5(checkpoint.namespace, str(index))
+                        )
+                    batch.append(self.to_payment(row, line))
+                return batch
+
+            parse_error: Optional[ValueError] = None
+
+            async def produce():
+                nonlocal parse_error
+                if resumed:
+                    logger.info(
+                        "Resuming import of %s after %d rows",
+                        path,
+                        resumed,
+                    )
+                    await asyncio.to_thread(skip_committed)
+                while True:
+                    try:
+                        batch = await asyncio.to_thread(parse_batch)
+                    except ValueError as err:
+                        # Let the workers commit the batches parsed so far.
+                        parse_error = err
+                        break
+                    if not batch:
+                        break
+                    await queue.put((next(next_number), batch))
+                for _ in range(workers):
+                    await queue.put(None)
+
+            try:
+                async with asyncio.TaskGroup() as group:
+                    group.create_task(produce())
+                    for _ in range(workers):
+                        group.create_task(consume())
+            except ExceptionGroup as errors:
+                raise errors.exceptions[0] from None
+            if parse_error is not None:
+                raise parse_error
+
+        inserted = checkpoint.inserted - inserted_before
+        logger.info(
+            "Imported %d payments from %s (%d rows resumed, %d skipped)",
+            inserted,
+            path,
+            resumed,
+            checkpoint.rows - resumed - inserted,
+        )
+        return checkpoint.inserted
+
+    @staticmethod
+    async def _create_batch(payments: List[Payment]) -> List[Payment]:
+        """
+        Inserts the payments of a batch whose uuid and document are new,
+        and returns them.
+        """
+        existing = await Payment.filter(
+            Q(uuid__in=[payment.uuid for payment in payments])
+            | Q(
+                document__in=[
+                    payment.document for payment in payments if payment.document
+                ]
+            )
+        ).values_list("uuid", "document")
+        taken_uuids = {str(uuid_) for uuid_, _ in existing}
+        taken_documents = {document for _, document in existing}
+        new = []
+        for payment in payments:
+            if str(payment.uuid) in taken_uuids or (
+                payment.document and payment.document in taken_documents
+            ):
+                continue
+            taken_uuids.add(str(payment.uuid))
+            taken_documents.add(payment.document)
+            new.append(payment)
+        if new:
+            # Conflicts with a concurrent insert are ignored, like COPY.
+            await Payment.bulk_create(new, ignore_conflicts=True)
+        return new
+
+    @staticmethod
+    async def _copy_batch(client, payments: List[Payment]) -> List[Payment]:
+        """
+        Copies a batch into the staging table and merges the rows without
+        conflicts into ``payments``. Returns the inserted payments.
+        """
+        records = [
+            (
+                payment.uuid,
+                payment.date,
+                payment.document,
+                payment.beneficiary,
+                payment.amount,
+            )
+            for payment in payments
+        ]
+        async with client.acquire_connection() as connection:
+            async with connection.transaction():
+                await connection.execute(_STAGING_TABLE)
+                await connection.copy_records_to_table(
+                    "payments_import",
+                    records=records,
+                    columns=COPY_COLUMNS,
+                )
+                merged = await connection.fetch(_MERGE_STAGED)
+        inserted = {str(row["uuid"]) for row in merged}
+        return [payment for payment in payments if str(payment.uuid) in inserted]
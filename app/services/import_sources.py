@@ -0,0 +1,215 @@
+# app/services/import_sources.py
+"""
+Streaming readers for payment import files.
+
+Each reader yields ``(line, row)`` pairs, where ``row`` maps column names
+to text values (None for SQL ``NULL``) and ``line`` is the line the row
+starts on, for error messages. Files are read line by line, so memory
+does not grow with the file size.
+"""
+import csv
+import re
+from typing import Dict, Iterator, Optional, TextIO, Tuple
+
+Row = Dict[str, Optional[str]]
+
+# Column order of the payments table, for INSERTs without a column list.
+PAYMENT_COLUMNS = ("uuid", "date", "document", "beneficiary", "amount")
+IMPORT_FORMATS = ("csv", "sql")
+
+# Longest a single SQL tuple may get while waiting for its closing quote.
+MAX_TUPLE_CHARS = 1024 * 1024
+
+_INSERT = re.compile(
+    r"""\s*INSERT\s+INTO\s+(?:"?\w+"?\.)?"?(\w+)"?\s*
+    (?:\(([^)]*)\))?\s*VALUES\s*""",
+    re.IGNORECASE | re.VERBOSE,
+)
+_COPY = re.compile(
+    r"""\s*COPY\s+(?:"?\w+"?\.)?"?(\w+)"?\s*\(([^)]*)\)\s+FROM\s+stdin""",
+    re.IGNORECASE | re.VERBOSE,
+)
+_VALUE = re.compile(
+    r"""\s*(?:
+        '(?P<string>(?:[^']|'')*)'(?:::[\w ]+(?:\([\d, ]+\))?)?
+        | (?P<null>NULL)\b
+        | (?P<number>[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)(?:::\w+)?
+        | (?P<call>[A-Za-z_][\w.]*)\s*(?:\(\s*\))?(?:::\w+)?
+    )\s*(?P<end>[,)])""",
+    re.IGNORECASE | re.VERBOSE,
+)
+_COPY_ESCAPES = re.compile(r"\\(.)")
+_COPY_ESCAPED = {"t": "\t", "n": "\n", "r": "\r", "\\": "\\"}
+# Functions standing for "the current time" and "a new uuid".
+_NOW_CALLS = {"now", "current_timestamp", "localtimestamp", "transaction_timestamp"}
+_UUID_CALLS = {"gen_random_uuid", "uuid_generate_v4"}
+
+
+def detect_format(path: str) -> str:
+    """
+    Guesses the format of an import file from its extension.
+
+    Raises:
+        ValueError: If the extension is not ``.csv`` or ``.sql``.
+    """
+    extension = path.rsplit(".", 1)[-1].lower()
+    if extension not in IMPORT_FORMATS:
+        raise ValueError(f"Cannot tell the format of {path}, pass it explicitly")
+    return extension
+
+
+def _columns(column_list: Optional[str]) -> Tuple[str, ...]:
+    if not column_list:
+        return PAYMENT_COLUMNS
+    return tuple(name.strip().strip('"') for name in column_list.split(","))
+
+
+def read_csv(handle: TextIO) -> Iterator[Tuple[int, Row]]:
+    """
+    Reads a CSV file with a header line. Empty fields are read as None.
+    """
+    reader = csv.DictReader(handle)
+    for row in reader:
+        yield reader.line_num, {
+            name: value if value != "" else None for name, value in row.items()
+        }
+
+
+class SqlDumpReader:
+    """
+    Reads payment rows from a SQL dump without loading it.
+
+    Understands ``INSERT INTO payments [(columns)] VALUES (...), (...);``
+    with one or many rows per statement, as written by ``pg_dump
+    --inserts``/``--column-inserts`` or by hand, and the ``COPY payments
+    (...) FROM stdin;`` blocks of a plain ``pg_dump``. Other statements and
+    rows of other tables are skipped. ``NOW()``-like calls stand for
+    ``now`` and ``gen_random_uuid()`` for a missing uuid (None).
+
+    Only standard SQL strings are supported; ``E'...'`` strings with
+    backslash escapes are not.
+    """
+
+    def __init__(self, handle: TextIO, now: str, table: str = "payments"):
+        self.handle = handle
+        self.now = now
+        self.table = table
+        self.line = 0
+
+    def _readline(self) -> str:
+        text = self.handle.readline()
+        if text:
+            self.line += 1
+        return text
+
+    def _value(self, match) -> Optional[str]:
+        if match.group("string") is not None:
+            return match.group("string").replace("''", "'")
+        if match.group("null") is not None:
+            return None
+        if match.group("number") is not None:
+            return match.group("number")
+        call = match.group("call").lower()
+        if call in _NOW_CALLS:
+            return self.now
+        if call in _UUID_CALLS:
+            return None
+        if call in ("true", "false"):
+            return call
+        raise ValueError(f"Unsupported SQL value {call!r} at line {self.line}")
+
+    def _values(self, text: str, columns: Tuple[str, ...], keep: bool):
+        """
+        Parses the tuples of an INSERT statement, starting with ``text``
+        (what follows ``VALUES`` on its first line).
+        """
+        buffer, position = text, 0
+        while True:
+            while position < len(buffer) and buffer[position] in " \t\r\n,":
+                position += 1
+            if position >= len(buffer):
+                buffer, position = self._readline(), 0
+                if not buffer:
+                    return
+                continue
+            if buffer[position] == ";":
+                return
+            if buffer[position] != "(":
+                raise ValueError(f"Unexpected SQL at line {self.line}")
+            start_line = self.line
+            values, cursor = [], position + 1
+            while True:
+                match = _VALUE.match(buffer, cursor)
+                if match is None:
+                    # Most likely a string spanning lines: read on.
+                    more = self._readline()
+                    if not more or len(buffer) - position > MAX_TUPLE_CHARS:
+                        raise ValueError(
+                            f"Cannot parse SQL values at line {start_line}"
+                        )
+                    buffer += more
+                    continue
+                values.append(self._value(match))
+                cursor = match.end()
+                if match.group("end") == ")":
+                    break
+            position = cursor
+            if keep:
+                if len(values) != len(columns):
+                    raise ValueError(
+                        f"Expected {len(columns)} values at line {start_line}"
+                    )
+                yield start_line, dict(zip(columns, values))
+
+    def _copy(self, columns: Tuple[str, ...], keep: bool):
+        while True:
+            text = self._readline()
+            if not text or text.rstrip("\r\n") == "\\.":
+                return
+            if not keep:
+                continue
+            fields = text.rstrip("\r\n").split("\t")
+            yield self.line, {
+                name: None if field == "\\N" else _COPY_ESCAPES.sub(
+                    lambda escape: _COPY_ESCAPED.get(
+                        escape.group(1),
+                        escape.group(1),
+                    ),
+                    field,
+                )
+                for name, field in zip(columns, fields)
+            }
+
+    def __iter__(self) -> Iterator[Tuple[int, Row]]:
+        while True:
+            text = self._readline()
+            if not text:
+                return
+            match = _INSERT.match(text)
+            if match is not None:
+                yield from self._values(
+                    text[match.end():],
+                    _columns(match.group(2)),
+                    match.group(1).lower() == self.table,
+                )
+                continue
+            match = _COPY.match(text)
+            if match is not None:
+                yield from self._copy(
+                    _columns(match.group(2)),
+                    match.group(1).lower() == self.table,
+                )
+
+
+def read_rows(handle: TextIO, fmt: str, now: str) -> Iterator[Tuple[int, Row]]:
+    """
+    Returns a row iterator for an open import file.
+
+    Args:
+        handle: File opened in text mode.
+        fmt: ``csv`` or ``sql``.
+        now: ISO 8601 timestamp used for ``NOW()`` in SQL dumps.
+    """
+    if fmt == "csv":
+        return read_csv(handle)
+    return iter(SqlDumpReader(handle, now))
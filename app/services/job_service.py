@@ -0,0 +1,229 @@
+# app/services/job_service.py
+import asyncio
+import json
+import logging
+import os
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Dict, Optional, Set
+
+from fastapi import HTTPException
+
+from app.config import settings
+from app.core.auth import Principal
+from app.models import Job
+from app.services.export_service import ExportService
+from app.services.import_service import ImportService
+
+
+logger = logging.getLogger("app.services.job_service")
+
+JOB_PENDING = "pending"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+
+
+class JobManager:
+    """
+    Runs long export and import jobs outside the request/response cycle.
+
+    Jobs are persisted in the ``jobs`` table. With ``JOBS_MODE="inprocess"``
+    they run as asyncio tasks of the API process; with ``JOBS_MODE="worker"``
+    the API only enqueues them and ``python -m app.cli worker`` claims and
+    runs them. Either way, at most ``JOB_TYPE_CONCURRENCY[kind]`` jobs of a
+    kind and ``JOB_USER_CONCURRENCY`` jobs of a user run at once, so heavy
+    jobs cannot take over the process serving ``/pagamentos``.
+    """
+
+    def __init__(self):
+        self.export_service = ExportService()
+        self.import_service = ImportService()
+        self._handlers = {
+            "export": self._run_export,
+            "import": self._run_import,
+        }
+        self._type_limits: Dict[str, asyncio.Semaphore] = {}
+        self._user_limits: Dict[str, asyncio.Semaphore] = defaultdict(
+            lambda: asyncio.Semaphore(settings.JOB_USER_CONCURRENCY)
+        )
+        self._tasks: Set[asyncio.Task] = set()
+        self._active: Set[str] = set()
+        self._running = False
+
+    @property
+    def kinds(self):
+        return tuple(self._handlers)
+
+    def _type_limit(self, kind: str) -> asyncio.Semaphore:
+        if kind not in self._type_limits:
+            self._type_limits[kind] = asyncio.Semaphore(
+                settings.JOB_TYPE_CONCURRENCY.get(kind, 1)
+            )
+        return self._type_limits[kind]
+
+    def _has_capacity(self, job: Job) -> bool:
+        return not (
+            self._type_limit(job.kind).locked()
+            or self._user_limits[str(job.user_id)].locked()
+        )
+
+    def result_path(self, job: Job, suffix: str) -> str:
+        os.makedirs(settings.JOBS_DIR, exist_ok=True)
+        return os.path.join(settings.JOBS_DIR, f"{job.uuid}.{suffix}")
+
+    @staticmethod
+    def _remove_upload(path: str):
+        if not os.path.basename(path).startswith("upload-"):
+            return
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    async def submit(self, user: Principal, kind: str, params: dict) -> Job:
+        """
+        Enqueues a job for the given user.
+
+        Raises:
+            HTTPException: 400 for unknown job kinds, 429 if the user already
+                has ``JOB_MAX_PENDING_PER_USER`` unfinished jobs.
+        """
+        if kind not in self._handlers:
+            raise HTTPException(status_code=400, detail=f"Unknown job kind: {kind}")
+        unfinished = await Job.filter(
+            user_id=user.user_id,
+            status__in=(JOB_PENDING, JOB_RUNNING),
+        ).count()
+        if unfinished >= settings.JOB_MAX_PENDING_PER_USER:
+            raise HTTPException(status_code=429, detail="Too many unfinished jobs")
+        job = await Job.create(user_id=user.user_id, kind=kind, params=params)
+        logger.info("Job %s (%s) submitted by %s", job.uuid, kind, user.username)
+        if self._running and settings.JOBS_MODE == "inprocess":
+            self._spawn(job)
+        return job
+
+    def _spawn(self, job: Job):
+        job_id = str(job.uuid)
+        task = asyncio.create_task(self._execute(job))
+        self._tasks.add(task)
+        self._active.add(job_id)
+        task.add_done_callback(self._tasks.discard)
+        task.add_done_callback(lambda _: self._active.discard(job_id))
+
+    async def _execute(self, job: Job):
+        async with self._type_limit(job.kind), self._user_limits[str(job.user_id)]:
+            claimed = await Job.filter(uuid=job.uuid, status=JOB_PENDING).update(
+                status=JOB_RUNNING,
+            )
+            if not claimed:
+                return
+            logger.info("Job %s (%s) started", job.uuid, job.kind)
+            try:
+                result_path = await self._handlers[job.kind](job)
+            except asyncio.CancelledError:
+                await Job.filter(uuid=job.uuid).update(status=JOB_PENDING, progress=0)
+                raise
+            except Exception as err:
+                logger.error("Job %s failed: %s", job.uuid, err)
+                await Job.filter(uuid=job.uuid).update(
+                    status=JOB_FAILED,
+                    error=str(err),
+                    finished_at=datetime.now(timezone.utc),
+                )
+                return
+            await Job.filter(uuid=job.uuid).update(
+                status=JOB_DONE,
+                result_path=result_path,
+                finished_at=datetime.now(timezone.utc),
+            )
+            logger.info("Job %s finished", job.uuid)
+
+    def _progress(self, job: Job):
+        async def report(rows: int):
+            await Job.filter(uuid=job.uuid).update(progress=rows)
+            # Give interactive requests a turn between batches.
+            await asyncio.sleep(0)
+
+        return report
+
+    async def _run_export(self, job: Job) -> str:
+        fmt = job.params.get("format", "parquet")
+        self.export_service.check_format(fmt)
+        start, end = self.export_service.parse_interval(
+            job.params.get("start_date"),
+            job.params.get("end_date"),
+        )
+        path = self.result_path(job, fmt)
+        await self.export_service.write(
+            fmt,
+            path,
+            start,
+            end,
+            on_progress=self._progress(job),
+        )
+        return path
+
+    async def _run_import(self, job: Job) -> str:
+        requeued = False
+        try:
+            imported = await self.import_service.import_csv(
+                job.params["path"],
+                on_progress=self._progress(job),
+            )
+        except asyncio.CancelledError:
+            # The job goes back to the queue and reads the upload again.
+            requeued = True
+            raise
+        finally:
+            if not requeued:
+                self._remove_upload(job.params["path"])
+        path = self.result_path(job, "json")
+        with open(path, "w", encoding="utf-8") as handle:
+            json.dump({"imported": imported, "source": job.params["path"]}, handle)
+        return path
+
+    async def start(self):
+        """
+        Starts the manager. In ``inprocess`` mode, jobs still queued by a
+        previous process are picked up.
+        """
+        self._running = True
+        if settings.JOBS_MODE != "inprocess":
+            return
+        for job in await Job.filter(status=JOB_PENDING).order_by("created_at"):
+            self._spawn(job)
+
+    async def shutdown(self):
+        """
+        Cancels running jobs; they are put back in the queue.
+        """
+        self._running = False
+        for task in list(self._tasks):
+            task.cancel()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def run_worker(self, poll_interval: Optional[float] = None):
+        """
+        Claims and runs queued jobs until cancelled. Used by the
+        out-of-process worker (``python -m app.cli worker``).
+        """
+        poll_interval = poll_interval or settings.JOB_POLL_SECONDS
+        self._running = True
+        try:
+            while True:
+                pending = await Job.filter(status=JOB_PENDING).order_by(
+                    "created_at"
+                ).limit(100)
+                for job in pending:
+                    if str(job.uuid) not in self._active and self._has_capacity(job):
+                        self._spawn(job)
+                        # Let the task acquire its slots before checking the next job.
+                        await asyncio.sleep(0)
+                await asyncio.sleep(poll_interval)
+        finally:
+            await self.shutdown()
+
+
+job_manager = JobManager()
@@ -0,0 +1,344 @@
+# app/services/payment_cache.py
+import asyncio
+import bisect
+import logging
+import sys
+import uuid
+from array import array
+from datetime import datetime, timedelta, timezone
+from typing import Iterable, List, Optional, Tuple
+
+from app.config import settings
+from app.core.metrics import registry
+from app.core.money import AMOUNT_CENTS, cents_to_str, decimal_to_cents
+from app.models import Payment
+
+logger = logging.getLogger("app.services.payment_cache")
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+ONE_MICROSECOND = timedelta(microseconds=1)
+# Arrays cost 8 bytes per value; each row also holds three list slots
+# and a UUID (the object and its integer).
+_SAMPLE_UUID = uuid.uuid4()
+_FIXED_ROW_BYTES = (
+    8 * 2 + 8 * 3 + sys.getsizeof(_SAMPLE_UUID) + sys.getsizeof(_SAMPLE_UUID.int)
+)
+# A cached row: (micros, uuid, cents, document, beneficiary), kept in
+# ``(date, uuid)`` order, the listing order read backwards.
+Row = Tuple[int, uuid.UUID, int, Optional[str], str]
+
+CACHE_REQUESTS = registry.counter(
+    "payment_cache_requests_total",
+    "Payment reads looked up in the recent payments cache, by result.",
+    ["result"],
+)
+CACHE_ROWS = registry.gauge(
+    "payment_cache_rows",
+    "Payments held in the recent payments cache.",
+)
+CACHE_BYTES = registry.gauge(
+    "payment_cache_bytes",
+    "Estimated memory used by the recent payments cache.",
+)
+
+
+def to_micros(moment: datetime) -> int:
+    if moment.tzinfo is None:
+        # Naive datetimes are UTC, as in Tortoise's default configuration.
+        moment = moment.replace(tzinfo=timezone.utc)
+    return (moment - EPOCH) // ONE_MICROSECOND
+
+
+def _row_bytes(document: Optional[str], beneficiary: str) -> int:
+    size = _FIXED_ROW_BYTES + sys.getsizeof(beneficiary)
+    if document is not None:
+        size += sys.getsizeof(document)
+    return size
+
+
+class PaymentCache:
+    """
+    Recent payments held in memory in columnar form, sorted by date and
+    then uuid, so the newest-first listing breaks date ties by uuid like
+    the database does.
+
+    Dates (microseconds since the epoch) and amounts (cents) live in
+    ``array('q')`` columns, uuids, documents and beneficiaries in parallel
+    lists,
+    so a row costs a few dozen bytes plus its strings instead of a model
+    instance. Payments dated within the last ``PAYMENT_CACHE_WINDOW_DAYS``
+    are loaded at startup and reloaded every
+    ``PAYMENT_CACHE_REFRESH_SECONDS``; writes made by this process are
+    added right away, and kept aside while a reload reads its snapshot
+    so the reload does not drop them. When ``PAYMENT_CACHE_MAX_BYTES`` is exceeded the
+    oldest rows are dropped and the cache covers a shorter window.
+
+    Range queries starting inside the covered window and first pages of
+    the date-ordered listing are answered from memory. Undated payments
+    are never cached; while any exist, listing pages go to the database,
+    since Postgres sorts them first.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self._dates = array("q")
+        self._cents = array("q")
+        self._uuids: List[uuid.UUID] = []
+        self._documents: List[Optional[str]] = []
+        self._beneficiaries: List[str] = []
+        self._bytes = 0
+        # Dates from this point (in microseconds) on are fully cached.
+        self._covered_from: Optional[int] = None
+        self._has_undated = False
+        # Rows added while a reload reads the database, None otherwise.
+        self._pending: Optional[List[Row]] = None
+        self._pending_undated = False
+        self._task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self._dates)
+
+    @property
+    def size_bytes(self) -> int:
+        return self._bytes
+
+    def _window_start(self) -> int:
+        return to_micros(
+            datetime.now(timezone.utc)
+            - timedelta(days=settings.PAYMENT_CACHE_WINDOW_DAYS)
+        )
+
+    def _record(self, index: int) -> dict:
+        return {
+            "date": EPOCH + timedelta(microseconds=self._dates[index]),
+            "document": self._documents[index],
+            "beneficiary": self._beneficiaries[index],
+            "amount": cents_to_str(self._cents[index]),
+        }
+
+    def _replace(
+        self,
+        rows: List[Row],
+        covered_from: int,
+        added: Iterable[Row] = (),
+    ):
+        """
+        Swaps in new columns built from ``rows`` sorted by date and uuid,
+        merged with the ``added`` rows they do not already hold.
+        """
+        known = {row[1] for row in rows}
+        missing = [
+            row for row in added
+            if row[0] >= covered_from and row[1] not in known
+        ]
+        if missing:
+            rows = sorted(rows + missing, key=lambda row: row[:2])
+        self._dates = array("q", (row[0] for row in rows))
+        self._uuids = [row[1] for row in rows]
+        self._cents = array("q", (row[2] for row in rows))
+        self._documents = [row[3] for row in rows]
+        self._beneficiaries = [row[4] for row in rows]
+        self._bytes = sum(_row_bytes(row[3], row[4]) for row in rows)
+        self._covered_from = covered_from
+        self._enforce_budget()
+
+    def _enforce_budget(self):
+        if self._bytes > settings.PAYMENT_CACHE_MAX_BYTES:
+            drop, freed = 0, 0
+            excess = self._bytes - settings.PAYMENT_CACHE_MAX_BYTES
+            while freed < excess and drop < len(self._dates):
+                freed += _row_bytes(
+                    self._documents[drop],
+                    self._beneficiaries[drop],
+                )
+                drop += 1
+            # Keep rows sharing the last dropped date out too, so the
+            # covered window never contains a partial date.
+            if drop < len(self._dates):
+                drop = bisect.bisect_right(self._dates, self._dates[drop - 1])
+            covered_from = (
+                self._dates[drop] if drop < len(self._dates) else None
+            )
+            freed = sum(
+                _row_bytes(self._documents[i], self._beneficiaries[i])
+                for i in range(drop)
+            )
+            del self._dates[:drop]
+            del self._uuids[:drop]
+            del self._cents[:drop]
+            del self._documents[:drop]
+            del self._beneficiaries[:drop]
+            self._bytes -= freed
+            self._covered_from = covered_from
+            logger.info(
+                "Payment cache over budget, dropped %d oldest rows",
+                drop,
+            )
+        CACHE_ROWS.set(len(self._dates))
+        CACHE_BYTES.set(self._bytes)
+
+    async def reload(self):
+        """
+        Loads the payments dated within the window from the database.
+
+        Payments added while the snapshot is read may be missing from it,
+        so they are merged into the reloaded columns.
+        """
+        window_start = self._window_start()
+        self._pending = []
+        self._pending_undated = False
+        try:
+            has_undated = await Payment.filter(date__isnull=True).exists()
+            rows = await (
+                Payment.filter(
+                    date__gte=EPOCH + timedelta(microseconds=window_start),
+                )
+                .order_by("date", "uuid")
+                .annotate(amount_cents=AMOUNT_CENTS)
+                .values_list(
+                    "date",
+                    "uuid",
+                    "amount_cents",
+                    "document",
+                    "beneficiary",
+                )
+            )
+            self._replace(
+                [
+                    (to_micros(date), uid, cents, document, beneficiary)
+                    for date, uid, cents, document, beneficiary in rows
+                ],
+                window_start,
+                self._pending,
+            )
+            self._has_undated = has_undated or self._pending_undated
+        finally:
+            self._pending = None
+        logger.debug(
+            "Payment cache loaded %d rows (%d bytes)",
+            len(self),
+            self._bytes,
+        )
+
+    def add_payments(self, payments: Iterable[Payment]):
+        """
+        Adds newly created payments. Payments older than the covered
+        window or without a date are ignored.
+        """
+        payments = list(payments)
+        undated = any(payment.date is None for payment in payments)
+        new_rows = [
+            (
+                to_micros(payment.date),
+                payment.uuid,
+                decimal_to_cents(payment.amount),
+                payment.document,
+                payment.beneficiary,
+            )
+            for payment in payments
+            if payment.date is not None
+        ]
+        if self._pending is not None:
+            # A reload is reading its snapshot; it merges these rows.
+            self._pending.extend(new_rows)
+            self._pending_undated = self._pending_undated or undated
+        if not self.enabled or self._covered_from is None:
+            return
+        if undated:
+            self._has_undated = True
+        new_rows = [row for row in new_rows if row[0] >= self._covered_from]
+        if not new_rows:
+            return
+        new_rows.sort(key=lambda row: row[:2])
+        if not self._dates or new_rows[0][:2] >= (
+            self._dates[-1],
+            self._uuids[-1],
+        ):
+            self._dates.extend(row[0] for row in new_rows)
+            self._uuids.extend(row[1] for row in new_rows)
+            self._cents.extend(row[2] for row in new_rows)
+            self._documents.extend(row[3] for row in new_rows)
+            self._beneficiaries.extend(row[4] for row in new_rows)
+        else:
+            # Back-dated rows go to their place in the window, among the
+            # rows of the same date by uuid, without rebuilding the columns.
+            for micros, uid, cents, document, beneficiary in new_rows:
+                index = bisect.bisect_left(
+                    self._uuids,
+                    uid,
+                    bisect.bisect_left(self._dates, micros),
+                    bisect.bisect_right(self._dates, micros),
+                )
+                self._dates.insert(index, micros)
+                self._uuids.insert(index, uid)
+                self._cents.insert(index, cents)
+                self._documents.insert(index, document)
+                self._beneficiaries.insert(index, beneficiary)
+        self._bytes += sum(_row_bytes(row[3], row[4]) for row in new_rows)
+        self._enforce_budget()
+
+    def get_range(
+        self,
+        start: datetime,
+        end: datetime,
+    ) -> Optional[List[dict]]:
+        """
+        Returns the payments dated between ``start`` and ``end``
+        (inclusive) in date order, or None if the range is not covered.
+        """
+        if not self.enabled:
+            return None
+        start_micros = to_micros(start)
+        if self._covered_from is None or start_micros < self._covered_from:
+            CACHE_REQUESTS.inc(result="miss")
+            return None
+        CACHE_REQUESTS.inc(result="hit")
+        first = bisect.bisect_left(self._dates, start_micros)
+        last = bisect.bisect_right(self._dates, to_micros(end))
+        return [self._record(index) for index in range(first, last)]
+
+    def get_latest(self, skip: int, limit: int) -> Optional[List[dict]]:
+        """
+        Returns a page of the most recent payments, newest first and by
+        descending uuid within a date, or None if the cache holds fewer
+        than ``skip + limit`` payments.
+        """
+        if not self.enabled:
+            return None
+        count = len(self._dates)
+        if (
+            self._covered_from is None
+            or self._has_undated
+            or skip + limit > count
+        ):
+            CACHE_REQUESTS.inc(result="miss")
+            return None
+        CACHE_REQUESTS.inc(result="hit")
+        first = count - 1 - skip
+        return [
+            self._record(index) for index in range(first, first - limit, -1)
+        ]
+
+    async def _run(self, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.reload()
+            except Exception as err:
+                logger.error("Error reloading payment cache: %s", err)
+
+    async def start(self):
+        await self.reload()
+        self.enabled = True
+        self._task = asyncio.create_task(
+            self._run(settings.PAYMENT_CACHE_REFRESH_SECONDS)
+        )
+
+    async def stop(self):
+        self.enabled = False
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+
+payment_cache = PaymentCache()
@@ -1,12 +1,65 @@
 # app/services/payment_service.py
+import base64
+import json
 import logging
-from typing import List
+from decimal import Decimal
+from typing import List, Optional, Tuple
 from datetime import datetime
+from uuid import UUID
 from fastapi import HTTPException
+from tortoise.exceptions import IntegrityError
+from tortoise.expressions import Q
+from tortoise.queryset import QuerySet
+from app.config import settings
+from app.core.money import cents_to_str, decimal_to_cents
+from app.core.queries import estimated_rows, query_deadline, query_error
+from app.core.repository import get_repository, orm_repository
+from app.core.tracing import db_span, span
 from app.models import Payment
+from app.schemas import PaymentCreate
+from app.services.archive_service import payment_archive
+from app.services.payment_cache import payment_cache
+from app.services.reconciliation_service import ReconciliationService
+from app.services.webhook_service import WebhookService
 
 
 logger = logging.getLogger("app.services.payment_service")
+webhook_service = WebhookService()
+PAYMENT_SORTS = ("date", "-date", "amount", "-amount")
+
+
+def encode_cursor(sort: str, record: dict) -> str:
+    """
+    Encodes the position of ``record`` in the ``sort`` order as an opaque
+    cursor.
+    """
+    field = sort.lstrip("-")
+    value = record[field]
+    position = [
+        sort,
+        value.isoformat() if field == "date" else value,
+        str(record["uuid"]),
+    ]
+    return base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+
+
+def decode_cursor(cursor: str, sort: str) -> Tuple[object, str]:
+    """
+    Returns the ``(value, uuid)`` position encoded in ``cursor``.
+
+    Raises:
+        HTTPException: 400 if the cursor is invalid or was issued for
+            another sort.
+    """
+    try:
+        issued_for, value, uuid = json.loads(base64.urlsafe_b64decode(cursor))
+        if issued_for != sort:
+            raise ValueError(f"cursor was issued for sort={issued_for}")
+        if sort.lstrip("-") == "date":
+            return datetime.fromisoformat(value), str(UUID(uuid))
+        return Decimal(value), str(UUID(uuid))
+    except (ValueError, TypeError, ArithmeticError) as err:
+        raise HTTPException(status_code=400, detail="Invalid cursor") from err
 
 
 class PaymentService:
@@ -14,80 +67,352 @@ class PaymentService:
         self,
         skip: int = 0,
         limit: int = 100,
-    ) -> List[Payment]:
+        timeout: Optional[float] = None,
+    ) -> List[dict]:
         """
-        Fetches a list of payments from the database.
+        Fetches a page of payments, most recent first.
+
+        Pages held by the recent payments cache are served from memory.
+        Only the payments table is read: archived payments, the oldest,
+        are left out of the listing.
 
         Args:
             skip (int, optional): Number of records to skip. Defaults to 0.
             limit (int, optional): Maximum number of records to return. Defaults to 100.
+            timeout (float, optional): Query timeout in seconds.
 
         Returns:
-            List[Payment]: A list of Payment objects.
+            List[PaymentRecord]: A list of payments.
 
         Raises:
-            HTTPException: If any error occurs while fetching the payments, a 500 error
-                is raised with the error message.
+            HTTPException: 504 if the query timed out. If any other error occurs
+                while fetching the payments, a 500 error is raised with the error
+                message.
         """
         try:
-            return await Payment.all().offset(skip).limit(limit)
+            with span("PaymentService.get_payments"):
+                cached = payment_cache.get_latest(skip, limit)
+                if cached is not None:
+                    return cached
+                return await get_repository().latest_payments(
+                    skip,
+                    limit,
+                    timeout,
+                )
         except Exception as err:
-            logger.error("Error fetching payments: %s", str(err))
-            raise HTTPException(
-                status_code=500,
-                detail=f"Database error: {str(err)}",
-            ) from err
+            raise query_error(err, "fetching payments") from err
     
     async def get_all_payments(
         self,
-    ) -> List[Payment]:
+        timeout: Optional[float] = None,
+    ) -> List[dict]:
         """
-        Fetches all payments from the database.
+        Fetches all payments from the database and the archive.
+
+        Archived payments are returned before the rows of the payments
+        table.
+
+        Args:
+            timeout (float, optional): Query timeout in seconds.
 
         Returns:
-            List[Payment]: A list of all Payment objects.
+            List[PaymentRecord]: A list of all payments.
 
         Raises:
-            HTTPException: If any error occurs while fetching the payments, a 500 error
-                is raised with the error message.
+            HTTPException: 504 if the query timed out. If any other error occurs
+                while fetching the payments, a 500 error is raised with the error
+                message.
         """
 
         try:
-            return await Payment.all()
+            with span("PaymentService.get_all_payments"):
+                if not payment_archive.overlapping(None, None):
+                    return await get_repository().all_payments(timeout)
+                # Rows being archived are in both places: the table wins.
+                live = await orm_repository.fetch_records(
+                    Payment.all(),
+                    timeout,
+                    extra=("uuid",),
+                )
+                uuids = {str(row.pop("uuid")) for row in live}
+                archived = await payment_archive.records(exclude=uuids)
+                return archived + live
         except Exception as err:
-            logger.error("Error fetching payments: %s", str(err))
-            raise HTTPException(
-                status_code=500,
-                detail=f"Database error: {str(err)}",
-            ) from err
+            raise query_error(err, "fetching payments") from err
 
     async def get_payment_by_interval(
         self,
         start_date: str,
         end_date: str,
-    ) -> List[Payment]:
+        timeout: Optional[float] = None,
+    ) -> List[dict]:
         """
         Fetches payments from the database that occurred within the given date range.
 
+        Ranges inside the window of the recent payments cache are served
+        from memory. Archived payments in the range are read from the
+        archive and returned before the rows of the payments table.
+
         Args:
             start_date: The start date of the range in ISO 8601 format.
             end_date: The end date of the range in ISO 8601 format.
+            timeout: Query timeout in seconds.
 
         Returns:
-            List[Payment]: A list of Payment objects that occurred within the given
-                date range.
+            List[PaymentRecord]: A list of payments that occurred within the
+                given date range.
 
         Raises:
-            HTTPException: If any error occurs while fetching the payments, a 500 error
-                is raised with the error message.
+            HTTPException: 504 if the query timed out. If any other error occurs
+                while fetching the payments, a 500 error is raised with the error
+                message.
         """
         try:
-            start = datetime.fromisoformat(start_date)
-            end = datetime.fromisoformat(end_date)
-            return await Payment.filter(date__range=(start, end))
+            with span("PaymentService.get_payment_by_interval"):
+                start = datetime.fromisoformat(start_date)
+                end = datetime.fromisoformat(end_date)
+                cached = payment_cache.get_range(start, end)
+                if cached is not None:
+                    return cached
+                if not payment_archive.overlapping(start, end):
+                    return await get_repository().payments_between(
+                        start,
+                        end,
+                        timeout,
+                    )
+                # Rows being archived are in both places: the table wins.
+                live = await orm_repository.fetch_records(
+                    Payment.filter(date__range=(start, end)),
+                    timeout,
+                    extra=("uuid",),
+                )
+                uuids = {str(row.pop("uuid")) for row in live}
+                archived = await payment_archive.records(
+                    start,
+                    end,
+                    exclude=uuids,
+                )
+                return archived + live
         except Exception as err:
-            logger.error("Error fetching payments by interval: %s", str(err))
+            raise query_error(err, "fetching payments by interval") from err
+
+    @staticmethod
+    def search_query(
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        min_amount: Optional[Decimal] = None,
+        max_amount: Optional[Decimal] = None,
+        beneficiary: Optional[str] = None,
+        sort: str = "-date",
+        after: Optional[Tuple[object, str]] = None,
+    ) -> QuerySet:
+        """
+        Builds the query of the filtered listing, ordered by ``sort`` with
+        ``uuid`` as tie-breaker and starting after the ``(value, uuid)``
+        position of a cursor.
+
+        Every combination is served by an index of ``Payment.Meta``.
+        Sorting by date leaves out undated payments.
+        """
+        field = sort.lstrip("-")
+        descending = sort.startswith("-")
+        query = Payment.all()
+        if start is not None:
+            query = query.filter(date__gte=start)
+        if end is not None:
+            query = query.filter(date__lte=end)
+        if min_amount is not None:
+            query = query.filter(amount__gte=min_amount)
+        if max_amount is not None:
+            query = query.filter(amount__lte=max_amount)
+        if beneficiary is not None:
+            query = query.filter(beneficiary=beneficiary)
+        if field == "date" and start is None and end is None:
+            query = query.filter(date__isnull=False)
+        if after is not None:
+            value, uuid = after
+            past = "lt" if descending else "gt"
+            # The OR alone is no index range; the bound before it makes the
+            # index scan start at the cursor.
+            query = query.filter(
+                **{f"{field}__{past}e": value},
+            ).filter(
+                Q(**{f"{field}__{past}": value})
+                | Q(**{field: value, f"uuid__{past}": uuid})
+            )
+        direction = "-" if descending else ""
+        return query.order_by(f"{direction}{field}", f"{direction}uuid")
+
+    async def search_payments(
+        self,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        min_amount: Optional[Decimal] = None,
+        max_amount: Optional[Decimal] = None,
+        beneficiary: Optional[str] = None,
+        sort: str = "-date",
+        cursor: Optional[str] = None,
+        limit: int = 100,
+        timeout: Optional[float] = None,
+    ) -> Tuple[List[dict], Optional[str]]:
+        """
+        Fetches a page of payments matching the filters, in ``sort`` order.
+        Only the payments table is searched, not the archive.
+
+        Args:
+            start: Earliest payment date.
+            end: Latest payment date.
+            min_amount: Smallest amount.
+            max_amount: Largest amount.
+            beneficiary: Exact beneficiary name.
+            sort: ``date``, ``-date``, ``amount`` or ``-amount``.
+            cursor: Position returned with the previous page.
+            limit: Maximum number of records to return.
+            timeout: Query timeout in seconds.
+
+        Returns:
+            Tuple[List[PaymentRecord], Optional[str]]: The payments and the
+                cursor of the next page, None on the last page.
+
+        Raises:
+            HTTPException: 400 if the cursor is invalid or was issued for
+                another sort, 504 if the query timed out, 500 on other
+                errors.
+        """
+        after = decode_cursor(cursor, sort) if cursor else None
+        try:
+            with span("PaymentService.search_payments"):
+                # The SQL depends on the filters, so it is always built by
+                # the ORM rather than prepared by the asyncpg repository.
+                rows = await orm_repository.fetch_records(
+                    self.search_query(
+                        start,
+                        end,
+                        min_amount,
+                        max_amount,
+                        beneficiary,
+                        sort,
+                        after,
+                    ).limit(limit + 1),
+                    timeout,
+                    extra=("uuid",),
+                )
+        except Exception as err:
+            raise query_error(err, "searching payments") from err
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(sort, rows[-1])
+        for row in rows:
+            del row["uuid"]
+        return rows, next_cursor
+
+    async def count_payments(
+        self,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        min_amount: Optional[Decimal] = None,
+        max_amount: Optional[Decimal] = None,
+        beneficiary: Optional[str] = None,
+        sort: Optional[str] = None,
+        timeout: Optional[float] = None,
+    ) -> Tuple[int, str]:
+        """
+        Counts the payments listed by ``search_payments`` with the same
+        filters and sort, or all payments when ``sort`` is None and no
+        filter is set.
+
+        The planner estimate is asked first: from
+        ``PAYMENT_COUNT_EXACT_LIMIT`` rows on, it is returned as is rather
+        than scanning that many rows. Smaller results, and every result on
+        databases without planner statistics, are counted exactly.
+
+        Only the payments table is counted. When archived partitions
+        overlap the date filters, so the archive may hold matching
+        payments, ``-live`` is appended to the mode.
+
+        Returns:
+            Tuple[int, str]: The count and ``"exact"`` or ``"estimated"``,
+                possibly followed by ``"-live"``.
+
+        Raises:
+            HTTPException: 504 if the query timed out, 500 on other errors.
+        """
+        if sort is None and all(
+            value is None
+            for value in (start, end, min_amount, max_amount, beneficiary)
+        ):
+            query = Payment.all()
+        else:
+            query = self.search_query(
+                start,
+                end,
+                min_amount,
+                max_amount,
+                beneficiary,
+                sort or "-date",
+            )
+        scope = "-live" if payment_archive.overlapping(start, end) else ""
+        try:
+            with span("PaymentService.count_payments"):
+                async with query_deadline(
+                    timeout or settings.QUERY_TIMEOUT_SECONDS
+                ):
+                    estimate = await estimated_rows(query)
+                    if (
+                        estimate is not None
+                        and estimate >= settings.PAYMENT_COUNT_EXACT_LIMIT
+                    ):
+                        return estimate, f"estimated{scope}"
+                    with db_span("SELECT", "payments"):
+                        return await query.count(), f"exact{scope}"
+        except Exception as err:
+            raise query_error(err, "counting payments") from err
+
+    @staticmethod
+    def to_record(payment: Payment) -> dict:
+        return {
+            "date": payment.date,
+            "document": payment.document,
+            "beneficiary": payment.beneficiary,
+            "amount": cents_to_str(decimal_to_cents(payment.amount)),
+        }
+
+    async def create_payments(
+        self,
+        items: List[PaymentCreate],
+        connection=None,
+    ) -> List[Payment]:
+        """
+        Inserts payments with a single ``bulk_create``. Payments without a
+        ``date`` get the current time. A ``payment.created`` webhook event
+        per payment is queued, and the stored reconciliation digests of
+        their days dropped, in the same transaction.
+
+        Args:
+            items: Validated payment payloads.
+            connection: Transaction to insert in, if any.
+
+        Returns:
+            List[Payment]: The created payments.
+
+        Raises:
+            HTTPException: 409 if a ``document`` already exists.
+        """
+        payments = [
+            Payment(**item.model_dump(exclude_unset=True)) for item in items
+        ]
+        try:
+            with span("PaymentService.create_payments"):
+                with db_span("INSERT", "payments"):
+                    await Payment.bulk_create(payments, using_db=connection)
+                with db_span("INSERT", "webhook_outbox"):
+                    await webhook_service.enqueue_payments(payments, connection)
+                await ReconciliationService.invalidate(payments, connection)
+        except IntegrityError as err:
+            logger.error("Payment creation rejected: %s", str(err))
             raise HTTPException(
-                status_code=500,
-                detail=f"Database error: {str(err)}",
+                status_code=409,
+                detail="Payment document already exists",
             ) from err
+        return payments
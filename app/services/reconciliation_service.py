@@ -0,0 +1,356 @@
+# app/services/reconciliation_service.py
+"""
+Order-independent fingerprints of the payments, to reconcile them against
+partner files without transferring the rows.
+
+Each dated payment hashes to ``row_digest``: the first 16 bytes of the
+SHA-256 of ``document``, ``amount`` (exact string, e.g. ``"100.00"``) and
+``beneficiary`` joined by ``"\\x1f"``, as a big-endian integer (a missing
+document is an empty string). The fingerprint of a UTC hour is the sum of
+the digests of its payments modulo 2**128, as 32 hex digits, so it does
+not depend on row order and duplicates count. The fingerprint of a day is
+the SHA-256 of the lines ``"{count}:{hour fingerprint}\\n"`` of its 24
+hours, and the fingerprint of a range the SHA-256 of the lines
+``"{YYYY-MM-DD}:{day fingerprint}\\n"`` of its days.
+
+Archived payments count as well, so fingerprints do not change when
+payments are archived.
+
+Hours of closed days are stored in ``ReconciliationDigest``, so they are
+only recomputed after a change. Writing payments dated on a day clears
+its hours and bumps its version in the writing transaction; a digest is
+only stored if the version it was computed at is still current, so one
+computed while a write was in flight is discarded.
+"""
+import hashlib
+import logging
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from fastapi import HTTPException
+from tortoise.exceptions import IntegrityError
+from tortoise.expressions import F, Q
+
+from app.config import settings
+from app.core.money import AMOUNT_CENTS, cents_to_str
+from app.core.queries import query_deadline, query_error
+from app.core.repository import orm_repository
+from app.core.tracing import db_span, span
+from app.models import Payment, ReconciliationDigest
+from app.services.archive_service import ONE_MICROSECOND, payment_archive
+
+logger = logging.getLogger("app.services.reconciliation_service")
+
+DIGEST_BYTES = 16
+MODULUS = 1 << (8 * DIGEST_BYTES)
+HOURS = 24
+
+
+def row_digest(document: Optional[str], amount: str, beneficiary: str) -> int:
+    data = "\x1f".join((document or "", amount, beneficiary)).encode("utf-8")
+    return int.from_bytes(hashlib.sha256(data).digest()[:DIGEST_BYTES], "big")
+
+
+def day_fingerprint(hours: List[list]) -> str:
+    lines = "".join(f"{count}:{total}\n" for count, total in hours)
+    return hashlib.sha256(lines.encode("ascii")).hexdigest()
+
+
+def range_fingerprint(days: Iterable[Tuple[date, str]]) -> str:
+    lines = "".join(f"{day.isoformat()}:{fingerprint}\n" for day, fingerprint in days)
+    return hashlib.sha256(lines.encode("ascii")).hexdigest()
+
+
+def utc(moment: datetime) -> datetime:
+    # Naive datetimes are UTC, as in Tortoise's default configuration.
+    if moment.tzinfo is None:
+        return moment.replace(tzinfo=timezone.utc)
+    return moment.astimezone(timezone.utc)
+
+
+def day_start(day: date) -> datetime:
+    return datetime.combine(day, time.min, tzinfo=timezone.utc)
+
+
+def parse_bucket(bucket: str) -> Tuple[datetime, datetime]:
+    """
+    Returns the ``[start, end)`` range of a ``YYYY-MM-DD`` day or a
+    ``YYYY-MM-DDTHH`` hour.
+
+    Raises:
+        HTTPException: 400 if the bucket is malformed.
+    """
+    try:
+        if "T" in bucket:
+            day, hour = bucket.split("T")
+            start = day_start(date.fromisoformat(day)) + timedelta(hours=int(hour))
+            if not 0 <= int(hour) < HOURS:
+                raise ValueError(f"hour {hour} out of range")
+            return start, start + timedelta(hours=1)
+        start = day_start(date.fromisoformat(bucket))
+        return start, start + timedelta(days=1)
+    except ValueError as err:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid bucket: {bucket}",
+        ) from err
+
+
+class ReconciliationService:
+    @staticmethod
+    def is_closed(day: date, now: datetime) -> bool:
+        settled = day_start(day) + timedelta(
+            days=1,
+            seconds=settings.RECONCILIATION_SETTLE_SECONDS,
+        )
+        return settled <= now
+
+    @staticmethod
+    async def compute_hours(
+        day: date,
+        archive_cache: Optional[dict] = None,
+    ) -> List[list]:
+        """
+        Computes the ``[count, fingerprint]`` pairs of the hours of ``day``
+        from the payments table and the archive, counting rows found in
+        both once. ``archive_cache`` is passed to the archive reads, so
+        consecutive days decode each partition once.
+        """
+        counts = [0] * HOURS
+        totals = [0] * HOURS
+        start = day_start(day)
+        with db_span("SELECT", "payments"):
+            rows = await Payment.filter(
+                date__gte=start,
+                date__lt=start + timedelta(days=1),
+            ).annotate(amount_cents=AMOUNT_CENTS).values_list(
+                "uuid",
+                "date",
+                "document",
+                "beneficiary",
+                "amount_cents",
+            )
+        live = set()
+        for uuid, moment, document, beneficiary, cents in rows:
+            live.add(str(uuid))
+            hour = utc(moment).hour
+            counts[hour] += 1
+            totals[hour] += row_digest(document, cents_to_str(cents), beneficiary)
+        archived = await payment_archive.records(
+            start,
+            start + timedelta(days=1) - ONE_MICROSECOND,
+            exclude=live,
+            cache=archive_cache,
+        )
+        for record in archived:
+            hour = record["date"].hour
+            counts[hour] += 1
+            totals[hour] += row_digest(
+                record["document"],
+                record["amount"],
+                record["beneficiary"],
+            )
+        return [
+            [count, f"{total % MODULUS:032x}"]
+            for count, total in zip(counts, totals)
+        ]
+
+    async def day_hours(
+        self,
+        start_date: date,
+        end_date: date,
+    ) -> Dict[date, List[list]]:
+        """
+        Returns the hours of each day of the range, from the stored
+        digests for closed days, computing and storing the missing ones.
+        """
+        now = datetime.now(timezone.utc)
+        # Read before computing: a write committed after this bumps the
+        # version, and the conditional store below then does nothing.
+        stored = {
+            digest.day: digest
+            for digest in await ReconciliationDigest.filter(
+                day__gte=start_date,
+                day__lte=end_date,
+            )
+        }
+        hours = {}
+        archive_cache = {}
+        day = start_date
+        while day <= end_date:
+            closed = self.is_closed(day, now)
+            digest = stored.get(day)
+            if closed and digest is not None and digest.hours is not None:
+                hours[day] = digest.hours
+            else:
+                hours[day] = await self.compute_hours(day, archive_cache)
+                if closed:
+                    await self.store(day, hours[day], digest)
+            day += timedelta(days=1)
+        return hours
+
+    @staticmethod
+    async def store(
+        day: date,
+        hours: List[list],
+        digest: Optional[ReconciliationDigest],
+    ):
+        """
+        Stores the hours of ``day`` unless it was written since ``digest``
+        (None if the day had no row) was read.
+        """
+        if digest is None:
+            try:
+                await ReconciliationDigest.create(day=day, hours=hours)
+            except IntegrityError:
+                # Written, or stored by a concurrent request, meanwhile.
+                return
+        elif not await ReconciliationDigest.filter(
+            day=day,
+            version=digest.version,
+        ).update(hours=hours):
+            return
+        logger.debug("Stored reconciliation digest of %s", day)
+
+    async def fingerprints(
+        self,
+        start_date: date,
+        end_date: date,
+        include_hours: bool = False,
+        timeout: Optional[float] = None,
+    ) -> dict:
+        """
+        Fingerprints of the payments dated from ``start_date`` to
+        ``end_date`` (inclusive UTC days).
+
+        Args:
+            start_date: First day.
+            end_date: Last day.
+            include_hours: Also return the fingerprints of non-empty hours.
+            timeout: Seconds to compute the missing days in. Digests
+                stored before the deadline are kept for the next request.
+
+        Returns:
+            dict: The range count and fingerprint, and those of each day.
+
+        Raises:
+            HTTPException: 400 if the range is empty or longer than
+                ``RECONCILIATION_MAX_DAYS``, 504 if computing it timed
+                out, 500 on other errors.
+        """
+        days = (end_date - start_date).days + 1
+        if days < 1 or days > settings.RECONCILIATION_MAX_DAYS:
+            raise HTTPException(
+                status_code=400,
+                detail=(
+                    "The range must span 1 to "
+                    f"{settings.RECONCILIATION_MAX_DAYS} days"
+                ),
+            )
+        try:
+            with span("ReconciliationService.fingerprints", {"days": days}):
+                async with query_deadline(
+                    timeout or settings.QUERY_TIMEOUT_SECONDS
+                ):
+                    hours = await self.day_hours(start_date, end_date)
+        except Exception as err:
+            raise query_error(err, "computing fingerprints") from err
+        report = []
+        for day, day_hours in hours.items():
+            entry = {
+                "day": day,
+                "count": sum(count for count, _ in day_hours),
+                "fingerprint": day_fingerprint(day_hours),
+            }
+            if include_hours:
+                entry["hours"] = [
+                    {"hour": hour, "count": count, "fingerprint": total}
+                    for hour, (count, total) in enumerate(day_hours)
+                    if count
+                ]
+            report.append(entry)
+        return {
+            "start_date": start_date,
+            "end_date": end_date,
+            "count": sum(entry["count"] for entry in report),
+            "fingerprint": range_fingerprint(
+                (entry["day"], entry["fingerprint"]) for entry in report
+            ),
+            "days": report,
+        }
+
+    async def bucket_rows(
+        self,
+        buckets: List[str],
+        timeout: Optional[float] = None,
+    ) -> List[dict]:
+        """
+        Returns the payments of the given day and hour buckets, by date.
+
+        Raises:
+            HTTPException: 400 if a bucket is malformed or more than
+                ``RECONCILIATION_MAX_BUCKETS`` are requested, 504 if the
+                query timed out, 500 on other errors.
+        """
+        if not 1 <= len(buckets) <= settings.RECONCILIATION_MAX_BUCKETS:
+            raise HTTPException(
+                status_code=400,
+                detail=(
+                    "Request 1 to "
+                    f"{settings.RECONCILIATION_MAX_BUCKETS} buckets"
+                ),
+            )
+        bounds = [parse_bucket(bucket) for bucket in buckets]
+        ranges = [Q(date__gte=start, date__lt=end) for start, end in bounds]
+        try:
+            with span("ReconciliationService.bucket_rows"):
+                rows = await orm_repository.fetch_records(
+                    Payment.filter(Q(*ranges, join_type="OR")).order_by(
+                        "date",
+                        "uuid",
+                    ),
+                    timeout,
+                    extra=("uuid",),
+                )
+                live = {str(row.pop("uuid")) for row in rows}
+                archived = []
+                archive_cache = {}
+                for start, end in sorted(set(bounds)):
+                    if any(
+                        other != (start, end) and other[0] <= start and end <= other[1]
+                        for other in bounds
+                    ):
+                        # An hour of a requested day.
+                        continue
+                    archived.extend(
+                        await payment_archive.records(
+                            start,
+                            end - ONE_MICROSECOND,
+                            exclude=live,
+                            cache=archive_cache,
+                        )
+                    )
+                if not archived:
+                    return rows
+                return sorted(archived + rows, key=lambda row: utc(row["date"]))
+        except Exception as err:
+            raise query_error(err, "fetching reconciliation rows") from err
+
+    @staticmethod
+    async def invalidate(payments: Iterable[Payment], connection=None):
+        """
+        Clears the stored digests of the days of ``payments`` and bumps
+        their versions, in the transaction writing them, if any.
+        """
+        days = {utc(payment.date).date() for payment in payments if payment.date}
+        if days:
+            with db_span("UPDATE", "reconciliation_digests"):
+                # Rows first, so that concurrent writers serialize on them.
+                await ReconciliationDigest.bulk_create(
+                    [ReconciliationDigest(day=day) for day in sorted(days)],
+                    ignore_conflicts=True,
+                    using_db=connection,
+                )
+                await ReconciliationDigest.filter(day__in=days).using_db(
+                    connection
+                ).update(hours=None, version=F("version") + 1)
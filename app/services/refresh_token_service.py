@@ -0,0 +1,127 @@
+# app/services/refresh_token_service.py
+import hashlib
+import logging
+import secrets
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Tuple
+
+from fastapi import HTTPException, status
+
+from app.config import settings
+from app.core.auth import Principal
+from app.core.revocation import revoke_user_tokens
+from app.models import RefreshToken, User
+
+
+logger = logging.getLogger("app.services.refresh_token_service")
+
+
+def hash_refresh_token(raw_token: str) -> str:
+    """
+    Hashes a refresh token for storage and lookup.
+
+    Refresh tokens are 256-bit random values, so a single SHA-256 is enough
+    to protect them at rest and keeps the exchange an indexed lookup
+    instead of a bcrypt verification.
+    """
+    return hashlib.sha256(raw_token.encode("utf-8")).hexdigest()
+
+
+class RefreshTokenService:
+    async def issue(self, user: User, family: Optional[uuid.UUID] = None) -> str:
+        """
+        Creates a refresh token for a user.
+
+        Args:
+            user: The user the token is issued to.
+            family: Rotation family of the token. A new family is started
+                on login.
+
+        Returns:
+            str: The raw refresh token. Only its hash is stored.
+        """
+        raw_token = secrets.token_urlsafe(32)
+        await RefreshToken.create(
+            user=user,
+            token_hash=hash_refresh_token(raw_token),
+            family=family or uuid.uuid4(),
+            expires_at=datetime.now(timezone.utc)
+            + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS),
+        )
+        return raw_token
+
+    async def rotate(self, raw_token: str) -> Tuple[User, str]:
+        """
+        Exchanges a refresh token for a new one of the same family.
+
+        A refresh token can be used only once. Presenting a token that was
+        already rotated means it leaked, so its whole family is revoked.
+
+        Returns:
+            Tuple[User, str]: The token's user and the new raw refresh token.
+
+        Raises:
+            HTTPException: 401 if the token is unknown, expired or reused;
+                400 if the user is disabled.
+        """
+        invalid = HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid refresh token",
+        )
+        token = await RefreshToken.get_or_none(
+            token_hash=hash_refresh_token(raw_token),
+        ).select_related("user")
+        if token is None:
+            raise invalid
+        now = datetime.now(timezone.utc)
+        if token.revoked_at is not None:
+            logger.warning(
+                "Refresh token reuse detected for user %s, revoking family %s",
+                token.user.username,
+                token.family,
+            )
+            await self.revoke_family(token.family)
+            raise invalid
+        if token.expires_at <= now:
+            raise invalid
+        if token.user.disabled:
+            raise HTTPException(status_code=400, detail="User account is disabled")
+        rotated = await RefreshToken.filter(uuid=token.uuid, revoked_at=None).update(
+            revoked_at=now,
+        )
+        if not rotated:
+            # Another request rotated the same token concurrently.
+            await self.revoke_family(token.family)
+            raise invalid
+        return token.user, await self.issue(token.user, token.family)
+
+    async def revoke(self, raw_token: str):
+        """
+        Revokes the family of a refresh token (logout).
+        """
+        token = await RefreshToken.get_or_none(
+            token_hash=hash_refresh_token(raw_token),
+        )
+        if token is not None:
+            await self.revoke_family(token.family)
+
+    async def revoke_family(self, family: uuid.UUID) -> int:
+        return await RefreshToken.filter(family=family, revoked_at=None).update(
+            revoked_at=datetime.now(timezone.utc),
+        )
+
+    async def revoke_user(self, user: Principal) -> int:
+        """
+        Revokes every refresh token and access token of a user.
+
+        Returns:
+            int: Number of refresh tokens revoked.
+        """
+        revoked = await RefreshToken.filter(
+            user_id=user.user_id,
+            revoked_at=None,
+        ).update(revoked_at=datetime.now(timezone.utc))
+        await revoke_user_tokens(user.user_id)
+        logger.info("Revoked %d refresh tokens of user %s", revoked, user.username)
+        return revoked
@@ -0,0 +1,176 @@
+# app/services/user_service.py
+import logging
+import secrets
+from typing import List
+
+from fastapi import HTTPException
+from tortoise.exceptions import IntegrityError
+from tortoise.expressions import Q
+from tortoise.transactions import in_transaction
+
+from app.config import settings
+from app.core.auth import hash_password_async, hash_passwords
+from app.models import User
+from app.schemas import UserInvite
+
+
+logger = logging.getLogger("app.services.user_service")
+
+
+def conflict_detail(err: IntegrityError) -> str:
+    """
+    Maps a unique constraint violation on ``users`` to the message shown
+    to clients.
+    """
+    if "email" in str(err).lower():
+        return "Email already registered"
+    return "Username already registered"
+
+
+class UserService:
+    async def register(self, username: str, email: str, password: str) -> User:
+        """
+        Creates a user with a single INSERT.
+
+        Duplicates are detected by the unique constraints on ``username``
+        and ``email`` instead of separate lookups, which also closes the
+        race between checking and inserting.
+
+        Raises:
+            HTTPException: 400 if the username or email already exists.
+        """
+        hashed_password = await hash_password_async(password)
+        try:
+            return await User.create(
+                username=username,
+                email=email,
+                hashed_password=hashed_password,
+            )
+        except IntegrityError as err:
+            detail = conflict_detail(err)
+            logger.error("Registration of %s rejected: %s", username, detail)
+            raise HTTPException(status_code=400, detail=detail) from err
+
+    async def provision(self, invites: List[UserInvite]) -> dict:
+        """
+        Creates many users at once.
+
+        Invites are processed in batches of ``PROVISION_BATCH_SIZE``: one
+        query finds existing usernames and emails, passwords are hashed in
+        parallel in the password worker pool, and the new users are
+        inserted with a single ``bulk_create``. Invites without a password
+        get a random temporary password, returned in the result.
+
+        Returns:
+            dict: ``created`` users (with temporary passwords, if generated)
+                and ``skipped`` invites with the reason.
+
+        Raises:
+            HTTPException: 400 if there are more than ``PROVISION_MAX_USERS``
+                invites.
+        """
+        if len(invites) > settings.PROVISION_MAX_USERS:
+            raise HTTPException(
+                status_code=400,
+                detail=(
+                    "At most "
+                    f"{settings.PROVISION_MAX_USERS} users can be provisioned "
+                    "per request"
+                ),
+            )
+        created, skipped = [], []
+        seen_usernames, seen_emails = set(), set()
+        unique_invites = []
+        for invite in invites:
+            if invite.username in seen_usernames:
+                skipped.append(
+                    {"username": invite.username, "reason": "Duplicate username"}
+                )
+            elif invite.email in seen_emails:
+                skipped.append(
+                    {"username": invite.username, "reason": "Duplicate email"}
+                )
+            else:
+                seen_usernames.add(invite.username)
+                seen_emails.add(invite.email)
+                unique_invites.append(invite)
+
+        batch_size = settings.PROVISION_BATCH_SIZE
+        for offset in range(0, len(unique_invites), batch_size):
+            batch = unique_invites[offset : offset + batch_size]
+            batch_created, batch_skipped = await self._provision_batch(batch)
+            created.extend(batch_created)
+            skipped.extend(batch_skipped)
+        logger.info(
+            "Provisioned %d users, skipped %d",
+            len(created),
+            len(skipped),
+        )
+        return {"created": created, "skipped": skipped}
+
+    async def _provision_batch(self, batch: List[UserInvite]):
+        existing = await User.filter(
+            Q(username__in=[invite.username for invite in batch])
+            | Q(email__in=[invite.email for invite in batch])
+        ).values_list("username", "email")
+        taken_usernames = {username for username, _ in existing}
+        taken_emails = {email for _, email in existing}
+
+        skipped, invites = [], []
+        for invite in batch:
+            if invite.username in taken_usernames:
+                skipped.append(
+                    {"username": invite.username, "reason": "Username already registered"}
+                )
+            elif invite.email in taken_emails:
+                skipped.append(
+                    {"username": invite.username, "reason": "Email already registered"}
+                )
+            else:
+                invites.append(invite)
+        if not invites:
+            return [], skipped
+
+        passwords = [
+            invite.password or secrets.token_urlsafe(12) for invite in invites
+        ]
+        hashes = await hash_passwords(passwords)
+        users = [
+            User(
+                username=invite.username,
+                email=invite.email,
+                hashed_password=hashed_password,
+            )
+            for invite, hashed_password in zip(invites, hashes)
+        ]
+        try:
+            async with in_transaction():
+                await User.bulk_create(users)
+        except IntegrityError:
+            # A concurrent registration took one of the names; insert one by one.
+            created = []
+            for invite, password, user in zip(invites, passwords, users):
+                try:
+                    await User.create(
+                        username=user.username,
+                        email=user.email,
+                        hashed_password=user.hashed_password,
+                    )
+                except IntegrityError as err:
+                    skipped.append(
+                        {"username": invite.username, "reason": conflict_detail(err)}
+                    )
+                else:
+                    created.append(self._created_entry(invite, password))
+            return created, skipped
+        return [
+            self._created_entry(invite, password)
+            for invite, password in zip(invites, passwords)
+        ], skipped
+
+    @staticmethod
+    def _created_entry(invite: UserInvite, password: str) -> dict:
+        entry = {"username": invite.username, "email": invite.email}
+        if invite.password is None:
+            entry["temporary_password"] = password
+        return entry
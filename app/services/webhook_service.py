@@ -0,0 +1,428 @@
+# app/services/webhook_service.py
+import asyncio
+import hashlib
+import hmac
+import ipaddress
+import json
+import logging
+import random
+import secrets
+import socket
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+from urllib.parse import urlsplit
+
+import httpx
+from fastapi import HTTPException
+from tortoise.expressions import Q
+from tortoise.transactions import in_transaction
+
+from app.config import settings
+from app.core.auth import Principal
+from app.core.metrics import registry
+from app.core.money import cents_to_str, decimal_to_cents
+from app.models import Payment, WebhookOutbox, WebhookSubscription
+
+
+logger = logging.getLogger("app.services.webhook_service")
+
+PAYMENT_CREATED = "payment.created"
+OUTBOX_PENDING = "pending"
+OUTBOX_FAILED = "failed"
+
+WEBHOOK_EVENTS = registry.counter(
+    "webhook_events_total",
+    "Webhook events by delivery result (delivered, retried, failed).",
+    ["result"],
+)
+WEBHOOK_REQUEST_SECONDS = registry.histogram(
+    "webhook_request_seconds",
+    "Duration of webhook delivery requests.",
+)
+
+
+def sign(secret: str, timestamp: str, body: bytes) -> str:
+    """
+    Signs a webhook body. Receivers recompute the HMAC-SHA256 of
+    ``"{timestamp}." + body`` with their secret and compare it with the
+    ``Webhook-Signature`` header.
+    """
+    message = timestamp.encode("ascii") + b"." + body
+    digest = hmac.new(secret.encode("utf-8"), message, hashlib.sha256)
+    return f"sha256={digest.hexdigest()}"
+
+
+def retry_delay(attempts: int) -> float:
+    """
+    Exponential backoff with jitter, in seconds, after ``attempts``
+    failed attempts.
+    """
+    delay = min(
+        settings.WEBHOOK_RETRY_BASE_SECONDS * 2 ** (attempts - 1),
+        settings.WEBHOOK_RETRY_MAX_SECONDS,
+    )
+    return delay * random.uniform(0.5, 1.0)
+
+
+async def check_destination(url: str) -> Optional[str]:
+    """
+    Resolves the host of a webhook URL. Returns None if every address it
+    resolves to is public or in ``WEBHOOK_ALLOWED_NETWORKS``, else the
+    reason it may not be called, so subscribers cannot make the server
+    reach loopback, private, link-local or reserved addresses.
+    """
+    parts = urlsplit(url)
+    try:
+        addresses = await asyncio.get_running_loop().getaddrinfo(
+            parts.hostname,
+            parts.port or (443 if parts.scheme == "https" else 80),
+            type=socket.SOCK_STREAM,
+        )
+    except (OSError, UnicodeError) as err:
+        return f"Cannot resolve {parts.hostname}: {err}"
+    allowed = [
+        ipaddress.ip_network(network)
+        for network in settings.WEBHOOK_ALLOWED_NETWORKS
+    ]
+    for *_, sockaddr in addresses:
+        address = ipaddress.ip_address(sockaddr[0])
+        if getattr(address, "ipv4_mapped", None):
+            address = address.ipv4_mapped
+        if address.is_global or any(
+            address in network for network in allowed
+        ):
+            continue
+        return f"{parts.hostname} resolves to non-public address {address}"
+    return None
+
+
+class WebhookService:
+    async def subscribe(self, user: Principal, url: str) -> WebhookSubscription:
+        """
+        Raises:
+            HTTPException: 400 if the URL does not resolve to public
+            addresses.
+        """
+        error = await check_destination(url)
+        if error is not None:
+            raise HTTPException(status_code=400, detail=error)
+        return await WebhookSubscription.create(
+            user_id=user.user_id,
+            url=url,
+            secret=secrets.token_hex(32),
+        )
+
+    async def list_subscriptions(
+        self,
+        user: Principal,
+    ) -> List[WebhookSubscription]:
+        return await WebhookSubscription.filter(
+            user_id=user.user_id,
+            is_active=True,
+        ).order_by("-created_at")
+
+    async def unsubscribe(self, user: Principal, subscription_id: uuid.UUID):
+        """
+        Deactivates a subscription and drops its undelivered events.
+
+        Raises:
+            HTTPException: 404 if the user has no such subscription.
+        """
+        updated = await WebhookSubscription.filter(
+            uuid=subscription_id,
+            user_id=user.user_id,
+            is_active=True,
+        ).update(is_active=False)
+        if not updated:
+            raise HTTPException(status_code=404, detail="Webhook not found")
+        await WebhookOutbox.filter(subscription_id=subscription_id).delete()
+
+    async def enqueue_payments(
+        self,
+        payments: List[Payment],
+        connection=None,
+    ) -> int:
+        """
+        Adds a ``payment.created`` event per payment and active subscription
+        to the outbox.
+
+        Meant to run in the transaction creating the payments, so events
+        exist exactly for the payments that were committed.
+
+        Returns:
+            int: Number of queued events.
+        """
+        subscription_ids = await WebhookSubscription.filter(
+            is_active=True,
+        ).using_db(connection).values_list("uuid", flat=True)
+        if not subscription_ids:
+            return 0
+        now = datetime.now(timezone.utc)
+        payloads = [
+            {
+                "uuid": str(payment.uuid),
+                "date": payment.date.isoformat() if payment.date else None,
+                "document": payment.document,
+                "beneficiary": payment.beneficiary,
+                "amount": cents_to_str(decimal_to_cents(payment.amount)),
+            }
+            for payment in payments
+        ]
+        events = [
+            WebhookOutbox(
+                subscription_id=subscription_id,
+                event_type=PAYMENT_CREATED,
+                payload=payload,
+                next_attempt_at=now,
+            )
+            for subscription_id in subscription_ids
+            for payload in payloads
+        ]
+        await WebhookOutbox.bulk_create(events, using_db=connection)
+        return len(events)
+
+
+class WebhookDispatcher:
+    """
+    Delivers the events of the outbox table.
+
+    Each round claims up to ``WEBHOOK_FETCH_SIZE`` due events with a lease
+    (``SELECT ... FOR UPDATE SKIP LOCKED`` on Postgres, so several
+    processes can deliver side by side), groups them per subscription and
+    POSTs them in batches of ``WEBHOOK_BATCH_SIZE`` through one pooled
+    ``httpx.AsyncClient``. At most ``WEBHOOK_DESTINATION_CONCURRENCY``
+    requests run against the same host at a time. Delivered events are
+    deleted; failed ones are retried with exponential backoff and marked
+    ``failed`` after ``WEBHOOK_MAX_ATTEMPTS``. Events survive restarts
+    since they only leave the table once delivered; receivers may see an
+    event twice and should deduplicate on its ``id``.
+    """
+
+    def __init__(self):
+        self._client: Optional[httpx.AsyncClient] = None
+        self._destinations: Dict[str, asyncio.Semaphore] = {}
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def notify(self):
+        """
+        Wakes the delivery loop up after new events were committed.
+        """
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def _destination(self, url: str) -> asyncio.Semaphore:
+        host = urlsplit(url).netloc
+        semaphore = self._destinations.get(host)
+        if semaphore is None:
+            semaphore = self._destinations[host] = asyncio.Semaphore(
+                settings.WEBHOOK_DESTINATION_CONCURRENCY
+            )
+        return semaphore
+
+    async def _claim(self) -> List[WebhookOutbox]:
+        now = datetime.now(timezone.utc)
+        async with in_transaction() as connection:
+            events = await (
+                WebhookOutbox.filter(
+                    Q(locked_until__isnull=True) | Q(locked_until__lt=now),
+                    status=OUTBOX_PENDING,
+                    next_attempt_at__lte=now,
+                )
+                .order_by("next_attempt_at")
+                .limit(settings.WEBHOOK_FETCH_SIZE)
+                .select_for_update(skip_locked=True)
+                .using_db(connection)
+            )
+            if events:
+                await WebhookOutbox.filter(
+                    uuid__in=[event.uuid for event in events],
+                ).using_db(connection).update(
+                    locked_until=now + timedelta(
+                        seconds=settings.WEBHOOK_LEASE_SECONDS,
+                    ),
+                )
+        return events
+
+    async def _send(
+        self,
+        subscription: WebhookSubscription,
+        events: List[WebhookOutbox],
+    ) -> Optional[str]:
+        """
+        POSTs a batch of events. Returns None on success, else the error.
+        The destination is checked again on every delivery, since the
+        host may have been re-pointed since the subscription was made.
+        """
+        error = await check_destination(subscription.url)
+        if error is not None:
+            return error
+        body = json.dumps(
+            {
+                "events": [
+                    {
+                        "id": str(event.uuid),
+                        "type": event.event_type,
+                        "created_at": event.created_at.isoformat(),
+                        "data": event.payload,
+                    }
+                    for event in events
+                ]
+            },
+            separators=(",", ":"),
+        ).encode("utf-8")
+        timestamp = str(int(time.time()))
+        headers = {
+            "Content-Type": "application/json",
+            "Webhook-Id": str(subscription.uuid),
+            "Webhook-Timestamp": timestamp,
+            "Webhook-Signature": sign(subscription.secret, timestamp, body),
+        }
+        async with self._destination(subscription.url):
+            started = time.perf_counter()
+            try:
+                response = await self._client.post(
+                    subscription.url,
+                    content=body,
+                    headers=headers,
+                )
+            except httpx.HTTPError as err:
+                return f"{type(err).__name__}: {err}"
+            finally:
+                WEBHOOK_REQUEST_SECONDS.observe(time.perf_counter() - started)
+        if response.is_success:
+            return None
+        return f"HTTP {response.status_code}"
+
+    async def _deliver(
+        self,
+        subscription: Optional[WebhookSubscription],
+        events: List[WebhookOutbox],
+    ):
+        if subscription is None or not subscription.is_active:
+            await WebhookOutbox.filter(
+                uuid__in=[event.uuid for event in events],
+            ).delete()
+            return
+        error = await self._send(subscription, events)
+        if error is None:
+            await WebhookOutbox.filter(
+                uuid__in=[event.uuid for event in events],
+            ).delete()
+            WEBHOOK_EVENTS.inc(len(events), result="delivered")
+            return
+        logger.warning(
+            "Delivery of %d events to %s failed: %s",
+            len(events),
+            subscription.url,
+            error,
+        )
+        by_attempts = defaultdict(list)
+        for event in events:
+            by_attempts[event.attempts + 1].append(event.uuid)
+        now = datetime.now(timezone.utc)
+        for attempts, ids in by_attempts.items():
+            if attempts >= settings.WEBHOOK_MAX_ATTEMPTS:
+                status, result = OUTBOX_FAILED, "failed"
+            else:
+                status, result = OUTBOX_PENDING, "retried"
+            await WebhookOutbox.filter(uuid__in=ids).update(
+                status=status,
+                attempts=attempts,
+                next_attempt_at=now + timedelta(seconds=retry_delay(attempts)),
+                locked_until=None,
+                last_error=error,
+            )
+            WEBHOOK_EVENTS.inc(len(ids), result=result)
+
+    async def run_once(self) -> int:
+        """
+        Claims due events and delivers them.
+
+        Returns:
+            int: Number of claimed events.
+        """
+        events = await self._claim()
+        if not events:
+            return 0
+        by_subscription = defaultdict(list)
+        for event in events:
+            by_subscription[event.subscription_id].append(event)
+        subscriptions = {
+            subscription.uuid: subscription
+            for subscription in await WebhookSubscription.filter(
+                uuid__in=list(by_subscription),
+            )
+        }
+        size = settings.WEBHOOK_BATCH_SIZE
+        await asyncio.gather(
+            *(
+                self._deliver(
+                    subscriptions.get(subscription_id),
+                    pending[start:start + size],
+                )
+                for subscription_id, pending in by_subscription.items()
+                for start in range(0, len(pending), size)
+            )
+        )
+        return len(events)
+
+    async def _run(self):
+        while True:
+            self._wakeup.clear()
+            try:
+                claimed = await self.run_once()
+            except Exception as err:
+                logger.error("Error delivering webhooks: %s", err)
+                claimed = 0
+            if claimed >= settings.WEBHOOK_FETCH_SIZE:
+                continue
+            try:
+                await asyncio.wait_for(
+                    self._wakeup.wait(),
+                    timeout=settings.WEBHOOK_POLL_SECONDS,
+                )
+            except asyncio.TimeoutError:
+                pass
+
+    def open(self):
+        self._client = httpx.AsyncClient(
+            timeout=settings.WEBHOOK_TIMEOUT_SECONDS,
+            limits=httpx.Limits(
+                max_connections=settings.WEBHOOK_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.WEBHOOK_MAX_CONNECTIONS,
+            ),
+        )
+        self._destinations = {}
+        self._wakeup = asyncio.Event()
+
+    async def run(self):
+        """
+        Delivers events until cancelled, for a dedicated process.
+        """
+        self.open()
+        try:
+            await self._run()
+        finally:
+            await self.stop()
+
+    def start(self):
+        self.open()
+        self._task = asyncio.create_task(self._run())
+        logger.info("Webhook dispatcher started")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+        self._wakeup = None
+
+
+webhook_dispatcher = WebhookDispatcher()
@@ -0,0 +1,107 @@
+"""
+Benchmark of the payment listing serialization paths.
+
+Compares the former read path, where amounts are read as ``Decimal``,
+validated into ``PaymentSchema`` and encoded by FastAPI's response model,
+with the integer cents path used by ``PaymentService``/``render_payments``.
+
+Run from the repository root (settings must load, e.g. with a ``.api.config``
+file or ``DATABASE_URL``/``SECRET_KEY`` in the environment):
+
+    python -m benchmarks.payment_serialization --rows 10000
+"""
+import argparse
+import json
+import random
+import timeit
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from types import SimpleNamespace
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+
+from app.api.endpoints.payments import payment_list_adapter
+from app.core.money import cents_to_str
+from app.schemas import PaymentSchema
+
+schema_list_adapter = TypeAdapter(list[PaymentSchema])
+TWO_PLACES = Decimal("0.01")
+
+
+def make_rows(count: int) -> list:
+    """
+    Rows as the database driver returns them: the amount as text and in
+    cents, so each path starts from its own raw form.
+    """
+    start = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    rows = []
+    for i in range(count):
+        cents = random.randint(-10**8, 10**10)
+        rows.append(
+            {
+                "date": start + timedelta(minutes=i),
+                "document": f"DOC-{i}",
+                "beneficiary": f"Beneficiary {i % 100}",
+                "amount_text": cents_to_str(cents),
+                "amount_cents": cents,
+            }
+        )
+    return rows
+
+
+def decimal_path(rows: list) -> bytes:
+    # Tortoise builds a quantized Decimal per row, FastAPI validates the
+    # objects against the response model and encodes the result.
+    payments = [
+        SimpleNamespace(
+            date=row["date"],
+            document=row["document"],
+            beneficiary=row["beneficiary"],
+            amount=Decimal(row["amount_text"]).quantize(TWO_PLACES),
+        )
+        for row in rows
+    ]
+    content = schema_list_adapter.dump_python(
+        schema_list_adapter.validate_python(payments, from_attributes=True),
+        mode="json",
+    )
+    return json.dumps(jsonable_encoder(content)).encode()
+
+
+def cents_path(rows: list) -> bytes:
+    records = [
+        {
+            "date": row["date"],
+            "document": row["document"],
+            "beneficiary": row["beneficiary"],
+            "amount": cents_to_str(row["amount_cents"]),
+        }
+        for row in rows
+    ]
+    return payment_list_adapter.dump_json(records)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    rows = make_rows(args.rows)
+    decoded = [json.loads(decimal_path(rows)), json.loads(cents_path(rows))]
+    assert [p["amount"] for p in decoded[0]] == [p["amount"] for p in decoded[1]]
+
+    results = {}
+    for name, path in (("decimal", decimal_path), ("cents", cents_path)):
+        best = min(timeit.repeat(lambda: path(rows), number=1, repeat=args.repeat))
+        results[name] = best
+        print(
+            f"{name:>8}: {best * 1000:8.1f} ms "
+            f"({best / args.rows * 1e6:.2f} us/row)"
+        )
+    print(f" speedup: {results['decimal'] / results['cents']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Benchmark of the per-query overhead of the repository implementations.
+
+Times the hot reads through ``OrmRepository`` (Tortoise query builder)
+and ``AsyncpgRepository`` (prepared statements on the pooled asyncpg
+connections) against the same database. Needs PostgreSQL with the
+migrations applied; ``--seed`` inserts that many payments first.
+
+Run from the repository root (settings must load, e.g. with a ``.api.config``
+file or ``DATABASE_URL``/``SECRET_KEY`` in the environment):
+
+    python -m benchmarks.repository --iterations 2000 --limit 10
+"""
+import argparse
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+from tortoise import Tortoise, connections
+
+from app.config import TORTOISE_ORM
+from app.core.queries import uses_asyncpg
+from app.core.repository import asyncpg_repository, orm_repository
+from app.models import ApiKey, Payment, User
+
+BENCH_KEY_PREFIX = "bench-key0"
+
+
+async def seed(count: int):
+    start = datetime.now(timezone.utc) - timedelta(minutes=count)
+    stamp = int(time.time())
+    await Payment.bulk_create(
+        [
+            Payment(
+                date=start + timedelta(minutes=i),
+                document=f"BENCH-{stamp}-{i}",
+                beneficiary=f"Beneficiary {i % 100}",
+                amount=Decimal(i % 100000) / 100,
+            )
+            for i in range(count)
+        ],
+        batch_size=5000,
+    )
+
+
+async def seed_api_key() -> str:
+    """
+    Returns the prefix of the benchmark API key, creating it and its user
+    if needed.
+    """
+    user, _ = await User.get_or_create(
+        username="bench-user",
+        defaults={"hashed_password": "!"},
+    )
+    await ApiKey.get_or_create(
+        key_prefix=BENCH_KEY_PREFIX,
+        defaults={"user": user, "hashed_key": "!"},
+    )
+    return BENCH_KEY_PREFIX
+
+
+async def measure(call, iterations: int) -> float:
+    """
+    Mean seconds per call, after a warm-up call that prepares the
+    statements and fills the connection pool.
+    """
+    await call()
+    start = time.perf_counter()
+    for _ in range(iterations):
+        await call()
+    return (time.perf_counter() - start) / iterations
+
+
+async def run(args: argparse.Namespace):
+    await Tortoise.init(config=TORTOISE_ORM)
+    try:
+        if not uses_asyncpg(connections.get("default")):
+            raise SystemExit("The repository benchmark needs PostgreSQL")
+        if args.seed:
+            await seed(args.seed)
+        key_prefix = await seed_api_key()
+        end = datetime.now(timezone.utc)
+        start = end - timedelta(hours=1)
+        queries = {
+            "latest": lambda repo: repo.latest_payments(0, args.limit),
+            "between": lambda repo: repo.payments_between(start, end),
+            "api_keys": lambda repo: repo.api_keys(key_prefix),
+        }
+        for name, query in queries.items():
+            orm, raw = await asyncio.gather(
+                query(orm_repository),
+                query(asyncpg_repository),
+            )
+            assert orm == raw, f"{name}: implementations disagree"
+            assert orm, f"{name}: no rows, the timing would be meaningless"
+            results = {}
+            for repo in (orm_repository, asyncpg_repository):
+                results[repo.name] = await measure(
+                    lambda: query(repo),
+                    args.iterations,
+                )
+            print(
+                f"{name:>9}: orm {results['orm'] * 1e6:8.1f} us, "
+                f"asyncpg {results['asyncpg'] * 1e6:8.1f} us, "
+                f"speedup {results['orm'] / results['asyncpg']:.1f}x"
+            )
+    finally:
+        await Tortoise.close_connections()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    asyncio.run(run(parser.parse_args(argv)))
+
+
+if __name__ == "__main__":
+    main()
@@ -13,7 +13,7 @@ if [[ "$BUILD" -eq 1 ]]; then
     if [[ "$INSTALL" = "1" ]]; then
         echo "🛠️ Building project: "
         echo "╰─ ⏬ Installing requirements"
-        poetry export -f requirements.txt --output requirements.txt
+        poetry export -f requirements.txt --all-extras --output requirements.txt
         pip install -r requirements.txt
         echo "╰─ ⏬ Installing requirements: ended!"
     fi
@@ -68,7 +68,7 @@ if [[ "$BUILD" -eq 1 ]]; then
         echo "Migrations performed!"
     fi
     if [[ "$INJECT_PAYMENTS" = "1" ]]; then
-        psql -h $POSTGRES_HOST -p $POSTGRES_PORT -U postgres -d $POSTGRES_DB -f ./data/payments.sql
+        python -m app.cli import ./data/payments.sql
     fi
     if [[ "$PRODUCTION" = "1" ]]; then
         echo "🐋 Building Docker image..."
@@ -1,7 +1,15 @@
 import pytest
 from async_asgi_testclient import TestClient
 
-from app.models import User, Payment, ApiKey
+from app.models import (
+    User,
+    Payment,
+    ApiKey,
+    IdempotencyKey,
+    ReconciliationDigest,
+    WebhookOutbox,
+    WebhookSubscription,
+)
 
 
 class BaseTester:
@@ -25,6 +33,10 @@ class BaseTester:
         await User.all().delete()
         await Payment.all().delete()
         await ApiKey.all().delete()
+        await IdempotencyKey.all().delete()
+        await WebhookOutbox.all().delete()
+        await WebhookSubscription.all().delete()
+        await ReconciliationDigest.all().delete()
 
     async def setup(self):
         await self.cleanup()
@@ -4,11 +4,15 @@ from contextlib import asynccontextmanager
 
 import pytest
 
+from tortoise import connections
 from tortoise.contrib.test import MEMORY_SQLITE
 
 from asgi_lifespan import LifespanManager
 from httpx import ASGITransport, AsyncClient
 
+from app.config import settings
+from app.core.queries import uses_asyncpg
+from app.dependencies import limiter
 from app.main import app
 
 os.environ["DATABASE_URL"] = MEMORY_SQLITE
@@ -41,3 +45,18 @@ async def client_manager(
 async def client() -> ClientManagerType:
     async with client_manager(app) as c:
         yield c
+
+
+@pytest.fixture(params=["orm", "asyncpg"])
+def repository_backend(request, client: AsyncClient, monkeypatch) -> str:
+    """
+    Runs a test once per ``REPOSITORY_BACKEND``; the asyncpg run is
+    skipped unless DATABASE_URL points to PostgreSQL.
+    """
+    if request.param == "asyncpg":
+        if not uses_asyncpg(connections.get("default")):
+            pytest.skip("the asyncpg repository needs PostgreSQL")
+        # The second run registers and logs in again.
+        limiter.reset()
+    monkeypatch.setattr(settings, "REPOSITORY_BACKEND", request.param)
+    return request.param
@@ -2,16 +2,22 @@
     Make sure to that test_auth.py passes before running these tests.
 """
 
-from datetime import timedelta
+from datetime import datetime, timedelta, timezone
 
 import pytest
 
 from httpx import AsyncClient
 
+from app.config import settings
 from app.core.auth import create_access_token
+from app.core.usage import usage_recorder
+from app.models import ApiKey, Job
 
 from .base import BaseTester
 
+# API keys are looked up through the configured repository.
+pytestmark = pytest.mark.usefixtures("repository_backend")
+
 
 class TestUser(BaseTester):
 
@@ -61,3 +67,152 @@ class TestUser(BaseTester):
         assert response.json().get("detail") == (
             "Invalid authentication credentials"
         )
+
+    @pytest.mark.anyio
+    async def test_api_key_usage_is_recorded(
+        self,
+        client: AsyncClient,
+    ):
+        """
+        Ensure that requests authenticated with an API key are counted and
+        that repeated flushes add up in the same bucket.
+        """
+        await self.create_test_user(client, cleanup=True)
+        login_response = await self.create_test_login(client)
+        headers = {"Authorization": f"Bearer {login_response['access_token']}"}
+        response = await client.post("/api/v1/apikeys/generate", headers=headers)
+        api_key = response.json()["api_key"]
+
+        for _ in range(2):
+            response = await client.get(
+                "/api/v1/pagamentos/",
+                headers={"X-API-KEY": api_key},
+            )
+            assert response.status_code == 200
+            await usage_recorder.flush()
+
+        response = await client.get("/api/v1/apikeys/usage", headers=headers)
+        assert response.status_code == 200
+        usage = response.json()
+        assert len(usage) == 1
+        assert usage[0]["key_prefix"] == api_key[:10]
+        assert usage[0]["request_count"] == 2
+        assert usage[0]["bytes_served"] > 0
+
+    @pytest.mark.anyio
+    async def test_api_key_revoke_and_rotate(
+        self,
+        client: AsyncClient,
+    ):
+        """
+        Ensure that revoked and rotated keys stop working at once and that
+        the rotated key replaces them.
+        """
+        await self.create_test_user(client, cleanup=True)
+        login_response = await self.create_test_login(client)
+        headers = {"Authorization": f"Bearer {login_response['access_token']}"}
+        first, second = [
+            (await client.post("/api/v1/apikeys/generate", headers=headers)).json()
+            for _ in range(2)
+        ]
+
+        response = await client.get("/api/v1/apikeys/", headers=headers)
+        assert response.status_code == 200
+        assert len(response.json()) == 2
+        assert "api_key" not in response.json()[0]
+
+        response = await client.delete(
+            f"/api/v1/apikeys/{first['id']}",
+            headers=headers,
+        )
+        assert response.status_code == 200
+        assert response.json()["is_active"] is False
+        response = await client.get(
+            "/api/v1/pagamentos/",
+            headers={"X-API-KEY": first["api_key"]},
+        )
+        assert response.status_code == 401
+
+        response = await client.post(
+            f"/api/v1/apikeys/{second['id']}/rotate",
+            headers=headers,
+        )
+        assert response.status_code == 201
+        rotated = response.json()
+        old = await client.get(
+            "/api/v1/pagamentos/",
+            headers={"X-API-KEY": second["api_key"]},
+        )
+        new = await client.get(
+            "/api/v1/pagamentos/",
+            headers={"X-API-KEY": rotated["api_key"]},
+        )
+        assert old.status_code == 401
+        assert new.status_code == 200
+
+    @pytest.mark.anyio
+    async def test_api_key_scope_and_expiry(
+        self,
+        client: AsyncClient,
+        monkeypatch,
+    ):
+        """
+        Ensure that read-only keys cannot write or manage keys, that only
+        read keys start exports, and that expired keys are rejected.
+        """
+        # Jobs are only queued, not run, in worker mode.
+        monkeypatch.setattr(settings, "JOBS_MODE", "worker")
+        await self.create_test_user(client, cleanup=True)
+        login_response = await self.create_test_login(client)
+        headers = {"Authorization": f"Bearer {login_response['access_token']}"}
+        response = await client.post(
+            "/api/v1/apikeys/generate",
+            json={"scope": "read"},
+            headers=headers,
+        )
+        read_key = {"X-API-KEY": response.json()["api_key"]}
+
+        response = await client.get("/api/v1/pagamentos/", headers=read_key)
+        assert response.status_code == 200
+        response = await client.post("/api/v1/apikeys/generate", headers=read_key)
+        assert response.status_code == 403
+        response = await client.get("/api/v1/apikeys/", headers=read_key)
+        assert response.status_code == 403
+
+        response = await client.post(
+            "/api/v1/apikeys/generate",
+            json={"scope": "ingest"},
+            headers=headers,
+        )
+        ingest_key = {"X-API-KEY": response.json()["api_key"]}
+        response = await client.post(
+            "/api/v1/jobs/export",
+            json={"format": "arrow"},
+            headers=ingest_key,
+        )
+        assert response.status_code == 403
+        response = await client.post(
+            "/api/v1/jobs/export",
+            json={"format": "arrow"},
+            headers=read_key,
+        )
+        assert response.status_code == 202
+        await Job.filter(uuid=response.json()["id"]).delete()
+
+        response = await client.post(
+            "/api/v1/apikeys/generate",
+            json={"expires_at": "2000-01-01T00:00:00Z"},
+            headers=headers,
+        )
+        assert response.status_code == 400
+
+        response = await client.post("/api/v1/apikeys/generate", headers=headers)
+        api_key = response.json()["api_key"]
+        await ApiKey.filter(uuid=response.json()["id"]).update(
+            expires_at=datetime.now(timezone.utc) - timedelta(seconds=1),
+        )
+        response = await client.get(
+            "/api/v1/pagamentos/",
+            headers={"X-API-KEY": api_key},
+        )
+        assert response.status_code == 401
@@ -0,0 +1,262 @@
+# test_archive.py
+import io
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+import pytest
+from httpx import AsyncClient
+
+from app.config import settings
+from app.models import Payment
+from app.services import archive_service
+from app.services.archive_service import payment_archive
+from app.services.reconciliation_service import ReconciliationService
+from .base import BaseTester
+
+pa = pytest.importorskip("pyarrow")
+pq = pytest.importorskip("pyarrow.parquet")
+
+START = datetime(2024, 1, 30, tzinfo=timezone.utc)
+CUTOFF = datetime(2024, 2, 2, tzinfo=timezone.utc)
+
+
+class TestArchive(BaseTester):
+    @pytest.fixture(autouse=True)
+    async def archive_dir(self, tmp_path, monkeypatch):
+        """Archives to a temporary directory and cleans up payments."""
+        monkeypatch.setattr(settings, "ARCHIVE_DIR", str(tmp_path))
+        yield tmp_path
+        await self.cleanup()
+
+    async def create_payments(self, count: int = 5):
+        """Payments on consecutive days, three of them before CUTOFF."""
+        await Payment.bulk_create(
+            [
+                Payment(
+                    date=START + timedelta(days=i, hours=i),
+                    document=f"ARCHIVE-{i}",
+                    beneficiary=f"Beneficiary {i}",
+                    amount=Decimal("10.05") * (i + 1),
+                )
+                for i in range(count)
+            ]
+        )
+
+    async def get_headers(self, client: AsyncClient) -> dict:
+        await self.create_test_user(client, cleanup=True)
+        login_data = await self.create_test_login(client)
+        return {"Authorization": f"Bearer {login_data['access_token']}"}
+
+    @pytest.mark.anyio
+    async def test_archive_moves_old_payments(self, client: AsyncClient, archive_dir):
+        await self.cleanup()
+        await self.create_payments()
+
+        moved = await payment_archive.archive(CUTOFF, batch_size=2)
+
+        assert moved == 3
+        assert sorted(p.document for p in await Payment.all()) == [
+            "ARCHIVE-3",
+            "ARCHIVE-4",
+        ]
+        partitions = payment_archive.partitions()
+        assert sorted(partitions) == ["2024-01", "2024-02"]
+        assert partitions["2024-01"]["rows"] == 2
+        assert partitions["2024-02"]["rows"] == 1
+        assert (archive_dir / "2024" / "payments-2024-01.arrow").exists()
+        assert not list(archive_dir.rglob("*.tmp"))
+
+        records = await payment_archive.records()
+        assert sorted(r["document"] for r in records) == [
+            "ARCHIVE-0",
+            "ARCHIVE-1",
+            "ARCHIVE-2",
+        ]
+        assert {r["amount"] for r in records} == {"10.05", "20.10", "30.15"}
+
+        assert await payment_archive.archive(CUTOFF) == 0
+
+    @pytest.mark.anyio
+    async def test_rerun_does_not_duplicate(self, client: AsyncClient):
+        await self.cleanup()
+        await self.create_payments()
+        await payment_archive.archive(CUTOFF)
+        uuids = {}
+        async for table in payment_archive.read_tables():
+            uuids.update(
+                zip(table["document"].to_pylist(), table["uuid"].to_pylist())
+            )
+        # A row of a run interrupted after writing its partition.
+        await Payment.create(
+            uuid=uuids["ARCHIVE-0"],
+            date=START,
+            document="ARCHIVE-0",
+            beneficiary="Beneficiary 0",
+            amount=Decimal("10.05"),
+        )
+
+        assert await payment_archive.archive(CUTOFF) == 1
+        assert await Payment.filter(date__lt=CUTOFF).count() == 0
+        assert payment_archive.partitions()["2024-01"]["rows"] == 2
+        assert len(await payment_archive.records()) == 3
+
+    @pytest.mark.anyio
+    async def test_interval_reads_through(self, client: AsyncClient):
+        headers = await self.get_headers(client)
+        await self.create_payments()
+        await payment_archive.archive(CUTOFF)
+
+        response = await client.get(
+            "/api/v1/pagamentos/interval",
+            params={
+                "start_date": (START + timedelta(days=1)).isoformat(),
+                "end_date": (START + timedelta(days=4)).isoformat(),
+            },
+            headers=headers,
+        )
+
+        assert response.status_code == 200
+        assert sorted(p["document"] for p in response.json()) == [
+            "ARCHIVE-1",
+            "ARCHIVE-2",
+            "ARCHIVE-3",
+        ]
+
+    @pytest.mark.anyio
+    async def test_all_reads_through(self, client: AsyncClient):
+        headers = await self.get_headers(client)
+        await self.create_payments()
+        await payment_archive.archive(CUTOFF)
+
+        response = await client.get("/api/v1/pagamentos/all", headers=headers)
+
+        assert response.status_code == 200
+        assert sorted(p["document"] for p in response.json()) == [
+            f"ARCHIVE-{i}" for i in range(5)
+        ]
+
+    @pytest.mark.anyio
+    async def test_total_count_flags_live_only(self, client: AsyncClient):
+        headers = await self.get_headers(client)
+        await self.create_payments()
+        await payment_archive.archive(CUTOFF)
+
+        response = await client.get(
+            "/api/v1/pagamentos/",
+            params={"include_total": "true"},
+            headers=headers,
+        )
+        assert response.headers["X-Total-Count"] == "2"
+        assert response.headers["X-Total-Count-Mode"] == "exact-live"
+
+        # No archived month overlaps these dates.
+        response = await client.get(
+            "/api/v1/pagamentos/",
+            params={
+                "include_total": "true",
+                "start_date": (CUTOFF + timedelta(days=30)).isoformat(),
+            },
+            headers=headers,
+        )
+        assert response.headers["X-Total-Count-Mode"] == "exact"
+
+    @pytest.mark.anyio
+    async def test_export_reads_through(self, client: AsyncClient):
+        headers = await self.get_headers(client)
+        await self.create_payments()
+        await payment_archive.archive(CUTOFF)
+
+        response = await client.get(
+            "/api/v1/pagamentos/export?format=parquet",
+            headers=headers,
+        )
+
+        assert response.status_code == 200
+        table = pq.read_table(io.BytesIO(response.content))
+        assert sorted(table.column("document").to_pylist()) == [
+            f"ARCHIVE-{i}" for i in range(5)
+        ]
+        assert table.schema.field("amount").type == pa.decimal128(15, 2)
+
+    @pytest.mark.anyio
+    async def test_fingerprints_survive_archiving(self, client: AsyncClient):
+        await self.cleanup()
+        await self.create_payments()
+        service = ReconciliationService()
+        day = START.date()
+
+        before = await service.compute_hours(day)
+        await payment_archive.archive(CUTOFF)
+
+        assert await service.compute_hours(day) == before
+        assert sum(count for count, _ in before) == 1
+        rows = await service.bucket_rows(["2024-01-30", "2024-01-30T00", "2024-02-03"])
+        assert [row["document"] for row in rows] == ["ARCHIVE-0", "ARCHIVE-4"]
+
+    @pytest.mark.anyio
+    async def test_rows_in_both_places_are_read_once(self, client: AsyncClient):
+        headers = await self.get_headers(client)
+        await self.create_payments()
+        service = ReconciliationService()
+        before = await service.compute_hours(START.date())
+        await payment_archive.archive(CUTOFF)
+        uuids = {}
+        async for table in payment_archive.read_tables():
+            uuids.update(
+                zip(table["document"].to_pylist(), table["uuid"].to_pylist())
+            )
+        # A row of a run interrupted after publishing its partition.
+        await Payment.create(
+            uuid=uuids["ARCHIVE-0"],
+            date=START,
+            document="ARCHIVE-0",
+            beneficiary="Beneficiary 0",
+            amount=Decimal("10.05"),
+        )
+
+        response = await client.get(
+            "/api/v1/pagamentos/interval",
+            params={
+                "start_date": START.isoformat(),
+                "end_date": (START + timedelta(days=4)).isoformat(),
+            },
+            headers=headers,
+        )
+        assert sorted(p["document"] for p in response.json()) == [
+            f"ARCHIVE-{i}" for i in range(4)
+        ]
+        response = await client.get(
+            "/api/v1/pagamentos/export?format=parquet",
+            headers=headers,
+        )
+        table = pq.read_table(io.BytesIO(response.content))
+        assert sorted(table.column("document").to_pylist()) == [
+            f"ARCHIVE-{i}" for i in range(5)
+        ]
+        assert await service.compute_hours(START.date()) == before
+        rows = await service.bucket_rows(["2024-01-30"])
+        assert [row["document"] for row in rows] == ["ARCHIVE-0"]
+
+    @pytest.mark.anyio
+    async def test_fingerprints_decode_each_partition_once(
+        self,
+        client: AsyncClient,
+        monkeypatch,
+    ):
+        await self.cleanup()
+        await self.create_payments()
+        await payment_archive.archive(CUTOFF)
+        opened = []
+        memory_map = pa.memory_map
+
+        def counting_memory_map(path, *args, **kwargs):
+            opened.append(path)
+            return memory_map(path, *args, **kwargs)
+
+        monkeypatch.setattr(archive_service.pa, "memory_map", counting_memory_map)
+        await ReconciliationService().day_hours(
+            START.date() - timedelta(days=5),
+            CUTOFF.date() + timedelta(days=5),
+        )
+
+        assert len(opened) == len(set(opened)) == 2
@@ -6,9 +6,14 @@ import bcrypt
 from httpx import AsyncClient
 from async_asgi_testclient import TestClient
 
+from tortoise import connections
 from tortoise.exceptions import DoesNotExist
 
+from app.config import settings
+from app.core.revocation import revoke_user_tokens
 from app.models import User
+from app.schemas import UserInvite
+from app.services.user_service import UserService
 
 from .base import BaseTester
 
@@ -138,6 +143,201 @@ class TestAuth(BaseTester):
         response = await client.post("/api/v1/auth/token", data=login_data)
         assert response.status_code == 422
 
+    @pytest.mark.anyio
+    async def test_token_claims_skip_user_lookup(
+        self,
+        client: AsyncClient,
+        monkeypatch,
+    ):
+        """
+        Tokens carrying the user id and version authenticate payment reads
+        without querying the users table.
+        """
+        await self.create_test_user(client, cleanup=True)
+        login_response = await self.create_test_login(client)
+        headers = {"Authorization": f"Bearer {login_response['access_token']}"}
+
+        async def fail(*args, **kwargs):
+            raise AssertionError("User lookup during authentication")
+
+        monkeypatch.setattr(User, "get", fail)
+        response = await client.get("/api/v1/pagamentos/", headers=headers)
+        assert response.status_code == 200
+
+    @pytest.mark.anyio
+    async def test_bearer_token_skips_users_table(
+        self,
+        client: AsyncClient,
+        monkeypatch,
+    ):
+        """
+        Bearer requests to account endpoints make no query on the users
+        table.
+        """
+        await self.create_test_user(client, cleanup=True)
+        login_response = await self.create_test_login(client)
+        headers = {"Authorization": f"Bearer {login_response['access_token']}"}
+        db = connections.get("default")
+        queries = []
+        for name in ("execute_query", "execute_query_dict"):
+            execute = getattr(db, name)
+
+            async def record(query, values=None, execute=execute):
+                queries.append(query)
+                return await execute(query, values)
+
+            monkeypatch.setattr(db, name, record)
+
+        for path in ("/api/v1/apikeys/", "/api/v1/webhooks/"):
+            response = await client.get(path, headers=headers)
+            assert response.status_code == 200
+        assert queries
+        assert not [query for query in queries if '"users"' in query]
+
+    @pytest.mark.anyio
+    async def test_revoked_token(self, client: AsyncClient):
+        user = await self.create_test_user(client, cleanup=True)
+        login_response = await self.create_test_login(client)
+        headers = {"Authorization": f"Bearer {login_response['access_token']}"}
+
+        await revoke_user_tokens(str(user.uuid))
+
+        response = await client.get("/api/v1/pagamentos/", headers=headers)
+        assert response.status_code == 401
+        response = await client.post("/api/v1/apikeys/generate", headers=headers)
+        assert response.status_code == 401
+        await self.cleanup()
+
+    @pytest.mark.anyio
+    async def test_provision_users(self, client: AsyncClient):
+        user = await self.create_test_user(client, cleanup=True)
+        login_response = await self.create_test_login(client)
+        headers = {"Authorization": f"Bearer {login_response['access_token']}"}
+        invites = {
+            "users": [
+                {"username": "invited1", "email": "invited1@example.com"},
+                {
+                    "username": "invited2",
+                    "email": "invited2@example.com",
+                    "password": "invitedpassword",
+                },
+                {"username": "testuser", "email": "other@example.com"},
+            ]
+        }
+
+        response = await client.post(
+            "/api/v1/auth/provision",
+            json=invites,
+            headers=headers,
+        )
+        assert response.status_code == 403
+
+        user.is_admin = True
+        await user.save()
+        response = await client.post(
+            "/api/v1/auth/provision",
+            json=invites,
+            headers=headers,
+        )
+        assert response.status_code == 201
+        data = response.json()
+        assert [entry["username"] for entry in data["created"]] == [
+            "invited1",
+            "invited2",
+        ]
+        assert "temporary_password" in data["created"][0]
+        assert "temporary_password" not in data["created"][1]
+        assert data["skipped"] == [
+            {"username": "testuser", "reason": "Username already registered"}
+        ]
+        invited = await User.get(username="invited1")
+        assert bcrypt.checkpw(
+            data["created"][0]["temporary_password"].encode(),
+            invited.hashed_password.encode(),
+        )
+
+        response = await client.post(
+            "/api/v1/auth/provision",
+            json={
+                "users": [
+                    {"username": f"bulk{i}", "email": f"bulk{i}@example.com"}
+                    for i in range(settings.PROVISION_MAX_USERS + 1)
+                ]
+            },
+            headers=headers,
+        )
+        assert response.status_code == 400
+        assert not await User.filter(username="bulk0").exists()
+
+    @pytest.mark.anyio
+    async def test_provision_in_batches(self, client: AsyncClient, monkeypatch):
+        await self.create_test_user(client, cleanup=True)
+        monkeypatch.setattr(settings, "PROVISION_BATCH_SIZE", 2)
+        invites = [
+            UserInvite(username=f"bulk{i}", email=f"bulk{i}@example.com")
+            for i in range(4)
+        ]
+        # Skipped in the last batch, as it is already registered.
+        invites.append(UserInvite(username="testuser", email="new@example.com"))
+
+        result = await UserService().provision(invites)
+
+        assert [entry["username"] for entry in result["created"]] == [
+            f"bulk{i}" for i in range(4)
+        ]
+        assert result["skipped"] == [
+            {"username": "testuser", "reason": "Username already registered"}
+        ]
+        assert await User.filter(username__startswith="bulk").count() == 4
+
+    @pytest.mark.anyio
+    async def test_refresh_token_rotation(self, client: AsyncClient):
+        await self.create_test_user(client, cleanup=True)
+        login_response = await self.create_test_login(client)
+        first_refresh = login_response["refresh_token"]
+
+        response = await client.post(
+            "/api/v1/auth/refresh",
+            json={"refresh_token": first_refresh},
+        )
+        assert response.status_code == 200
+        rotated = response.json()
+        assert rotated["refresh_token"] != first_refresh
+        headers = {"Authorization": f"Bearer {rotated['access_token']}"}
+        response = await client.get("/api/v1/pagamentos/", headers=headers)
+        assert response.status_code == 200
+
+        # Reusing the rotated token revokes the whole family.
+        response = await client.post(
+            "/api/v1/auth/refresh",
+            json={"refresh_token": first_refresh},
+        )
+        assert response.status_code == 401
+        response = await client.post(
+            "/api/v1/auth/refresh",
+            json={"refresh_token": rotated["refresh_token"]},
+        )
+        assert response.status_code == 401
+
+    @pytest.mark.anyio
+    async def test_revoke_all_sessions(self, client: AsyncClient):
+        await self.create_test_user(client, cleanup=True)
+        login_response = await self.create_test_login(client)
+        headers = {"Authorization": f"Bearer {login_response['access_token']}"}
+
+        response = await client.post("/api/v1/auth/revoke-all", headers=headers)
+        assert response.status_code == 200
+        assert response.json()["revoked"] == 1
+
+        response = await client.post(
+            "/api/v1/auth/refresh",
+            json={"refresh_token": login_response["refresh_token"]},
+        )
+        assert response.status_code == 401
+        response = await client.get("/api/v1/pagamentos/", headers=headers)
+        assert response.status_code == 401
+        await self.cleanup()
+
     @pytest.mark.anyio
     async def test_rate_limiting(self, client: AsyncClient):
         """
@@ -0,0 +1,96 @@
+# test_export.py
+import io
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import pytest
+from httpx import AsyncClient
+
+from app.models import Payment
+from app.services.export_service import ExportService
+from .base import BaseTester
+
+pa = pytest.importorskip("pyarrow")
+pq = pytest.importorskip("pyarrow.parquet")
+
+
+class TestExport(BaseTester):
+    async def create_test_payments(self, count=10):
+        """Helper method to create test payments."""
+        for i in range(count):
+            await Payment.create(
+                document=f"DOC-{i}",
+                beneficiary=f"Beneficiary {i}",
+                amount=Decimal(f"{i}.1{i}"),
+                date=datetime.now() - timedelta(days=i),
+            )
+
+    async def get_headers(self, client: AsyncClient) -> dict:
+        await self.create_test_user(client, cleanup=True)
+        login_data = await self.create_test_login(client)
+        return {"Authorization": f"Bearer {login_data['access_token']}"}
+
+    @pytest.fixture(autouse=True)
+    async def cleanup_payments(self):
+        """Automatically clean up payments after each test."""
+        yield
+        await self.cleanup()
+
+    @pytest.mark.anyio
+    async def test_export_arrow_stream(self, client: AsyncClient):
+        headers = await self.get_headers(client)
+        await self.create_test_payments(5)
+
+        response = await client.get(
+            "/api/v1/pagamentos/export?format=arrow",
+            headers=headers,
+        )
+
+        assert response.status_code == 200
+        table = pa.ipc.open_stream(response.content).read_all()
+        assert table.num_rows == 5
+        assert table.schema.field("amount").type == pa.decimal128(15, 2)
+        amounts = sorted(table.column("amount").to_pylist())
+        assert amounts[-1] == Decimal("4.14")
+
+    @pytest.mark.anyio
+    async def test_export_parquet_interval(self, client: AsyncClient):
+        headers = await self.get_headers(client)
+        await self.create_test_payments(10)
+        start_date = (datetime.now() - timedelta(days=3, hours=12)).isoformat()
+
+        response = await client.get(
+            f"/api/v1/pagamentos/export?format=parquet&start_date={start_date}",
+            headers=headers,
+        )
+
+        assert response.status_code == 200
+        table = pq.read_table(io.BytesIO(response.content))
+        assert table.num_rows == 4
+        assert set(table.column("document").to_pylist()) == {
+            "DOC-0",
+            "DOC-1",
+            "DOC-2",
+            "DOC-3",
+        }
+
+    @pytest.mark.anyio
+    async def test_export_invalid_date(self, client: AsyncClient):
+        headers = await self.get_headers(client)
+        response = await client.get(
+            "/api/v1/pagamentos/export?start_date=invalid",
+            headers=headers,
+        )
+        assert response.status_code == 400
+
+    @pytest.mark.anyio
+    async def test_export_batches(self, client: AsyncClient, tmp_path):
+        await self.create_test_payments(7)
+        path = tmp_path / "payments.arrow"
+
+        written = await ExportService().write("arrow", str(path), batch_size=3)
+
+        assert written == path.stat().st_size
+        reader = pa.ipc.open_stream(path.read_bytes())
+        batches = list(reader)
+        assert [batch.num_rows for batch in batches] == [3, 3, 1]
@@ -0,0 +1,90 @@
+""" Module for testing the liveness and readiness endpoints. """
+
+import asyncio
+import time
+
+import pytest
+from httpx import AsyncClient
+
+from app.config import settings
+from app.core.health import health_checker
+
+
+class TestHealth:
+
+    @pytest.mark.anyio
+    async def test_liveness(self, client: AsyncClient):
+        for path in ("/health", "/health/live"):
+            response = await client.get(path)
+            assert response.status_code == 200
+            assert response.json() == {"status": "ok"}
+
+    @pytest.mark.anyio
+    async def test_readiness(self, client: AsyncClient):
+        response = await client.get("/health/ready")
+
+        assert response.status_code == 200
+        checks = response.json()["checks"]
+        assert checks["database"]["ok"] is True
+        assert "latency_ms" in checks["database"]
+        assert set(checks) == {
+            "database",
+            "pool",
+            "rate_limit_storage",
+            "event_loop",
+        }
+
+    @pytest.mark.anyio
+    async def test_readiness_is_cached(self, client: AsyncClient, monkeypatch):
+        await client.get("/health/ready")
+        calls = []
+
+        async def probe():
+            calls.append(1)
+            return {"status": "ok", "checks": {}}
+
+        monkeypatch.setattr(health_checker, "_probe", probe)
+        response = await client.get("/health/ready")
+
+        assert response.status_code == 200
+        assert calls == []
+
+    @pytest.mark.anyio
+    async def test_not_ready_before_startup(self, client: AsyncClient):
+        health_checker.stop()
+        try:
+            response = await client.get("/health/ready")
+            assert response.status_code == 503
+        finally:
+            health_checker.start()
+
+    @pytest.mark.anyio
+    async def test_event_loop_lag_is_sampled(
+        self,
+        client: AsyncClient,
+        monkeypatch,
+    ):
+        monkeypatch.setattr(settings, "HEALTH_LOOP_SAMPLE_SECONDS", 0.05)
+        monkeypatch.setattr(settings, "HEALTH_LOOP_LAG_THRESHOLD_SECONDS", 0.1)
+        health_checker.stop()
+        health_checker.start()
+        try:
+            assert health_checker.check_event_loop() == {
+                "ok": True,
+                "lag_ms": None,
+            }
+            # Let the sampler start, block the loop, then catch the sample
+            # taken when it resumes.
+            await asyncio.sleep(0)
+            time.sleep(0.2)
+            checks = []
+            for _ in range(10):
+                await asyncio.sleep(0.005)
+                checks.append(health_checker.check_event_loop())
+        finally:
+            health_checker.stop()
+            health_checker.start()
+
+        worst = max(checks, key=lambda check: check["lag_ms"] or 0)
+        assert worst["lag_ms"] >= 100
+        assert worst["ok"] is False
@@ -0,0 +1,237 @@
+""" Module for testing idempotent payment creation. """
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+import pytest
+from fastapi import HTTPException
+from httpx import AsyncClient
+
+from app.config import settings
+from app.models import IdempotencyKey, Payment
+from app.services.idempotency_service import idempotency_service
+from .base import BaseTester
+
+
+class TestIdempotency(BaseTester):
+
+    payment = {
+        "date": "2026-10-19T10:00:00+00:00",
+        "beneficiary": "Beneficiary",
+        "amount": "100.50",
+    }
+
+    async def login(self, client: AsyncClient) -> dict:
+        await self.create_test_user(client, cleanup=True)
+        tokens = await self.create_test_login(client)
+        return {"Authorization": f"Bearer {tokens['access_token']}"}
+
+    @pytest.mark.anyio
+    async def test_create_payment(self, client: AsyncClient):
+        headers = await self.login(client)
+        payment = {**self.payment, "document": "DOC1"}
+
+        response = await client.post(
+            "/api/v1/pagamentos/",
+            json=payment,
+            headers=headers,
+        )
+        assert response.status_code == 201
+        assert response.json()["amount"] == "100.50"
+        assert response.json()["document"] == "DOC1"
+
+        response = await client.post(
+            "/api/v1/pagamentos/",
+            json=payment,
+            headers=headers,
+        )
+        assert response.status_code == 409
+        assert await Payment.all().count() == 1
+
+    @pytest.mark.anyio
+    async def test_replay_returns_stored_response(self, client: AsyncClient):
+        headers = await self.login(client)
+        headers["Idempotency-Key"] = "key-1"
+
+        first = await client.post(
+            "/api/v1/pagamentos/",
+            json=self.payment,
+            headers=headers,
+        )
+        second = await client.post(
+            "/api/v1/pagamentos/",
+            json=self.payment,
+            headers=headers,
+        )
+
+        assert first.status_code == second.status_code == 201
+        assert second.content == first.content
+        assert second.headers["Idempotent-Replayed"] == "true"
+        assert "Idempotent-Replayed" not in first.headers
+        # The payment has no document, so only the key prevents a duplicate.
+        assert await Payment.all().count() == 1
+
+    @pytest.mark.anyio
+    async def test_key_reused_for_other_request(self, client: AsyncClient):
+        headers = await self.login(client)
+        headers["Idempotency-Key"] = "key-1"
+        await client.post(
+            "/api/v1/pagamentos/",
+            json=self.payment,
+            headers=headers,
+        )
+
+        response = await client.post(
+            "/api/v1/pagamentos/",
+            json={**self.payment, "amount": "1.00"},
+            headers=headers,
+        )
+
+        assert response.status_code == 422
+        assert await Payment.all().count() == 1
+
+    @pytest.mark.anyio
+    async def test_batch(self, client: AsyncClient):
+        headers = await self.login(client)
+        headers["Idempotency-Key"] = "batch-1"
+        batch = [
+            {**self.payment, "document": f"DOC{idx}"} for idx in range(3)
+        ]
+
+        response = await client.post(
+            "/api/v1/pagamentos/batch",
+            json=batch + [{"beneficiary": "No amount"}],
+            headers=headers,
+        )
+        assert response.status_code == 422
+        # Failed requests are not stored, so the key can be retried.
+        assert await IdempotencyKey.all().count() == 0
+
+        for _ in range(2):
+            response = await client.post(
+                "/api/v1/pagamentos/batch",
+                json=batch,
+                headers=headers,
+            )
+            assert response.status_code == 201
+            assert [row["document"] for row in response.json()] == [
+                "DOC0", "DOC1", "DOC2",
+            ]
+        assert await Payment.all().count() == 3
+
+    @pytest.mark.anyio
+    async def test_in_progress_key(self, client: AsyncClient):
+        headers = await self.login(client)
+        headers["Idempotency-Key"] = "key-1"
+        await client.post(
+            "/api/v1/pagamentos/",
+            json=self.payment,
+            headers=headers,
+        )
+        record = await IdempotencyKey.get(key="key-1")
+        await IdempotencyKey.filter(uuid=record.uuid).update(
+            status_code=None,
+            response_body=None,
+            locked_until=datetime.now(timezone.utc) + timedelta(minutes=1),
+        )
+
+        response = await client.post(
+            "/api/v1/pagamentos/",
+            json=self.payment,
+            headers=headers,
+        )
+        assert response.status_code == 409
+
+        # A stale reservation left by a crashed worker is taken over.
+        await IdempotencyKey.filter(uuid=record.uuid).update(
+            locked_until=datetime.now(timezone.utc) - timedelta(seconds=1),
+        )
+        response = await client.post(
+            "/api/v1/pagamentos/",
+            json=self.payment,
+            headers=headers,
+        )
+        assert response.status_code == 201
+        assert (await IdempotencyKey.get(uuid=record.uuid)).status_code == 201
+
+    @pytest.mark.anyio
+    async def test_taken_over_request_is_rolled_back(
+        self,
+        client: AsyncClient,
+        monkeypatch,
+    ):
+        user = await self.create_test_user(client, cleanup=True)
+        takeover = datetime.now(timezone.utc) + timedelta(minutes=5)
+        reserve = idempotency_service._reserve
+
+        async def reserve_then_lose(*args):
+            record = await reserve(*args)
+            # Another worker takes the reservation over meanwhile.
+            await IdempotencyKey.filter(uuid=record.uuid).update(
+                locked_until=takeover,
+            )
+            return record
+
+        monkeypatch.setattr(idempotency_service, "_reserve", reserve_then_lose)
+
+        async def handler(connection):
+            await Payment.create(
+                beneficiary="Beneficiary",
+                amount=Decimal("1"),
+                using_db=connection,
+            )
+            return 201, b"{}"
+
+        with pytest.raises(HTTPException) as error:
+            await idempotency_service.execute(
+                str(user.uuid),
+                "key-1",
+                "fingerprint",
+                handler,
+            )
+        assert error.value.status_code == 409
+        assert await Payment.all().count() == 0
+        # The new holder's reservation is left alone.
+        record = await IdempotencyKey.get(key="key-1")
+        assert record.status_code is None
+        assert record.locked_until == takeover
+
+    @pytest.mark.anyio
+    async def test_request_deadline_within_lock(
+        self,
+        client: AsyncClient,
+        monkeypatch,
+    ):
+        monkeypatch.setattr(settings, "IDEMPOTENCY_LOCK_SECONDS", 0.2)
+        user = await self.create_test_user(client, cleanup=True)
+
+        async def handler(connection):
+            await asyncio.sleep(1)
+            return 201, b"{}"
+
+        with pytest.raises(HTTPException) as error:
+            await idempotency_service.execute(
+                str(user.uuid),
+                "key-1",
+                "fingerprint",
+                handler,
+            )
+        assert error.value.status_code == 504
+        assert not await IdempotencyKey.exists(key="key-1")
+
+    @pytest.mark.anyio
+    async def test_sweep_expired_keys(self, client: AsyncClient):
+        headers = await self.login(client)
+        for key in ("old", "new"):
+            await client.post(
+                "/api/v1/pagamentos/",
+                json=self.payment,
+                headers={**headers, "Idempotency-Key": key},
+            )
+        await IdempotencyKey.filter(key="old").update(
+            expires_at=datetime.now(timezone.utc) - timedelta(seconds=1),
+        )
+
+        assert await idempotency_service.sweep() == 1
+        assert await IdempotencyKey.filter(key="new").exists()
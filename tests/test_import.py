@@ -0,0 +1,173 @@
+""" Module for testing the streaming payment importer. """
+
+import io
+import json
+
+import pytest
+from httpx import AsyncClient
+
+from app.models import Payment
+from app.services.import_service import ImportService
+from app.services.import_sources import SqlDumpReader, read_csv
+from .base import BaseTester
+
+SQL_DUMP = """SET client_encoding = 'UTF8';
+INSERT INTO payments (uuid, date, document, beneficiary, amount) VALUES
+(gen_random_uuid(), NOW(), 'SQL-1', 'John Doe', 100.00),
+(gen_random_uuid(), NOW(), 'SQL-2', 'Jane O''Neil
+of Lisbon', 250.50);
+INSERT INTO "users" ("uuid", "username") VALUES ('skipped', 'user');
+INSERT INTO public.payments VALUES ('3f0c7c52-8a40-4a35-9d1f-0b3f4fd0b6e1', '2025-01-01 10:00:00+00', NULL, 'No document', '-5.05');
+COPY public.payments (uuid, date, document, beneficiary, amount) FROM stdin;
+3f0c7c52-8a40-4a35-9d1f-0b3f4fd0b6e2	2025-01-02 10:00:00+00	\\N	Tab\\tName	7
+\\.
+"""
+
+
+class TestImportSources:
+
+    def test_sql_dump(self):
+        rows = list(SqlDumpReader(io.StringIO(SQL_DUMP), now="NOW"))
+
+        assert [line for line, _ in rows] == [3, 4, 7, 9]
+        assert rows[0][1] == {
+            "uuid": None,
+            "date": "NOW",
+            "document": "SQL-1",
+            "beneficiary": "John Doe",
+            "amount": "100.00",
+        }
+        assert rows[1][1]["beneficiary"] == "Jane O'Neil\nof Lisbon"
+        assert rows[2][1]["document"] is None
+        assert rows[2][1]["amount"] == "-5.05"
+        assert rows[3][1]["beneficiary"] == "Tab\tName"
+        assert rows[3][1]["document"] is None
+
+    def test_csv(self):
+        handle = io.StringIO("document,beneficiary,amount\n,Someone,1.50\n")
+        assert list(read_csv(handle)) == [
+            (2, {"document": None, "beneficiary": "Someone", "amount": "1.50"}),
+        ]
+
+
+class TestImportService(BaseTester):
+
+    def write_csv(self, path, count: int, bad_line: int = None):
+        lines = ["date,document,beneficiary,amount"]
+        for i in range(count):
+            amount = "oops" if i + 2 == bad_line else f"{i}.10"
+            lines.append(f"2025-01-01T10:00:00+00:00,,Beneficiary {i},{amount}")
+        path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+    @pytest.mark.anyio
+    async def test_import_sql_dump(self, client: AsyncClient, tmp_path):
+        await self.cleanup()
+        source = tmp_path / "payments.sql"
+        source.write_text(SQL_DUMP, encoding="utf-8")
+
+        imported = await ImportService().import_file(
+            str(source),
+            batch_size=2,
+            workers=2,
+        )
+
+        assert imported == 4
+        assert await Payment.all().count() == 4
+        payment = await Payment.get(document="SQL-2")
+        assert payment.beneficiary == "Jane O'Neil\nof Lisbon"
+        assert payment.date is not None
+
+    @pytest.mark.anyio
+    async def test_resume_after_failure(self, client: AsyncClient, tmp_path):
+        await self.cleanup()
+        source = tmp_path / "payments.csv"
+        checkpoint = str(tmp_path / "payments.csv.import.json")
+        # Line 8 holds the seventh row, in the fourth batch of two; the
+        # batches parsed before it are still committed.
+        self.write_csv(source, 9, bad_line=8)
+
+        with pytest.raises(ValueError, match="line 8"):
+            await ImportService().import_file(
+                str(source),
+                batch_size=2,
+                workers=1,
+                checkpoint_path=checkpoint,
+            )
+        with open(checkpoint, encoding="utf-8") as handle:
+            assert json.load(handle)["rows"] == 6
+        assert await Payment.all().count() == 6
+
+        self.write_csv(source, 9)
+        progress = []
+
+        async def on_progress(rows: int):
+            progress.append(rows)
+
+        imported = await ImportService().import_file(
+            str(source),
+            batch_size=2,
+            workers=1,
+            checkpoint_path=checkpoint,
+            on_progress=on_progress,
+        )
+
+        assert imported == 9
+        assert progress == [8, 9]
+        # Rows without a uuid got the same one on both runs: no duplicates.
+        assert await Payment.all().count() == 9
+
+    @pytest.mark.anyio
+    async def test_overlapping_resume_skips_duplicates(
+        self,
+        client: AsyncClient,
+        tmp_path,
+    ):
+        await self.cleanup()
+        source = tmp_path / "payments.csv"
+        checkpoint = tmp_path / "payments.csv.import.json"
+        self.write_csv(source, 6)
+        await ImportService().import_file(
+            str(source),
+            batch_size=2,
+            checkpoint_path=str(checkpoint),
+        )
+        # As if the last batches had committed after the checkpoint was
+        # last written, e.g. by another worker.
+        state = json.loads(checkpoint.read_text(encoding="utf-8"))
+        state["rows"] = 2
+        checkpoint.write_text(json.dumps(state), encoding="utf-8")
+
+        imported = await ImportService().import_file(
+            str(source),
+            batch_size=2,
+            checkpoint_path=str(checkpoint),
+        )
+
+        assert imported == 6
+        assert await Payment.all().count() == 6
+
+    @pytest.mark.anyio
+    async def test_existing_documents_are_skipped(
+        self,
+        client: AsyncClient,
+        tmp_path,
+    ):
+        await self.cleanup()
+        await Payment.create(document="DUP-1", beneficiary="Existing", amount=1)
+        source = tmp_path / "payments.csv"
+        source.write_text(
+            "date,document,beneficiary,amount\n"
+            "2025-01-01T10:00:00+00:00,NEW-1,Beneficiary,1.00\n"
+            "2025-01-01T10:00:00+00:00,DUP-1,Beneficiary,2.00\n"
+            "2025-01-01T10:00:00+00:00,NEW-2,Beneficiary,3.00\n"
+            "2025-01-01T10:00:00+00:00,NEW-2,Beneficiary,4.00\n",
+            encoding="utf-8",
+        )
+
+        imported = await ImportService().import_file(str(source), batch_size=10)
+
+        assert imported == 2
+        assert sorted(
+            await Payment.all().values_list("document", flat=True)
+        ) == ["DUP-1", "NEW-1", "NEW-2"]
+        assert (await Payment.get(document="DUP-1")).beneficiary == "Existing"
@@ -0,0 +1,98 @@
+# test_jobs.py
+import asyncio
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import pytest
+from httpx import AsyncClient
+
+from app.config import settings
+from app.models import Job, Payment
+from .base import BaseTester
+
+
+class TestJobs(BaseTester):
+    async def get_headers(self, client: AsyncClient) -> dict:
+        await self.create_test_user(client, cleanup=True)
+        login_data = await self.create_test_login(client)
+        return {"Authorization": f"Bearer {login_data['access_token']}"}
+
+    async def wait_for_job(self, client: AsyncClient, job_id: str, headers: dict):
+        for _ in range(100):
+            response = await client.get(f"/api/v1/jobs/{job_id}", headers=headers)
+            assert response.status_code == 200
+            if response.json()["status"] in ("done", "failed"):
+                return response.json()
+            await asyncio.sleep(0.05)
+        raise AssertionError("Job did not finish")
+
+    @pytest.fixture(autouse=True)
+    async def cleanup_jobs(self, tmp_path, monkeypatch):
+        """Writes job files to a temporary directory and cleans up jobs."""
+        monkeypatch.setattr(settings, "JOBS_DIR", str(tmp_path))
+        yield
+        await Job.all().delete()
+        await self.cleanup()
+
+    @pytest.mark.anyio
+    async def test_import_job(self, client: AsyncClient, tmp_path):
+        headers = await self.get_headers(client)
+        csv_data = "date,document,beneficiary,amount\n" + "".join(
+            f"2025-01-0{i + 1}T10:00:00+00:00,JOB-{i},Beneficiary {i},{i}.50\n"
+            for i in range(3)
+        )
+
+        response = await client.post(
+            "/api/v1/jobs/import",
+            files={"file": ("payments.csv", csv_data, "text/csv")},
+            headers=headers,
+        )
+
+        assert response.status_code == 202
+        job = await self.wait_for_job(client, response.json()["id"], headers)
+        assert job["status"] == "done"
+        assert job["progress"] == 3
+        assert await Payment.filter(document__startswith="JOB-").count() == 3
+        assert not list(tmp_path.glob("upload-*"))
+
+    @pytest.mark.anyio
+    async def test_export_job_download_range(self, client: AsyncClient):
+        pytest.importorskip("pyarrow")
+        headers = await self.get_headers(client)
+        for i in range(3):
+            await Payment.create(
+                document=f"DOC-{i}",
+                beneficiary="Test",
+                amount=Decimal("10.00"),
+                date=datetime.now() - timedelta(days=i),
+            )
+
+        response = await client.post(
+            "/api/v1/jobs/export",
+            json={"format": "arrow"},
+            headers=headers,
+        )
+        assert response.status_code == 202
+        job = await self.wait_for_job(client, response.json()["id"], headers)
+        assert job["status"] == "done"
+
+        full = await client.get(
+            f"/api/v1/jobs/{job['id']}/download",
+            headers=headers,
+        )
+        assert full.status_code == 200
+        partial = await client.get(
+            f"/api/v1/jobs/{job['id']}/download",
+            headers={**headers, "Range": "bytes=0-9"},
+        )
+        assert partial.status_code == 206
+        assert partial.content == full.content[:10]
+
+    @pytest.mark.anyio
+    async def test_job_of_other_user(self, client: AsyncClient):
+        headers = await self.get_headers(client)
+        response = await client.get(
+            "/api/v1/jobs/00000000-0000-0000-0000-000000000000",
+            headers=headers,
+        )
+        assert response.status_code == 404
@@ -0,0 +1,95 @@
+""" Module for testing token signing keys and the JWKS endpoint. """
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from httpx import AsyncClient
+from jwt import PyJWTError
+
+from app.core.keys import KeyRing
+
+serialization = pytest.importorskip(
+    "cryptography.hazmat.primitives.serialization"
+)
+from cryptography.hazmat.primitives.asymmetric import ed25519, rsa  # noqa: E402
+
+
+def private_pem(key) -> bytes:
+    return key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption(),
+    )
+
+
+def public_pem(key) -> bytes:
+    return key.public_key().public_bytes(
+        serialization.Encoding.PEM,
+        serialization.PublicFormat.SubjectPublicKeyInfo,
+    )
+
+
+def claims() -> dict:
+    return {
+        "sub": "testuser",
+        "exp": datetime.now(timezone.utc) + timedelta(minutes=5),
+    }
+
+
+class TestKeyRing:
+
+    def test_rs256_round_trip(self):
+        key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        ring = KeyRing("RS256", private_key_pem=private_pem(key))
+
+        token = ring.encode(claims())
+
+        assert ring.decode(token)["sub"] == "testuser"
+        jwk = ring.jwks["keys"][0]
+        assert jwk["kid"] == ring.signing_kid
+        assert jwk["alg"] == "RS256"
+        assert "d" not in jwk
+
+    def test_rotation_keeps_previous_key(self):
+        old_key = ed25519.Ed25519PrivateKey.generate()
+        new_key = ed25519.Ed25519PrivateKey.generate()
+        old_ring = KeyRing("EdDSA", private_key_pem=private_pem(old_key))
+        new_ring = KeyRing(
+            "EdDSA",
+            private_key_pem=private_pem(new_key),
+            public_keys_pem=[public_pem(old_key)],
+        )
+
+        old_token = old_ring.encode(claims())
+
+        assert new_ring.decode(old_token)["sub"] == "testuser"
+        assert len(new_ring.jwks["keys"]) == 2
+        assert new_ring.signing_kid != old_ring.signing_kid
+
+    def test_unknown_kid_rejected(self):
+        ring = KeyRing(
+            "EdDSA",
+            private_key_pem=private_pem(ed25519.Ed25519PrivateKey.generate()),
+        )
+        other = KeyRing(
+            "EdDSA",
+            private_key_pem=private_pem(ed25519.Ed25519PrivateKey.generate()),
+        )
+        with pytest.raises(PyJWTError):
+            ring.decode(other.encode(claims()))
+
+
+class TestJwksEndpoint:
+
+    @pytest.mark.anyio
+    async def test_jwks_cacheable(self, client: AsyncClient):
+        response = await client.get("/.well-known/jwks.json")
+        assert response.status_code == 200
+        assert "keys" in response.json()
+        assert "max-age" in response.headers["cache-control"]
+
+        cached = await client.get(
+            "/.well-known/jwks.json",
+            headers={"If-None-Match": response.headers["etag"]},
+        )
+        assert cached.status_code == 304
@@ -0,0 +1,145 @@
+""" Module for testing load shedding and per-route concurrency caps. """
+
+import asyncio
+
+import pytest
+from fastapi import FastAPI
+from httpx import ASGITransport, AsyncClient
+
+from app.config import Settings, settings
+from app.core.load_shedding import (
+    SHED_REQUESTS,
+    LoadShedder,
+    LoadSheddingMiddleware,
+    load_shedder,
+)
+
+
+def overload(shedder: LoadShedder, seconds: float):
+    for _ in range(settings.LOAD_SHED_MIN_SAMPLES):
+        shedder.observe("GET /api/v1/pagamentos/", seconds)
+    shedder._evaluated_at = 0.0
+
+
+class TestLoadShedder:
+
+    @pytest.mark.anyio
+    async def test_levels_follow_p95(self):
+        shedder = LoadShedder()
+        shedder.start()
+        try:
+            assert not shedder.should_shed("GET /api/v1/pagamentos/all")
+
+            overload(shedder, settings.LOAD_SHED_P95_TARGET_SECONDS * 1.5)
+            assert shedder.should_shed("GET /api/v1/pagamentos/all")
+            assert not shedder.should_shed("GET /api/v1/pagamentos/")
+
+            overload(shedder, settings.LOAD_SHED_P95_TARGET_SECONDS * 3)
+            assert shedder.should_shed("GET /api/v1/pagamentos/")
+            assert not shedder.should_shed("GET /health")
+        finally:
+            shedder.stop()
+
+    @pytest.mark.anyio
+    async def test_loop_lag_triggers_shedding(self):
+        shedder = LoadShedder()
+        shedder.start()
+        try:
+            shedder.lag = settings.LOAD_SHED_LAG_TARGET_SECONDS * 1.5
+            assert shedder.should_shed("GET /api/v1/pagamentos/export")
+            assert not shedder.should_shed("GET /api/v1/pagamentos/")
+        finally:
+            shedder.stop()
+
+    @pytest.mark.anyio
+    async def test_low_priority_latency_is_ignored(self):
+        shedder = LoadShedder()
+        shedder.start()
+        try:
+            for _ in range(settings.LOAD_SHED_MIN_SAMPLES):
+                shedder.observe("GET /api/v1/pagamentos/export", 60.0)
+            assert shedder.p95() == 0.0
+        finally:
+            shedder.stop()
+
+    @pytest.mark.anyio
+    async def test_p95_within_bucket_width(self):
+        shedder = LoadShedder()
+        shedder.start()
+        try:
+            for millis in range(1, 1001):
+                shedder.observe("GET /api/v1/pagamentos/", millis / 1000)
+            assert 0.95 <= shedder.p95() <= 0.95 * 1.1
+        finally:
+            shedder.stop()
+
+    def test_route_keys_follow_api_version(self):
+        config = Settings(API_VERSION="v2")
+        assert config.ROUTE_PRIORITY["GET /api/v2/pagamentos/all"] == "low"
+        assert config.ROUTE_CONCURRENCY["POST /api/v2/auth/token"] == 8
+        assert config.ROUTE_PRIORITY["GET /health"] == "high"
+
+
+class TestLoadSheddingMiddleware:
+
+    @pytest.mark.anyio
+    async def test_sheds_low_priority_routes(self, client: AsyncClient):
+        load_shedder.start()
+        try:
+            overload(load_shedder, settings.LOAD_SHED_P95_TARGET_SECONDS * 1.5)
+            before = SHED_REQUESTS.value(
+                route="GET /api/v1/pagamentos/all",
+                reason="overload",
+            )
+
+            response = await client.get("/api/v1/pagamentos/all")
+            assert response.status_code == 503
+            assert response.headers["Retry-After"] == str(
+                settings.LOAD_SHED_RETRY_AFTER_SECONDS
+            )
+            assert SHED_REQUESTS.value(
+                route="GET /api/v1/pagamentos/all",
+                reason="overload",
+            ) == before + 1
+
+            response = await client.get("/health/live")
+            assert response.status_code == 200
+            response = await client.get("/metrics")
+            assert "load_shed_requests_total" in response.text
+        finally:
+            load_shedder.stop()
+
+    @pytest.mark.anyio
+    async def test_queue_timeout(self, monkeypatch):
+        monkeypatch.setattr(settings, "ROUTE_CONCURRENCY", {"GET /slow": 1})
+        monkeypatch.setattr(settings, "LOAD_SHED_QUEUE_TIMEOUT_SECONDS", 0.05)
+        release = asyncio.Event()
+        app = FastAPI()
+
+        @app.get("/slow")
+        async def slow():
+            await release.wait()
+            return {"ok": True}
+
+        shedder = LoadShedder()
+        shedder.start()
+        transport = ASGITransport(app=LoadSheddingMiddleware(app, shedder))
+        try:
+            async with AsyncClient(
+                transport=transport,
+                base_url="http://test",
+            ) as client:
+                first = asyncio.create_task(client.get("/slow"))
+                await asyncio.sleep(0.01)
+                second = await client.get("/slow")
+                assert second.status_code == 503
+                assert SHED_REQUESTS.value(
+                    route="GET /slow",
+                    reason="queue_timeout",
+                ) >= 1
+
+                release.set()
+                assert (await first).status_code == 200
+                assert (await client.get("/slow")).status_code == 200
+        finally:
+            shedder.stop()
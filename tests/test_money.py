@@ -0,0 +1,31 @@
+""" Module for testing the integer cents money helpers. """
+
+from decimal import Decimal
+
+import pytest
+
+from app.core.money import cents_to_str, decimal_to_cents
+
+
+class TestMoney:
+
+    @pytest.mark.parametrize(
+        "cents, text",
+        [
+            (0, "0.00"),
+            (5, "0.05"),
+            (10000, "100.00"),
+            (-505, "-5.05"),
+            (-5, "-0.05"),
+            (123456789012345, "1234567890123.45"),
+        ],
+    )
+    def test_cents_to_str(self, cents, text):
+        assert cents_to_str(cents) == text
+        assert Decimal(text) == Decimal(cents) / 100
+
+    def test_decimal_to_cents(self):
+        assert decimal_to_cents(Decimal("1E+2")) == 10000
+        assert decimal_to_cents(Decimal("-5.05")) == -505
+        with pytest.raises(ValueError):
+            decimal_to_cents(Decimal("0.001"))
@@ -0,0 +1,97 @@
+""" Module for testing the metrics registry and the event loop monitor. """
+
+import asyncio
+import time
+
+import pytest
+from httpx import AsyncClient
+
+from app.core.loop_monitor import LoopMonitor
+from app.core.metrics import MetricsRegistry
+from .base import BaseTester
+
+
+def block_loop(seconds: float):
+    time.sleep(seconds)
+
+
+class TestMetricsRegistry:
+
+    def test_histogram_render(self):
+        registry = MetricsRegistry()
+        histogram = registry.histogram(
+            "request_seconds",
+            "Request latency.",
+            ["route"],
+            buckets=(0.1, 1.0),
+        )
+        histogram.observe(0.05, route="/a")
+        histogram.observe(0.5, route="/a")
+
+        text = registry.render()
+
+        assert '# TYPE request_seconds histogram' in text
+        assert 'request_seconds_bucket{route="/a",le="0.1"} 1' in text
+        assert 'request_seconds_bucket{route="/a",le="+Inf"} 2' in text
+        assert 'request_seconds_count{route="/a"} 2' in text
+
+    def test_same_name_returns_same_metric(self):
+        registry = MetricsRegistry()
+        counter = registry.counter("jobs_total", "Jobs.")
+        assert registry.counter("jobs_total", "Jobs.") is counter
+        with pytest.raises(ValueError):
+            registry.histogram("jobs_total", "Jobs.")
+
+
+class TestLoopMonitor:
+
+    @pytest.mark.anyio
+    async def test_slow_callback_recorded_with_route(self):
+        monitor = LoopMonitor(interval=0.01, slow_threshold=0.05)
+        monitor.start()
+        try:
+            await asyncio.sleep(0.05)
+            monitor.track(
+                asyncio.current_task(),
+                {"method": "GET", "path": "/api/v1/pagamentos/all"},
+            )
+            block_loop(0.3)
+            await asyncio.sleep(0.05)
+        finally:
+            monitor.stop()
+
+        entry = monitor.slow_callbacks[-1]
+        assert entry["route"] == "GET /api/v1/pagamentos/all"
+        assert "block_loop" in entry["stack"]
+        assert entry["duration_ms"] >= 200
+        assert monitor.snapshot()["last_lag_ms"] >= 0
+
+
+class TestMetricsEndpoint:
+
+    @pytest.mark.anyio
+    async def test_metrics_exposes_loop_lag(self, client: AsyncClient):
+        response = await client.get("/metrics")
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain")
+        assert "# TYPE event_loop_lag_seconds histogram" in response.text
+
+
+class TestAdminLoop(BaseTester):
+
+    @pytest.mark.anyio
+    async def test_loop_report_requires_admin(self, client: AsyncClient):
+        user = await self.create_test_user(client, cleanup=True)
+        login_data = await self.create_test_login(client)
+        headers = {"Authorization": f"Bearer {login_data['access_token']}"}
+
+        response = await client.get("/api/v1/admin/loop", headers=headers)
+        assert response.status_code == 403
+
+        user.is_admin = True
+        await user.save()
+        response = await client.get("/api/v1/admin/loop", headers=headers)
+        assert response.status_code == 200
+        assert "slow_callbacks" in response.json()
+        await self.cleanup()
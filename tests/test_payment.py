@@ -6,6 +6,9 @@ from httpx import AsyncClient
 from app.models import Payment
 from .base import BaseTester
 
+# Listings are served by the configured repository.
+pytestmark = pytest.mark.usefixtures("repository_backend")
+
 
 class TestPayment(BaseTester):
     async def create_test_payments(self, count=10):
@@ -140,6 +143,7 @@ class TestPayment(BaseTester):
             response = await client.get("/api/v1/pagamentos/", headers=headers)
             responses.append(response)
         response = await client.get("/api/v1/pagamentos/", headers=headers)
+        responses.append(response)
         rate_limited = any(resp.status_code == 429 for resp in responses)
         assert rate_limited, "Expected at least one request to be rate limited (429)"
 
@@ -156,3 +160,25 @@ class TestPayment(BaseTester):
         response = await client.get("/api/v1/pagamentos/", headers=headers)
         assert response.status_code == 400
         assert "disabled" in response.json()["detail"]
+
+    @pytest.mark.anyio
+    async def test_amounts_are_exact_strings(self, client: AsyncClient):
+        await self.create_test_user(client, cleanup=True)
+        login_data = await self.create_test_login(client)
+        headers = {"Authorization": f"Bearer {login_data['access_token']}"}
+        amounts = ["100.00", "0.10", "-5.05", "1234567890123.45"]
+        for i, amount in enumerate(amounts):
+            await Payment.create(
+                document=f"DOC-AMOUNT-{i}",
+                beneficiary="Test",
+                amount=Decimal(amount),
+                date=datetime.now(),
+            )
+
+        response = await client.get("/api/v1/pagamentos/all", headers=headers)
+
+        assert response.status_code == 200
+        assert sorted(payment["amount"] for payment in response.json()) == sorted(
+            amounts
+        )
+
@@ -0,0 +1,227 @@
+""" Module for testing the recent payments cache. """
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+import pytest
+from httpx import AsyncClient
+
+from app.config import settings
+from app.models import Payment
+from app.services.payment_cache import CACHE_REQUESTS, PaymentCache, payment_cache
+from app.services.payment_service import PaymentService
+from .base import BaseTester
+
+
+class TestPaymentCache(BaseTester):
+
+    # A second back, so the fixed microseconds never put it in the future
+    # and the payment of five days ago stays out of the window.
+    now = datetime.now(timezone.utc).replace(microsecond=123456) - timedelta(seconds=1)
+
+    async def create_payments(self, cleanup: bool = True):
+        if cleanup:
+            await self.cleanup()
+        for day in range(10):
+            await Payment.create(
+                date=self.now - timedelta(days=day),
+                document=f"DOC{day}",
+                beneficiary=f"Beneficiary {day}",
+                amount=Decimal(f"{day}.05"),
+            )
+
+    async def start_cache(self) -> PaymentCache:
+        cache = PaymentCache()
+        await cache.reload()
+        cache.enabled = True
+        return cache
+
+    @pytest.mark.anyio
+    async def test_latest_matches_database(
+        self,
+        client: AsyncClient,
+        monkeypatch,
+    ):
+        monkeypatch.setattr(settings, "PAYMENT_CACHE_WINDOW_DAYS", 5)
+        await self.create_payments()
+        cache = await self.start_cache()
+
+        assert len(cache) == 5
+        page = cache.get_latest(1, 3)
+        assert page == await PaymentService().get_payments(skip=1, limit=3)
+        assert [row["document"] for row in page] == ["DOC1", "DOC2", "DOC3"]
+        assert page[0]["amount"] == "1.05"
+        assert page[0]["date"] == self.now - timedelta(days=1)
+        # Deeper pages need rows older than the window.
+        assert cache.get_latest(3, 3) is None
+
+    @pytest.mark.anyio
+    async def test_range(self, client: AsyncClient, monkeypatch):
+        monkeypatch.setattr(settings, "PAYMENT_CACHE_WINDOW_DAYS", 5)
+        await self.create_payments()
+        cache = await self.start_cache()
+        hits = CACHE_REQUESTS.value(result="hit")
+
+        rows = cache.get_range(
+            self.now - timedelta(days=3),
+            self.now - timedelta(days=1),
+        )
+
+        assert [row["document"] for row in rows] == ["DOC3", "DOC2", "DOC1"]
+        assert CACHE_REQUESTS.value(result="hit") == hits + 1
+        assert cache.get_range(self.now - timedelta(days=8), self.now) is None
+
+    @pytest.mark.anyio
+    async def test_add_payments(self, client: AsyncClient, monkeypatch):
+        monkeypatch.setattr(settings, "PAYMENT_CACHE_WINDOW_DAYS", 5)
+        await self.create_payments()
+        cache = await self.start_cache()
+
+        cache.add_payments([
+            Payment(
+                date=self.now + timedelta(hours=1),
+                document="NEW",
+                beneficiary="Newest",
+                amount=Decimal("7"),
+            ),
+            Payment(
+                date=self.now - timedelta(days=2, hours=1),
+                document="MID",
+                beneficiary="Middle",
+                amount=Decimal("8.10"),
+            ),
+            Payment(
+                date=self.now - timedelta(days=9),
+                document="OLD",
+                beneficiary="Too old",
+                amount=Decimal("1"),
+            ),
+        ])
+
+        assert len(cache) == 7
+        latest = cache.get_latest(0, 1)[0]
+        assert latest["document"] == "NEW"
+        assert latest["amount"] == "7.00"
+        rows = cache.get_range(self.now - timedelta(days=3), self.now)
+        assert [row["document"] for row in rows] == [
+            "DOC3", "MID", "DOC2", "DOC1", "DOC0",
+        ]
+
+    @pytest.mark.anyio
+    async def test_same_date_order_matches_database(
+        self,
+        client: AsyncClient,
+        monkeypatch,
+    ):
+        monkeypatch.setattr(settings, "PAYMENT_CACHE_WINDOW_DAYS", 5)
+        await self.cleanup()
+        for idx in range(4):
+            await Payment.create(
+                date=self.now,
+                document=f"TIE{idx}",
+                beneficiary="Same date",
+                amount=Decimal("1"),
+            )
+        cache = await self.start_cache()
+        cache.add_payments([
+            await Payment.create(
+                date=self.now,
+                document="TIE4",
+                beneficiary="Same date",
+                amount=Decimal("1"),
+            ),
+        ])
+
+        assert cache.get_latest(0, 5) == await PaymentService().get_payments(
+            skip=0,
+            limit=5,
+        )
+
+    @pytest.mark.anyio
+    async def test_reload_keeps_rows_added_meanwhile(
+        self,
+        client: AsyncClient,
+        monkeypatch,
+    ):
+        monkeypatch.setattr(settings, "PAYMENT_CACHE_WINDOW_DAYS", 5)
+        await self.create_payments()
+        cache = await self.start_cache()
+        stored = await Payment.create(
+            date=self.now + timedelta(microseconds=1),
+            document="STORED",
+            beneficiary="In the snapshot",
+            amount=Decimal("2"),
+        )
+
+        reload = asyncio.create_task(cache.reload())
+        # The reload is now waiting for the database.
+        await asyncio.sleep(0)
+        cache.add_payments([
+            stored,
+            # Committed after the snapshot was read.
+            Payment(
+                date=self.now + timedelta(minutes=1),
+                document="LATE",
+                beneficiary="After the snapshot",
+                amount=Decimal("3"),
+            ),
+        ])
+        await reload
+
+        assert len(cache) == 7
+        rows = cache.get_latest(0, 2)
+        assert [row["document"] for row in rows] == ["LATE", "STORED"]
+
+    @pytest.mark.anyio
+    async def test_memory_budget_drops_oldest(
+        self,
+        client: AsyncClient,
+        monkeypatch,
+    ):
+        monkeypatch.setattr(settings, "PAYMENT_CACHE_WINDOW_DAYS", 30)
+        await self.create_payments()
+        cache = PaymentCache()
+        await cache.reload()
+        full_size = cache.size_bytes
+        monkeypatch.setattr(settings, "PAYMENT_CACHE_MAX_BYTES", full_size // 2)
+        await cache.reload()
+        cache.enabled = True
+
+        assert 0 < len(cache) < 10
+        assert cache.size_bytes <= full_size // 2
+        assert cache.get_range(self.now - timedelta(days=9), self.now) is None
+        oldest = self.now - timedelta(days=len(cache) - 1)
+        assert len(cache.get_range(oldest, self.now)) == len(cache)
+
+    @pytest.mark.anyio
+    async def test_undated_payments_skip_listing(self, client: AsyncClient):
+        await self.create_payments()
+        await Payment.create(
+            date=None,
+            beneficiary="Undated",
+            amount=Decimal("1"),
+        )
+        cache = await self.start_cache()
+
+        assert cache.get_latest(0, 1) is None
+        assert cache.get_range(self.now - timedelta(days=1), self.now)
+
+    @pytest.mark.anyio
+    async def test_endpoint_served_from_cache(self, client: AsyncClient):
+        await self.create_test_user(client, cleanup=True)
+        await self.create_payments(cleanup=False)
+        tokens = await self.create_test_login(client)
+        await payment_cache.start()
+        try:
+            hits = CACHE_REQUESTS.value(result="hit")
+            response = await client.get(
+                "/api/v1/pagamentos/?limit=2",
+                headers={"Authorization": f"Bearer {tokens['access_token']}"},
+            )
+        finally:
+            await payment_cache.stop()
+
+        assert response.status_code == 200
+        assert [row["document"] for row in response.json()] == ["DOC0", "DOC1"]
+        assert CACHE_REQUESTS.value(result="hit") == hits + 1
@@ -0,0 +1,294 @@
+""" Module for testing the filtered and sorted payment listing and its totals. """
+
+import itertools
+import re
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+import pytest
+from httpx import AsyncClient
+from tortoise import connections
+from tortoise.transactions import in_transaction
+
+from app.config import settings
+from app.core.queries import uses_asyncpg
+from app.models import Payment
+from app.services.payment_service import PAYMENT_SORTS, PaymentService
+from .base import BaseTester
+
+START = datetime(2026, 1, 1, tzinfo=timezone.utc)
+FILTERS = {
+    "start": {"start": START},
+    "end": {"end": START + timedelta(days=30)},
+    "min_amount": {"min_amount": Decimal("100.00")},
+    "max_amount": {"max_amount": Decimal("500.00")},
+    "beneficiary": {"beneficiary": "Beneficiary 1"},
+}
+FILTERED_COLUMNS = {
+    "start": "date",
+    "end": "date",
+    "min_amount": "amount",
+    "max_amount": "amount",
+    "beneficiary": "beneficiary",
+}
+
+
+def on_postgres() -> bool:
+    return uses_asyncpg(connections.get("default"))
+
+
+async def query_plan(query) -> str:
+    """
+    Plan of ``query``. Sequential scans are turned off on PostgreSQL only
+    because the test tables are tiny, which would make them cheapest.
+    """
+    sql = query.sql(params_inline=True)
+    if on_postgres():
+        async with in_transaction() as connection:
+            await connection.execute_script("SET LOCAL enable_seqscan = off")
+            rows = await connection.execute_query_dict(f"EXPLAIN {sql}")
+        return "\n".join(row["QUERY PLAN"] for row in rows)
+    rows = await connections.get("default").execute_query_dict(
+        f"EXPLAIN QUERY PLAN {sql}"
+    )
+    return "\n".join(row["detail"] for row in rows)
+
+
+def skip_amounts_on_sqlite(*names: str):
+    # SQLite stores decimals as text, so Tortoise compares and sorts them
+    # with casts no index can serve; amounts are checked on PostgreSQL.
+    if any("amount" in name for name in names) and not on_postgres():
+        pytest.skip("amount filters and sorts need PostgreSQL")
+
+
+def is_full_scan(plan: str) -> bool:
+    return "Seq Scan" in plan or any(
+        line.strip() == "SCAN payments" for line in plan.splitlines()
+    )
+
+
+def index_bounds(plan: str, field: str, operator: str) -> bool:
+    """
+    Tells whether the index scan of ``plan`` is bounded by
+    ``field <operator>``, rather than reading the index from its start
+    and filtering.
+    """
+    pattern = re.compile(rf"\b{field}\b\s*{operator}")
+    return any(
+        ("Index Cond" in line or line.strip().startswith("SEARCH payments"))
+        and pattern.search(line)
+        for line in plan.splitlines()
+    )
+
+
+class TestPaymentSearch(BaseTester):
+
+    async def create_payments(self, count: int = 10):
+        await Payment.bulk_create(
+            [
+                Payment(
+                    date=START + timedelta(days=i),
+                    document=f"SEARCH-{i}",
+                    beneficiary=f"Beneficiary {i % 2}",
+                    # The same amount twice, to page across ties.
+                    amount=Decimal(100 * (i // 2)),
+                )
+                for i in range(count)
+            ]
+        )
+
+    async def login(self, client: AsyncClient) -> dict:
+        await self.create_test_user(client, cleanup=True)
+        login_data = await self.create_test_login(client)
+        return {"Authorization": f"Bearer {login_data['access_token']}"}
+
+    @pytest.mark.anyio
+    async def test_date_filters(self, client: AsyncClient):
+        headers = await self.login(client)
+        await self.create_payments()
+
+        response = await client.get(
+            "/api/v1/pagamentos/",
+            params={
+                "start_date": (START + timedelta(days=2)).isoformat(),
+                "end_date": (START + timedelta(days=7)).isoformat(),
+                "beneficiary": "Beneficiary 1",
+                "sort": "date",
+            },
+            headers=headers,
+        )
+
+        assert response.status_code == 200
+        assert [p["document"] for p in response.json()] == [
+            "SEARCH-3",
+            "SEARCH-5",
+            "SEARCH-7",
+        ]
+        assert "X-Next-Cursor" not in response.headers
+
+    @pytest.mark.anyio
+    async def test_amount_filters(self, client: AsyncClient):
+        skip_amounts_on_sqlite("amount")
+        headers = await self.login(client)
+        await self.create_payments()
+
+        response = await client.get(
+            "/api/v1/pagamentos/",
+            params={
+                "min_amount": "100",
+                "max_amount": "300.00",
+                "beneficiary": "Beneficiary 1",
+                "sort": "-amount",
+            },
+            headers=headers,
+        )
+
+        assert response.status_code == 200
+        assert [p["document"] for p in response.json()] == [
+            "SEARCH-7",
+            "SEARCH-5",
+            "SEARCH-3",
+        ]
+
+    @pytest.mark.anyio
+    @pytest.mark.parametrize("sort", PAYMENT_SORTS)
+    async def test_cursor_pagination(self, client: AsyncClient, sort: str):
+        skip_amounts_on_sqlite(sort)
+        headers = await self.login(client)
+        await self.create_payments()
+        params = {"sort": sort, "limit": 3}
+
+        pages = []
+        while True:
+            response = await client.get(
+                "/api/v1/pagamentos/",
+                params=params,
+                headers=headers,
+            )
+            assert response.status_code == 200
+            pages.append([p["document"] for p in response.json()])
+            if "X-Next-Cursor" not in response.headers:
+                break
+            params["cursor"] = response.headers["X-Next-Cursor"]
+
+        documents = [document for page in pages for document in page]
+        assert [len(page) for page in pages] == [3, 3, 3, 1]
+        assert sorted(documents) == sorted(f"SEARCH-{i}" for i in range(10))
+        payments = {p.document: p for p in await Payment.all()}
+        field = sort.lstrip("-")
+        values = [getattr(payments[d], field) for d in documents]
+        assert values == sorted(values, reverse=sort.startswith("-"))
+
+    @pytest.mark.anyio
+    async def test_invalid_cursor(self, client: AsyncClient):
+        headers = await self.login(client)
+        await self.create_payments()
+        response = await client.get(
+            "/api/v1/pagamentos/",
+            params={"sort": "-date", "limit": 3},
+            headers=headers,
+        )
+
+        for params in (
+            {"sort": "date", "cursor": response.headers["X-Next-Cursor"]},
+            {"cursor": "not-a-cursor"},
+        ):
+            response = await client.get(
+                "/api/v1/pagamentos/",
+                params=params,
+                headers=headers,
+            )
+            assert response.status_code == 400
+            assert response.json()["detail"] == "Invalid cursor"
+
+    @pytest.mark.anyio
+    async def test_query_plans_use_indexes(self, client: AsyncClient):
+        """
+        Every supported combination of filters, sort and cursor must be
+        served by an index scan, and a cursor must bound the scan on the
+        sort column unless a filter on the other column may pick the index.
+        """
+        postgres = on_postgres()
+        cursor = {
+            "date": (START, "00000000-0000-0000-0000-000000000000"),
+            "amount": (Decimal("100.00"), "00000000-0000-0000-0000-000000000000"),
+        }
+        for sort in PAYMENT_SORTS:
+            for size in range(len(FILTERS) + 1):
+                for names in itertools.combinations(FILTERS, size):
+                    if not postgres and any(
+                        "amount" in name for name in (sort, *names)
+                    ):
+                        continue
+                    filters = {}
+                    for name in names:
+                        filters.update(FILTERS[name])
+                    for after in (None, cursor[sort.lstrip("-")]):
+                        query = PaymentService.search_query(
+                            **filters,
+                            sort=sort,
+                            after=after,
+                        ).limit(101)
+                        plan = await query_plan(query)
+                        assert not is_full_scan(plan), (
+                            f"sort={sort} filters={names} cursor={bool(after)}:\n"
+                            f"{plan}"
+                        )
+                        field = sort.lstrip("-")
+                        if after is None or any(
+                            FILTERED_COLUMNS[name] not in (field, "beneficiary")
+                            for name in names
+                        ):
+                            continue
+                        operator = "<" if sort.startswith("-") else ">"
+                        assert index_bounds(plan, field, operator), (
+                            f"sort={sort} filters={names} cursor=True:\n"
+                            f"{plan}"
+                        )
+
+    @pytest.mark.anyio
+    async def test_total_count(self, client: AsyncClient):
+        headers = await self.login(client)
+        await self.create_payments()
+
+        response = await client.get(
+            "/api/v1/pagamentos/",
+            params={"limit": 3, "include_total": "true"},
+            headers=headers,
+        )
+        assert response.status_code == 200
+        assert response.headers["X-Total-Count"] == "10"
+        assert response.headers["X-Total-Count-Mode"] == "exact"
+
+        response = await client.get(
+            "/api/v1/pagamentos/",
+            params={
+                "beneficiary": "Beneficiary 1",
+                "limit": 3,
+                "include_total": "true",
+            },
+            headers=headers,
+        )
+        assert len(response.json()) == 3
+        assert response.headers["X-Total-Count"] == "5"
+        assert response.headers["X-Total-Count-Mode"] == "exact"
+
+        response = await client.get("/api/v1/pagamentos/", headers=headers)
+        assert "X-Total-Count" not in response.headers
+
+    @pytest.mark.anyio
+    async def test_large_totals_are_estimated(self, client: AsyncClient, monkeypatch):
+        if not on_postgres():
+            pytest.skip("estimates come from PostgreSQL planner statistics")
+        monkeypatch.setattr(settings, "PAYMENT_COUNT_EXACT_LIMIT", 1)
+        headers = await self.login(client)
+        await self.create_payments()
+        await connections.get("default").execute_script('ANALYZE "payments"')
+
+        response = await client.get(
+            "/api/v1/pagamentos/",
+            params={"include_total": "true"},
+            headers=headers,
+        )
+        assert response.headers["X-Total-Count-Mode"] == "estimated"
+        assert int(response.headers["X-Total-Count"]) > 0
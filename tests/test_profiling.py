@@ -0,0 +1,160 @@
+""" Module for testing the admin profiling endpoints. """
+
+import asyncio
+from decimal import Decimal
+
+import pytest
+from httpx import AsyncClient
+
+from app.config import settings
+from app.models import Payment
+
+from .base import BaseTester
+
+
+class TestProfiling(BaseTester):
+
+    async def get_admin_headers(self, client: AsyncClient) -> dict:
+        user = await self.create_test_user(client, cleanup=True)
+        user.is_admin = True
+        await user.save()
+        login_data = await self.create_test_login(client)
+        return {"Authorization": f"Bearer {login_data['access_token']}"}
+
+    @pytest.fixture(autouse=True)
+    async def cleanup_users(self):
+        yield
+        await self.cleanup()
+
+    @pytest.mark.anyio
+    async def test_profile_for_duration(self, client: AsyncClient):
+        headers = await self.get_admin_headers(client)
+
+        response = await client.post(
+            "/api/v1/admin/profile",
+            json={"seconds": 0.2, "interval_ms": 1},
+            headers=headers,
+        )
+
+        assert response.status_code == 200
+        assert "attachment" in response.headers["content-disposition"]
+        lines = response.text.strip().splitlines()
+        assert lines
+        stack, count = lines[0].rsplit(" ", 1)
+        assert int(count) > 0
+
+    @pytest.mark.anyio
+    async def test_profile_route_speedscope(self, client: AsyncClient):
+        headers = await self.get_admin_headers(client)
+
+        async def hit_route():
+            await asyncio.sleep(0.1)
+            for _ in range(2):
+                assert (await client.get("/health/live")).status_code == 200
+
+        response, _ = await asyncio.gather(
+            client.post(
+                "/api/v1/admin/profile",
+                json={
+                    "route": "/health/live",
+                    "requests": 2,
+                    "seconds": 5,
+                    "format": "speedscope",
+                },
+                headers=headers,
+            ),
+            hit_route(),
+        )
+
+        assert response.status_code == 200
+        profile = response.json()
+        assert profile["profiles"][0]["type"] == "sampled"
+        assert profile["profiles"][0]["name"] == "/health/live"
+
+    @pytest.mark.anyio
+    async def test_profile_route_includes_handler_work(
+        self,
+        client: AsyncClient,
+        monkeypatch,
+    ):
+        """
+        Queries awaited through ``cancel_on_disconnect`` run in the request
+        task, so a route profile samples them.
+        """
+        monkeypatch.setattr(settings, "RATE_LIMIT_ROWS_PER_UNIT", 100000)
+        headers = await self.get_admin_headers(client)
+        await Payment.bulk_create(
+            [
+                Payment(
+                    document=f"DOC{idx}",
+                    beneficiary="Beneficiary",
+                    amount=Decimal("10.00"),
+                )
+                for idx in range(5000)
+            ]
+        )
+
+        async def hit_route():
+            await asyncio.sleep(0.1)
+            for _ in range(3):
+                response = await client.get(
+                    "/api/v1/pagamentos/all",
+                    headers=headers,
+                )
+                assert response.status_code == 200
+
+        response, _ = await asyncio.gather(
+            client.post(
+                "/api/v1/admin/profile",
+                json={
+                    "route": "/pagamentos/all",
+                    "requests": 3,
+                    "seconds": 10,
+                    "interval_ms": 1,
+                },
+                headers=headers,
+            ),
+            hit_route(),
+        )
+
+        assert response.status_code == 200
+        assert "app/services/payment_service.py" in response.text
+
+    @pytest.mark.anyio
+    async def test_profile_requires_admin(self, client: AsyncClient):
+        await self.create_test_user(client, cleanup=True)
+        login_data = await self.create_test_login(client)
+        response = await client.post(
+            "/api/v1/admin/profile",
+            json={"seconds": 0.1},
+            headers={"Authorization": f"Bearer {login_data['access_token']}"},
+        )
+        assert response.status_code == 403
+
+    @pytest.mark.anyio
+    async def test_tracemalloc_snapshots(self, client: AsyncClient):
+        headers = await self.get_admin_headers(client)
+        response = await client.get(
+            "/api/v1/admin/tracemalloc/snapshot",
+            headers=headers,
+        )
+        assert response.status_code == 409
+
+        await client.post("/api/v1/admin/tracemalloc/start", headers=headers)
+        try:
+            first = await client.get(
+                "/api/v1/admin/tracemalloc/snapshot",
+                headers=headers,
+            )
+            second = await client.get(
+                "/api/v1/admin/tracemalloc/snapshot",
+                params={"pattern": "*/app/*", "limit": 5},
+                headers=headers,
+            )
+        finally:
+            await client.post("/api/v1/admin/tracemalloc/stop", headers=headers)
+
+        assert first.status_code == 200
+        assert first.json()["compared_to_previous"] is False
+        assert second.json()["compared_to_previous"] is True
+        assert len(second.json()["top"]) <= 5
@@ -0,0 +1,98 @@
+""" Module for testing query timeouts and cancellation on disconnect. """
+
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+from httpx import AsyncClient
+from starlette.requests import Request
+from tortoise.exceptions import OperationalError
+
+from app.config import settings
+from app.core.queries import (
+    cancel_on_disconnect,
+    is_query_timeout,
+    query_deadline,
+)
+from app.core.repository import OrmRepository
+from .base import BaseTester
+
+
+class QueryCanceledError(Exception):
+    sqlstate = "57014"
+
+
+def make_request(disconnect_after: float) -> Request:
+    async def receive():
+        await asyncio.sleep(disconnect_after)
+        return {"type": "http.disconnect"}
+
+    scope = {
+        "type": "http",
+        "method": "GET",
+        "path": "/api/v1/pagamentos/all",
+        "query_string": b"",
+        "headers": [],
+    }
+    return Request(scope, receive)
+
+
+class TestQueryControl:
+
+    @pytest.mark.anyio
+    async def test_query_deadline(self, client: AsyncClient):
+        with pytest.raises(TimeoutError):
+            async with query_deadline(0.05):
+                await asyncio.sleep(1)
+
+    def test_is_query_timeout(self):
+        assert is_query_timeout(TimeoutError())
+        assert is_query_timeout(OperationalError(QueryCanceledError()))
+        assert not is_query_timeout(OperationalError(ValueError("syntax")))
+
+    @pytest.mark.anyio
+    async def test_cancel_on_disconnect(self):
+        cancelled = asyncio.Event()
+
+        async def slow_query():
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        with pytest.raises(HTTPException) as error:
+            await cancel_on_disconnect(make_request(0.05), slow_query())
+        assert error.value.status_code == 499
+        assert cancelled.is_set()
+
+    @pytest.mark.anyio
+    async def test_result_when_client_stays(self):
+        async def query():
+            return [1, 2]
+
+        assert await cancel_on_disconnect(make_request(10), query()) == [1, 2]
+
+
+class TestQueryTimeouts(BaseTester):
+
+    @pytest.mark.anyio
+    async def test_timeout_returns_504(self, client: AsyncClient, monkeypatch):
+        async def slow_fetch(query, timeout=None):
+            async with query_deadline(timeout):
+                await asyncio.sleep(5)
+
+        monkeypatch.setattr(
+            settings,
+            "QUERY_TIMEOUTS",
+            {"GET /api/v1/pagamentos/all": 0.05},
+        )
+        monkeypatch.setattr(OrmRepository, "fetch_records", staticmethod(slow_fetch))
+        await self.create_test_user(client, cleanup=True)
+        login_data = await self.create_test_login(client)
+        headers = {"Authorization": f"Bearer {login_data['access_token']}"}
+
+        response = await client.get("/api/v1/pagamentos/all", headers=headers)
+
+        assert response.status_code == 504
+        assert response.json()["detail"] == "Query timed out"
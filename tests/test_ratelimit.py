@@ -0,0 +1,142 @@
+""" Module for testing rate limit keys, costs and API key quotas. """
+
+from decimal import Decimal
+
+import pytest
+from httpx import AsyncClient
+
+from app.config import settings
+from app.dependencies import limiter
+from app.models import Payment
+from .base import BaseTester
+
+
+class TestRateLimit(BaseTester):
+
+    async def login(self, client: AsyncClient, test_user: dict = None) -> dict:
+        test_user = test_user or self.test_user
+        response = await client.post("/api/v1/auth/register", json=test_user)
+        assert response.status_code == 201
+        response = await client.post(
+            "/api/v1/auth/token",
+            data={
+                "username": test_user["username"],
+                "password": test_user["password"],
+            },
+        )
+        assert response.status_code == 200
+        return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    @pytest.fixture(autouse=True)
+    async def reset_limits(self):
+        await self.cleanup()
+        limiter.reset()
+        yield
+        await self.cleanup()
+
+    @pytest.mark.anyio
+    async def test_limits_are_per_user(self, client: AsyncClient):
+        first = await self.login(client, self.test_users[0])
+        second = await self.login(client, self.test_users[1])
+
+        # 1000 rows cost 10 units of the 20 per minute.
+        for _ in range(2):
+            response = await client.get(
+                "/api/v1/pagamentos/?limit=1000",
+                headers=first,
+            )
+            assert response.status_code == 200
+        response = await client.get("/api/v1/pagamentos/", headers=first)
+        assert response.status_code == 429
+
+        response = await client.get("/api/v1/pagamentos/", headers=second)
+        assert response.status_code == 200
+
+    @pytest.mark.anyio
+    async def test_page_limit_is_bounded(self, client: AsyncClient):
+        headers = await self.login(client)
+
+        for limit in (0, settings.PAYMENT_PAGE_MAX_SIZE + 1):
+            response = await client.get(
+                f"/api/v1/pagamentos/?limit={limit}",
+                headers=headers,
+            )
+            assert response.status_code == 422
+        # Rejected pages cost nothing; the largest page fits the limit.
+        for _ in range(2):
+            response = await client.get(
+                f"/api/v1/pagamentos/?limit={settings.PAYMENT_PAGE_MAX_SIZE}",
+                headers=headers,
+            )
+            assert response.status_code == 200
+
+    @pytest.mark.anyio
+    async def test_charges_rows_returned(self, client: AsyncClient, monkeypatch):
+        monkeypatch.setattr(settings, "RATE_LIMIT_ROWS_PER_UNIT", 2)
+        headers = await self.login(client)
+        await Payment.bulk_create(
+            [
+                Payment(
+                    document=f"DOC{idx}",
+                    beneficiary="Beneficiary",
+                    amount=Decimal("10.00"),
+                )
+                for idx in range(10)
+            ]
+        )
+
+        # 10 rows cost 5 units of the 20 per minute.
+        for _ in range(4):
+            response = await client.get("/api/v1/pagamentos/all", headers=headers)
+            assert response.status_code == 200
+            assert len(response.json()) == 10
+        response = await client.get("/api/v1/pagamentos/all", headers=headers)
+        assert response.status_code == 429
+
+    @pytest.mark.anyio
+    async def test_api_key_quota(self, client: AsyncClient):
+        headers = await self.login(client)
+        user = await self.create_test_user(client)
+        user.is_admin = True
+        await user.save()
+        response = await client.post("/api/v1/apikeys/generate", headers=headers)
+        assert response.status_code == 201
+        key = response.json()
+
+        response = await client.put(
+            f"/api/v1/admin/apikeys/{key['id']}/rate-limit",
+            json={"rate_limit": "2/minute"},
+            headers=headers,
+        )
+        assert response.status_code == 200
+        assert response.json()["rate_limit"] == "2/minute"
+
+        key_headers = {"X-API-KEY": key["api_key"]}
+        for _ in range(2):
+            response = await client.get(
+                "/api/v1/pagamentos/",
+                headers=key_headers,
+            )
+            assert response.status_code == 200
+        response = await client.get("/api/v1/pagamentos/", headers=key_headers)
+        assert response.status_code == 429
+
+        # The user's own token is limited separately.
+        response = await client.get("/api/v1/pagamentos/", headers=headers)
+        assert response.status_code == 200
+
+    @pytest.mark.anyio
+    async def test_rejects_invalid_quota(self, client: AsyncClient):
+        headers = await self.login(client)
+        user = await self.create_test_user(client)
+        user.is_admin = True
+        await user.save()
+        response = await client.post("/api/v1/apikeys/generate", headers=headers)
+        key = response.json()
+
+        response = await client.put(
+            f"/api/v1/admin/apikeys/{key['id']}/rate-limit",
+            json={"rate_limit": "often"},
+            headers=headers,
+        )
+        assert response.status_code == 422
@@ -0,0 +1,243 @@
+""" Module for testing reconciliation fingerprints and drill-down. """
+
+import asyncio
+import hashlib
+import random
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+import pytest
+from httpx import AsyncClient
+
+from app.config import settings
+from app.models import Payment, ReconciliationDigest
+from app.schemas import PaymentCreate
+from app.services.payment_service import PaymentService
+from app.services.reconciliation_service import (
+    MODULUS,
+    ReconciliationService,
+    day_fingerprint,
+    range_fingerprint,
+)
+from .base import BaseTester
+
+DAY = datetime(2026, 3, 1, tzinfo=timezone.utc)
+
+
+def partner_hours(rows):
+    """
+    Fingerprints of a partner extract, computed from the documented
+    algorithm only.
+    """
+    hours = [[0, 0] for _ in range(24)]
+    for moment, document, amount, beneficiary in rows:
+        data = "\x1f".join((document, amount, beneficiary)).encode()
+        digest = int.from_bytes(hashlib.sha256(data).digest()[:16], "big")
+        hours[moment.hour][0] += 1
+        hours[moment.hour][1] += digest
+    return [[count, f"{total % MODULUS:032x}"] for count, total in hours]
+
+
+class TestReconciliation(BaseTester):
+
+    rows = [
+        (DAY + timedelta(hours=i % 5, minutes=i), f"REC-{i}", f"{i}.05", "ACME")
+        for i in range(20)
+    ]
+
+    async def setup_payments(self, client: AsyncClient) -> dict:
+        await self.create_test_user(client, cleanup=True)
+        login_data = await self.create_test_login(client)
+        await Payment.bulk_create(
+            [
+                Payment(
+                    date=moment,
+                    document=document,
+                    amount=Decimal(amount),
+                    beneficiary=beneficiary,
+                )
+                for moment, document, amount, beneficiary in self.rows
+            ]
+        )
+        return {"Authorization": f"Bearer {login_data['access_token']}"}
+
+    @pytest.mark.anyio
+    async def test_fingerprints_match_partner(self, client: AsyncClient):
+        headers = await self.setup_payments(client)
+
+        response = await client.get(
+            "/api/v1/reconciliation/fingerprints",
+            params={"start_date": "2026-03-01", "end_date": "2026-03-02"},
+            headers=headers,
+        )
+
+        assert response.status_code == 200
+        report = response.json()
+        shuffled = random.sample(self.rows, len(self.rows))
+        day = day_fingerprint(partner_hours(shuffled))
+        empty = day_fingerprint(partner_hours([]))
+        assert report["count"] == 20
+        assert [d["fingerprint"] for d in report["days"]] == [day, empty]
+        assert report["fingerprint"] == range_fingerprint(
+            [(DAY.date(), day), ((DAY + timedelta(days=1)).date(), empty)]
+        )
+        assert "hours" not in report["days"][0]
+        assert await ReconciliationDigest.filter(day=DAY.date()).exists()
+
+    @pytest.mark.anyio
+    async def test_drill_down(self, client: AsyncClient):
+        headers = await self.setup_payments(client)
+        # The partner is missing one row and has another amount.
+        partner = [row for row in self.rows if row[1] != "REC-3"]
+        partner[0] = (*partner[0][:2], "999.99", partner[0][3])
+
+        response = await client.get(
+            "/api/v1/reconciliation/fingerprints",
+            params={
+                "start_date": "2026-03-01",
+                "end_date": "2026-03-01",
+                "hours": "true",
+            },
+            headers=headers,
+        )
+        ours = response.json()["days"][0]["hours"]
+        theirs = partner_hours(partner)
+        mismatched = [
+            f"2026-03-01T{hour['hour']:02d}"
+            for hour in ours
+            if [hour["count"], hour["fingerprint"]] != theirs[hour["hour"]]
+        ]
+        assert mismatched == ["2026-03-01T00", "2026-03-01T03"]
+
+        response = await client.get(
+            "/api/v1/reconciliation/rows",
+            params={"bucket": mismatched},
+            headers=headers,
+        )
+        assert response.status_code == 200
+        assert sorted(p["document"] for p in response.json()) == sorted(
+            row[1] for row in self.rows if row[0].hour in (0, 3)
+        )
+
+    @pytest.mark.anyio
+    async def test_writes_invalidate_closed_days(self, client: AsyncClient):
+        headers = await self.setup_payments(client)
+        params = {"start_date": "2026-03-01", "end_date": "2026-03-01"}
+        before = await client.get(
+            "/api/v1/reconciliation/fingerprints",
+            params=params,
+            headers=headers,
+        )
+        assert await ReconciliationDigest.filter(day=DAY.date()).exists()
+
+        await PaymentService().create_payments(
+            [
+                PaymentCreate(
+                    date=DAY + timedelta(hours=23),
+                    document="REC-LATE",
+                    beneficiary="ACME",
+                    amount=Decimal("1.00"),
+                )
+            ]
+        )
+        digest = await ReconciliationDigest.get(day=DAY.date())
+        assert digest.hours is None
+
+        after = await client.get(
+            "/api/v1/reconciliation/fingerprints",
+            params=params,
+            headers=headers,
+        )
+        assert after.json()["count"] == before.json()["count"] + 1
+        assert after.json()["fingerprint"] != before.json()["fingerprint"]
+
+    @pytest.mark.anyio
+    async def test_digest_computed_during_write_is_discarded(
+        self,
+        client: AsyncClient,
+        monkeypatch,
+    ):
+        headers = await self.setup_payments(client)
+        compute_hours = ReconciliationService.compute_hours
+
+        async def compute_then_write(day, archive_cache=None):
+            hours = await compute_hours(day, archive_cache)
+            # A write commits after the rows were read.
+            await PaymentService().create_payments(
+                [
+                    PaymentCreate(
+                        date=DAY + timedelta(hours=23),
+                        document="REC-RACE",
+                        beneficiary="ACME",
+                        amount=Decimal("1.00"),
+                    )
+                ]
+            )
+            return hours
+
+        monkeypatch.setattr(
+            ReconciliationService,
+            "compute_hours",
+            staticmethod(compute_then_write),
+        )
+        params = {"start_date": "2026-03-01", "end_date": "2026-03-01"}
+        response = await client.get(
+            "/api/v1/reconciliation/fingerprints",
+            params=params,
+            headers=headers,
+        )
+        assert response.json()["count"] == 20
+        digest = await ReconciliationDigest.get(day=DAY.date())
+        assert digest.hours is None
+
+        monkeypatch.setattr(
+            ReconciliationService,
+            "compute_hours",
+            staticmethod(compute_hours),
+        )
+        response = await client.get(
+            "/api/v1/reconciliation/fingerprints",
+            params=params,
+            headers=headers,
+        )
+        assert response.json()["count"] == 21
+
+    @pytest.mark.anyio
+    async def test_fingerprints_timeout(self, client: AsyncClient, monkeypatch):
+        headers = await self.setup_payments(client)
+
+        async def slow_hours(day, archive_cache=None):
+            await asyncio.sleep(5)
+
+        monkeypatch.setattr(
+            ReconciliationService,
+            "compute_hours",
+            staticmethod(slow_hours),
+        )
+        monkeypatch.setattr(
+            settings,
+            "QUERY_TIMEOUTS",
+            {"GET /api/v1/reconciliation/fingerprints": 0.05},
+        )
+        response = await client.get(
+            "/api/v1/reconciliation/fingerprints",
+            params={"start_date": "2026-03-01", "end_date": "2026-03-01"},
+            headers=headers,
+        )
+        assert response.status_code == 504
+
+    @pytest.mark.anyio
+    async def test_invalid_requests(self, client: AsyncClient):
+        headers = await self.setup_payments(client)
+        response = await client.get(
+            "/api/v1/reconciliation/fingerprints",
+            params={"start_date": "2026-03-02", "end_date": "2026-03-01"},
+            headers=headers,
+        )
+        assert response.status_code == 400
+        response = await client.get(
+            "/api/v1/reconciliation/rows",
+            params={"bucket": "2026-03-01T24"},
+            headers=headers,
+        )
+        assert response.status_code == 400
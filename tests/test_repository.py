@@ -0,0 +1,146 @@
+""" Module for testing the repository implementations.
+
+    Each test runs against the ORM and the asyncpg repository; the latter
+    is skipped unless DATABASE_URL points to PostgreSQL.
+"""
+
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+import pytest
+from httpx import AsyncClient
+from tortoise import connections
+
+from app.config import settings
+from app.core.queries import uses_asyncpg
+from app.core.repository import (
+    asyncpg_repository,
+    get_repository,
+    orm_repository,
+)
+from app.models import ApiKey, Payment
+from .base import BaseTester
+
+START = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def repository(repository_backend):
+    return get_repository()
+
+
+class TestRepository(BaseTester):
+
+    async def create_payments(self, count: int = 5):
+        await Payment.bulk_create(
+            [
+                Payment(
+                    date=START + timedelta(days=i),
+                    document=f"REPO-{i}",
+                    beneficiary=f"Beneficiary {i}",
+                    amount=Decimal("10.05") * (i + 1),
+                )
+                for i in range(count)
+            ]
+        )
+
+    @pytest.mark.anyio
+    async def test_latest_payments(self, client: AsyncClient, repository):
+        await self.cleanup()
+        await self.create_payments()
+
+        records = await repository.latest_payments(1, 2)
+
+        assert [r["document"] for r in records] == ["REPO-3", "REPO-2"]
+        assert [r["amount"] for r in records] == ["40.20", "30.15"]
+
+    @pytest.mark.anyio
+    async def test_all_payments(self, client: AsyncClient, repository):
+        await self.cleanup()
+        await self.create_payments()
+
+        records = await repository.all_payments()
+
+        assert sorted(r["document"] for r in records) == [
+            f"REPO-{i}" for i in range(5)
+        ]
+        assert set(records[0]) == {"date", "document", "beneficiary", "amount"}
+
+    @pytest.mark.anyio
+    async def test_payments_between(self, client: AsyncClient, repository):
+        await self.cleanup()
+        await self.create_payments()
+
+        records = await repository.payments_between(
+            START + timedelta(days=1),
+            START + timedelta(days=3),
+        )
+
+        assert sorted(r["document"] for r in records) == [
+            "REPO-1",
+            "REPO-2",
+            "REPO-3",
+        ]
+
+    @pytest.mark.anyio
+    async def test_api_keys(self, client: AsyncClient, repository):
+        user = await self.create_test_user(client, cleanup=True)
+        headers = {
+            "Authorization": f"Bearer {(await self.create_test_login(client))['access_token']}"
+        }
+        response = await client.post(
+            "/api/v1/apikeys/generate",
+            json={"scope": "read"},
+            headers=headers,
+        )
+        raw_key = response.json()["api_key"]
+        key = await ApiKey.get(uuid=response.json()["id"])
+
+        records = await repository.api_keys(raw_key[:10])
+        assert len(records) == 1
+        assert records[0].uuid == str(key.uuid)
+        assert records[0].scope == "read"
+        assert records[0].user_id == str(user.uuid)
+        assert records[0].username == user.username
+        assert not records[0].disabled
+
+        key.is_active = False
+        await key.save()
+        assert await repository.api_keys(raw_key[:10]) == []
+
+    @pytest.mark.anyio
+    async def test_api_key_authentication(self, client: AsyncClient, repository):
+        await self.create_test_user(client, cleanup=True)
+        headers = {
+            "Authorization": f"Bearer {(await self.create_test_login(client))['access_token']}"
+        }
+        response = await client.post(
+            "/api/v1/apikeys/generate",
+            json={"scope": "read"},
+            headers=headers,
+        )
+        raw_key = response.json()["api_key"]
+
+        response = await client.get(
+            "/api/v1/pagamentos/interval",
+            params={
+                "start_date": START.isoformat(),
+                "end_date": (START + timedelta(days=1)).isoformat(),
+            },
+            headers={"X-API-KEY": raw_key},
+        )
+        assert response.status_code == 200
+        response = await client.get(
+            "/api/v1/pagamentos/interval",
+            headers={"X-API-KEY": raw_key[:10] + "x" * (len(raw_key) - 10)},
+        )
+        assert response.status_code == 401
+
+    def test_fallback_without_postgresql(self, client: AsyncClient, monkeypatch):
+        monkeypatch.setattr(settings, "REPOSITORY_BACKEND", "asyncpg")
+        expected = (
+            asyncpg_repository
+            if uses_asyncpg(connections.get("default"))
+            else orm_repository
+        )
+        assert get_repository() is expected
@@ -0,0 +1,78 @@
+""" Module for testing request tracing. """
+
+import json
+
+import pytest
+from httpx import AsyncClient
+
+from app.core import tracing
+
+from .base import BaseTester
+
+pytest.importorskip("opentelemetry.sdk")
+
+TRACE_ID = "4bf92f3577b34da6a3ce929d0e0e4736"
+
+
+class TestTracing(BaseTester):
+
+    @pytest.fixture
+    def spans_file(self, tmp_path):
+        path = tmp_path / "spans.jsonl"
+        tracing.setup_tracing(exporter=tracing.FileSpanExporter(str(path)))
+        yield path
+        tracing.shutdown_tracing()
+
+    def read_spans(self, path) -> list:
+        return [json.loads(line) for line in path.read_text().splitlines()]
+
+    @pytest.mark.anyio
+    async def test_request_spans(self, client: AsyncClient, spans_file):
+        await self.create_test_user(client, cleanup=True)
+        login_data = await self.create_test_login(client)
+        spans_file.write_text("")
+
+        response = await client.get(
+            "/api/v1/pagamentos/interval",
+            params={
+                "start_date": "2025-01-01T00:00:00",
+                "end_date": "2025-01-31T00:00:00",
+            },
+            headers={
+                "Authorization": f"Bearer {login_data['access_token']}",
+                "traceparent": f"00-{TRACE_ID}-00f067aa0ba902b7-01",
+            },
+        )
+
+        assert response.status_code == 200
+        spans = self.read_spans(spans_file)
+        names = {span["name"] for span in spans}
+        assert {
+            "GET /api/v1/pagamentos/interval",
+            "auth.get_current_principal",
+            "ratelimit.check",
+            "PaymentService.get_payment_by_interval",
+            "SELECT payments",
+            "serialize payments",
+        } <= names
+        trace_ids = {span["context"]["trace_id"] for span in spans}
+        assert trace_ids == {f"0x{TRACE_ID}"}
+        await self.cleanup()
+
+    @pytest.mark.anyio
+    async def test_unsampled_parent_is_not_exported(
+        self,
+        client: AsyncClient,
+        spans_file,
+    ):
+        response = await client.get(
+            "/health/live",
+            headers={"traceparent": f"00-{TRACE_ID}-00f067aa0ba902b7-00"},
+        )
+
+        assert response.status_code == 200
+        assert not spans_file.exists() or self.read_spans(spans_file) == []
+
+    def test_span_is_noop_when_disabled(self):
+        assert not tracing.is_enabled()
+        assert tracing.span("anything") is tracing.span("other")
@@ -0,0 +1,286 @@
+""" Module for testing webhook delivery. """
+
+import json
+import threading
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from httpx import AsyncClient
+
+from app.config import settings
+from app.models import WebhookOutbox
+from app.services.webhook_service import (
+    WebhookDispatcher,
+    sign,
+    webhook_dispatcher,
+)
+from .base import BaseTester
+
+
+class StubReceiver:
+    """
+    Local HTTP server recording webhook requests. Answers ``status`` to
+    every request.
+    """
+
+    def __init__(self):
+        self.requests = []
+        self.status = 200
+        receiver = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers["Content-Length"]))
+                receiver.requests.append((dict(self.headers), body))
+                self.send_response(receiver.status)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/hook"
+        self.thread = threading.Thread(target=self.server.serve_forever)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def events(self):
+        return [
+            event
+            for _, body in self.requests
+            for event in json.loads(body)["events"]
+        ]
+
+
+class TestWebhooks(BaseTester):
+
+    payments = [
+        {
+            "date": "2026-10-19T10:00:00+00:00",
+            "document": f"DOC{idx}",
+            "beneficiary": "Beneficiary",
+            "amount": "100.50",
+        }
+        for idx in range(5)
+    ]
+
+    @pytest.fixture(autouse=True)
+    def allow_loopback(self, monkeypatch):
+        # The stub receiver listens on loopback.
+        monkeypatch.setattr(
+            settings,
+            "WEBHOOK_ALLOWED_NETWORKS",
+            ["127.0.0.1/32"],
+        )
+
+    async def login(self, client: AsyncClient) -> dict:
+        # Deliveries are driven by the tests.
+        await webhook_dispatcher.stop()
+        await self.create_test_user(client, cleanup=True)
+        tokens = await self.create_test_login(client)
+        return {"Authorization": f"Bearer {tokens['access_token']}"}
+
+    async def subscribe(self, client: AsyncClient, headers: dict, url: str):
+        response = await client.post(
+            "/api/v1/webhooks/",
+            json={"url": url},
+            headers=headers,
+        )
+        assert response.status_code == 201
+        return response.json()
+
+    async def deliver(self) -> int:
+        dispatcher = WebhookDispatcher()
+        dispatcher.open()
+        try:
+            return await dispatcher.run_once()
+        finally:
+            await dispatcher.stop()
+
+    @pytest.mark.anyio
+    async def test_delivers_signed_events(self, client: AsyncClient):
+        headers = await self.login(client)
+        with StubReceiver() as receiver:
+            webhook = await self.subscribe(client, headers, receiver.url)
+            response = await client.post(
+                "/api/v1/pagamentos/batch",
+                json=self.payments,
+                headers=headers,
+            )
+            assert response.status_code == 201
+            assert await WebhookOutbox.all().count() == 5
+
+            assert await self.deliver() == 5
+
+        assert len(receiver.requests) == 1
+        request_headers, body = receiver.requests[0]
+        assert request_headers["Webhook-Signature"] == sign(
+            webhook["secret"],
+            request_headers["Webhook-Timestamp"],
+            body,
+        )
+        events = receiver.events()
+        assert [event["type"] for event in events] == ["payment.created"] * 5
+        assert sorted(event["data"]["document"] for event in events) == [
+            payment["document"] for payment in self.payments
+        ]
+        assert events[0]["data"]["amount"] == "100.50"
+        assert await WebhookOutbox.all().count() == 0
+
+    @pytest.mark.anyio
+    async def test_batches_events(self, client: AsyncClient, monkeypatch):
+        monkeypatch.setattr(settings, "WEBHOOK_BATCH_SIZE", 2)
+        headers = await self.login(client)
+        with StubReceiver() as receiver:
+            await self.subscribe(client, headers, receiver.url)
+            await self.subscribe(client, headers, receiver.url)
+            response = await client.post(
+                "/api/v1/pagamentos/batch",
+                json=self.payments,
+                headers=headers,
+            )
+            assert response.status_code == 201
+
+            assert await self.deliver() == 10
+
+        # Two subscriptions with 5 events each, in batches of 2.
+        assert len(receiver.requests) == 6
+        assert len(receiver.events()) == 10
+
+    @pytest.mark.anyio
+    async def test_retries_with_backoff(self, client: AsyncClient, monkeypatch):
+        monkeypatch.setattr(settings, "WEBHOOK_MAX_ATTEMPTS", 2)
+        monkeypatch.setattr(settings, "WEBHOOK_RETRY_BASE_SECONDS", 0)
+        headers = await self.login(client)
+        with StubReceiver() as receiver:
+            receiver.status = 500
+            await self.subscribe(client, headers, receiver.url)
+            response = await client.post(
+                "/api/v1/pagamentos/",
+                json=self.payments[0],
+                headers=headers,
+            )
+            assert response.status_code == 201
+
+            assert await self.deliver() == 1
+            event = await WebhookOutbox.get()
+            assert event.status == "pending"
+            assert event.attempts == 1
+            assert event.last_error == "HTTP 500"
+
+            assert await self.deliver() == 1
+            event = await WebhookOutbox.get()
+            assert event.status == "failed"
+            assert event.attempts == 2
+            # Failed events are not retried anymore.
+            assert await self.deliver() == 0
+
+        assert len(receiver.requests) == 2
+
+    @pytest.mark.anyio
+    async def test_backoff_delays_retry(self, client: AsyncClient):
+        headers = await self.login(client)
+        with StubReceiver() as receiver:
+            receiver.status = 503
+            await self.subscribe(client, headers, receiver.url)
+            await client.post(
+                "/api/v1/pagamentos/",
+                json=self.payments[0],
+                headers=headers,
+            )
+            assert await self.deliver() == 1
+            event = await WebhookOutbox.get()
+            assert event.next_attempt_at > datetime.now(timezone.utc)
+            assert await self.deliver() == 0
+
+        assert len(receiver.requests) == 1
+
+    @pytest.mark.anyio
+    async def test_list_and_delete(self, client: AsyncClient):
+        headers = await self.login(client)
+        webhook = await self.subscribe(
+            client,
+            headers,
+            "https://1.1.1.1/hook",
+        )
+        await client.post(
+            "/api/v1/pagamentos/",
+            json=self.payments[0],
+            headers=headers,
+        )
+
+        response = await client.get("/api/v1/webhooks/", headers=headers)
+        assert response.status_code == 200
+        assert [item["id"] for item in response.json()] == [webhook["id"]]
+        assert "secret" not in response.json()[0]
+
+        response = await client.delete(
+            f"/api/v1/webhooks/{webhook['id']}",
+            headers=headers,
+        )
+        assert response.status_code == 204
+        assert await WebhookOutbox.all().count() == 0
+
+        response = await client.delete(
+            f"/api/v1/webhooks/{webhook['id']}",
+            headers=headers,
+        )
+        assert response.status_code == 404
+
+    @pytest.mark.anyio
+    async def test_rejects_invalid_url(self, client: AsyncClient):
+        headers = await self.login(client)
+        response = await client.post(
+            "/api/v1/webhooks/",
+            json={"url": "ftp://example.com"},
+            headers=headers,
+        )
+        assert response.status_code == 422
+
+    @pytest.mark.anyio
+    async def test_rejects_internal_url(self, client: AsyncClient):
+        headers = await self.login(client)
+        for url in [
+            "http://127.0.0.2/hook",
+            "http://10.0.0.1/hook",
+            "http://169.254.169.254/latest/meta-data/",
+            "http://[::1]/hook",
+            "http://[::ffff:192.168.0.1]/hook",
+            "http://0.0.0.0/hook",
+        ]:
+            response = await client.post(
+                "/api/v1/webhooks/",
+                json={"url": url},
+                headers=headers,
+            )
+            assert response.status_code == 400, url
+
+    @pytest.mark.anyio
+    async def test_checks_destination_on_delivery(
+        self,
+        client: AsyncClient,
+        monkeypatch,
+    ):
+        headers = await self.login(client)
+        with StubReceiver() as receiver:
+            await self.subscribe(client, headers, receiver.url)
+            await client.post(
+                "/api/v1/pagamentos/",
+                json=self.payments[0],
+                headers=headers,
+            )
+            monkeypatch.setattr(settings, "WEBHOOK_ALLOWED_NETWORKS", [])
+            assert await self.deliver() == 1
+
+        assert receiver.requests == []
+        event = await WebhookOutbox.get()
+        assert event.attempts == 1
+        assert "non-public address" in event.last_error